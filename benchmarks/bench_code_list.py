@@ -0,0 +1,103 @@
+"""
+Filtro por lista de códigos de barra con 100, 10k y 100k códigos:
+
+- servidor: tabla temporal cargada con INSERT de varios VALUES y unida dentro de
+  los CTE (get_cruce_data_for_codes) contra un IN (...) con los códigos como literales,
+  sobre la base SQLite de prueba;
+- local: CruceFilterEngine.search(codigos=...) sobre un DataFrame sintético contra
+  Series.isin.
+
+Las listas mezclan códigos que existen con códigos que no, como las que se pegan de Excel.
+
+Uso:
+    python -m benchmarks.bench_code_list [lineas] [filas_locales]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from benchmarks.bench_filter import make_frame
+from benchmarks.fixture import create_fixture
+from db.columnar import read_frame_columnar
+from db.connection import get_cruce_data_for_codes, prepare_statement
+from queries.cruce_builder import FECHA_START, ORDER_BY
+from queries.query_cruce import render_query_cruce
+from utils.filter_engine import CruceFilterEngine
+
+LIST_SIZES = (100, 10_000, 100_000)
+KEY = ["FechaLlegada", "CodigoBarra"]
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def sample_codes(existing, size, seed=0):
+    """
+    size códigos: hasta la mitad tomados de existing y el resto inventados.
+    """
+    rng = np.random.default_rng(seed)
+    real = rng.choice(existing, min(len(existing), size // 2 or 1), replace=False).tolist()
+    fake = [f"999{i:09d}" for i in range(size - len(real))]
+    return real + fake
+
+
+def in_list_query(engine, codes, fecha_option=2):
+    """
+    El mismo cruce con los códigos como literales en IN (...).
+    """
+    literals = ", ".join("'" + c.replace("'", "''") + "'" for c in codes)
+    sql = render_query_cruce(
+        bodega_filters=f"\n      AND LTRIM(RTRIM(tbDimInventario.CodigoBarra)) IN ({literals})",
+        creacion_filters=f"\n      AND I.CodigoBarra IN ({literals})",
+    ).strip().rstrip(";") + ORDER_BY
+    with engine.connect() as conn:
+        return read_frame_columnar(conn, prepare_statement(engine, text(sql)),
+                                   {"fechaStart": FECHA_START[fecha_option]})
+
+
+def bench_server(n_lines):
+    path = os.path.join(tempfile.gettempdir(), f"cruce_suite_{n_lines}_0.db")
+    if not os.path.exists(path):
+        create_fixture(path, n_lines=n_lines)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        existing = [r[0] for r in conn.execute(text("SELECT CodigoBarra FROM INVENTARIO"))]
+
+    print(f"Servidor (SQLite, {n_lines:,} líneas, {len(existing):,} productos)")
+    print(f"{'códigos':>10} {'filas':>8} {'tabla temporal s':>17} {'IN (...) s':>11}")
+    for size in LIST_SIZES:
+        codes = sample_codes(existing, size)
+        t_temp, df_temp = _timed(lambda: get_cruce_data_for_codes(engine, codes))
+        t_in, df_in = _timed(lambda: in_list_query(engine, codes))
+        assert len(df_temp) == len(df_in)
+        assert df_temp.sort_values(KEY)["CodigoBarra"].tolist() == df_in.sort_values(KEY)["CodigoBarra"].tolist()
+        print(f"{size:>10,} {len(df_temp):>8,} {t_temp:>17.3f} {t_in:>11.3f}")
+    engine.dispose()
+
+
+def bench_local(n_rows):
+    df = make_frame(n_rows)
+    engine = CruceFilterEngine(df)
+    existing = df["CodigoBarra"].unique()
+    # La primera lista arma la tabla hash de los valores únicos
+    t_first, _ = _timed(lambda: engine.search(codigos=sample_codes(existing, 10)))
+
+    print(f"\nLocal ({n_rows:,} filas; primera lista {t_first * 1000:.0f} ms)")
+    print(f"{'códigos':>10} {'filas':>10} {'índice ms':>10} {'isin ms':>9}")
+    for size in LIST_SIZES:
+        codes = sample_codes(existing, size)
+        t_new, positions = _timed(lambda: engine.search(codigos=codes))
+        t_old, mask = _timed(lambda: df["CodigoBarra"].isin(codes).to_numpy())
+        assert np.array_equal(np.flatnonzero(mask), positions)
+        print(f"{size:>10,} {len(positions):>10,} {t_new * 1000:>10.1f} {t_old * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    bench_server(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
+    bench_local(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
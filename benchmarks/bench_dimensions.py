@@ -0,0 +1,70 @@
+"""
+Cruce con nombres (query completo) contra cruce con códigos y nombres unidos en el
+cliente (slim=True + attach_dimension_names), sobre la base SQLite de prueba:
+tiempo de lectura, bytes de las columnas de nombres y tiempo de la unión.
+También compara leer las dimensiones del servidor contra leerlas de la copia en disco.
+
+Uso:
+    python -m benchmarks.bench_dimensions [lineas]
+"""
+import os
+import sys
+import time
+import tempfile
+from sqlalchemy import create_engine
+
+from benchmarks.fixture import create_fixture
+from db.columnar import read_frame_columnar
+from db.connection import get_cruce_data_columnar, prepare_statement
+from db.dimensions import NAME_COLUMNS, DimensionCache, attach_dimension_names, load_dimensions
+from queries.cruce_builder import build_cruce_query
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _name_bytes(df):
+    return sum(int(df[c].memory_usage(deep=True, index=False)) for c in NAME_COLUMNS if c in df.columns)
+
+
+def read_slim(engine, fecha_option=2):
+    statement, params = build_cruce_query(fecha_option=fecha_option, slim=True)
+    with engine.connect() as conn:
+        return read_frame_columnar(conn, prepare_statement(engine, statement), params)
+
+
+def run(n_lines):
+    path = os.path.join(tempfile.gettempdir(), f"cruce_suite_{n_lines}_0.db")
+    if not os.path.exists(path):
+        create_fixture(path, n_lines=n_lines)
+    engine = create_engine(f"sqlite:///{path}")
+
+    t_server, dimensions = _timed(lambda: load_dimensions(engine))
+    cache = DimensionCache(folder=tempfile.mkdtemp())
+    cache.get(engine, "bench")
+    t_disk, _ = _timed(lambda: DimensionCache(folder=cache.folder).get(engine, "bench"))
+    print(f"Dimensiones ({sum(len(t) for t in dimensions.tables.values()):,} filas): "
+          f"servidor {t_server * 1000:.1f} ms, disco {t_disk * 1000:.1f} ms")
+
+    t_full, full = _timed(lambda: get_cruce_data_columnar(engine))
+    # El query con códigos se lee igual que el completo; la unión se mide aparte
+    t_slim, slim = _timed(lambda: read_slim(engine))
+    slim_bytes = _name_bytes(slim)
+    t_attach, attached = _timed(lambda: attach_dimension_names(slim, dimensions))
+
+    for column in NAME_COLUMNS:
+        assert full[column].astype(object).fillna("").tolist() == \
+            attached[column].astype(object).fillna("").tolist(), column
+
+    print(f"\n{'modo':<10} {'filas':>9} {'lectura s':>10} {'nombres MB':>11} {'unión ms':>9}")
+    print(f"{'completo':<10} {len(full):>9,} {t_full:>10.3f} {_name_bytes(full) / 2**20:>11.2f} {'':>9}")
+    print(f"{'códigos':<10} {len(slim):>9,} {t_slim:>10.3f} {slim_bytes / 2**20:>11.2f} "
+          f"{t_attach * 1000:>9.1f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,141 @@
+"""
+Descubrimiento de servidores SQL contra respondedores locales que imitan el servicio
+SQL Browser (UDP 1434) en 127.0.0.2, 127.0.0.3, ... cada uno con un retardo distinto
+y un puerto TCP que acepta conexiones (salvo la última instancia, que no responde).
+
+Mide cuánto tarda en llegar la primera instancia con iter_sql_servers contra esperar
+el timeout completo como hacía get_available_sql_servers, el orden por latencia, la
+lectura desde la caché en disco y la medición de las instancias predefinidas
+(rank_instances con CLNT_UCAST_INST). El comportamiento lo cubre tests/test_discovery.py.
+
+Uso (puerto 1434 o el que se indique):
+    python -m benchmarks.bench_discovery [puerto]
+"""
+import sys
+import time
+import socket
+import tempfile
+import threading
+
+from utils.my_sql_detector import (
+    CLNT_BCAST_EX, CLNT_UCAST_EX, CLNT_UCAST_INST, SVR_RESP, DiscoveryCache,
+    SqlServerDiscovery, iter_sql_servers, rank_instances
+)
+
+TIMEOUT = 1.5
+# (host, instancia, retardo de la respuesta UDP en s, acepta TCP)
+SERVERS = (
+    ("127.0.0.2", "SERVERSQL_DOS", 0.0, True),
+    ("127.0.0.3", "ANALISTA", 0.3, True),
+    ("127.0.0.4", "MSSQLSERVER", 0.6, True),
+    ("127.0.0.5", "APAGADA", 0.1, False),
+)
+
+
+def browser_record(server_name, instance, tcp_port):
+    return (f"ServerName;{server_name};InstanceName;{instance};IsClustered;No;"
+            f"Version;16.0.1000.6;tcp;{tcp_port};;")
+
+
+def browser_response(records):
+    payload = "".join(records).encode("ascii")
+    return bytes([SVR_RESP]) + len(payload).to_bytes(2, "little") + payload
+
+
+class BrowserResponder:
+    """
+    Respondedor UDP del protocolo SQL Browser para una instancia en host:port.
+    """
+
+    def __init__(self, host, instance, delay=0.0, accept_tcp=True, port=1434):
+        self.host = host
+        self.instance = instance
+        self.delay = delay
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind((host, port))
+        # Puerto TCP de la instancia: con accept_tcp=False se reserva pero no escucha
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.bind((host, 0))
+        self.tcp_port = self.tcp.getsockname()[1]
+        if accept_tcp:
+            self.tcp.listen(16)
+        self._stop = threading.Event()
+        threading.Thread(target=self._serve_udp, daemon=True).start()
+        if accept_tcp:
+            threading.Thread(target=self._serve_tcp, daemon=True).start()
+
+    def _reply(self, data, addr):
+        time.sleep(self.delay)
+        record = browser_record(self.host.replace(".", "-"), self.instance, self.tcp_port)
+        if data[:1] in (CLNT_BCAST_EX, CLNT_UCAST_EX):
+            self.udp.sendto(browser_response([record]), addr)
+        elif data[:1] == CLNT_UCAST_INST and data[1:].rstrip(b"\x00").decode().upper() == self.instance.upper():
+            self.udp.sendto(browser_response([record]), addr)
+
+    def _serve_udp(self):
+        self.udp.settimeout(0.2)
+        while not self._stop.is_set():
+            try:
+                data, addr = self.udp.recvfrom(4096)
+            except OSError:
+                continue
+            threading.Thread(target=self._reply, args=(data, addr), daemon=True).start()
+
+    def _serve_tcp(self):
+        self.tcp.settimeout(0.2)
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.tcp.accept()
+                conn.close()
+            except OSError:
+                continue
+
+    def close(self):
+        self._stop.set()
+        self.udp.close()
+        self.tcp.close()
+
+
+def run(port=1434):
+    responders = [BrowserResponder(host, instance, delay, accept, port)
+                  for host, instance, delay, accept in SERVERS]
+    subnets = ["127.0.0.0/29"]
+    try:
+        start = time.perf_counter()
+        arrivals = []
+        for server in iter_sql_servers(TIMEOUT, subnets, broadcast=False, port=port):
+            arrivals.append((time.perf_counter() - start, server.label))
+        total = time.perf_counter() - start
+        print(f"{'llegada s':>10}  instancia")
+        for t, label in arrivals:
+            print(f"{t:>10.3f}  {label}")
+        print(f"Primera a los {arrivals[0][0]:.3f} s; la búsqueda bloqueante entregaba todo "
+              f"a los {total:.2f} s (timeout {TIMEOUT} s)\n")
+
+        cache = DiscoveryCache(folder=tempfile.mkdtemp())
+        discovery = SqlServerDiscovery(TIMEOUT, subnets, broadcast=False, port=port, cache=cache)
+        ranked = [payload for kind, payload in discovery.start().results() if kind == "done"][0]
+        print(f"{'instancia':<24} {'puerto':>7} {'latencia ms':>12}")
+        for server in ranked:
+            latency = f"{server.latency_ms:.2f}" if server.reachable else "sin respuesta"
+            print(f"{server.label:<24} {server.tcp_port:>7} {latency:>12}")
+
+        start = time.perf_counter()
+        cached = [p for kind, p in SqlServerDiscovery(cache=cache).start().results() if kind == "done"][0]
+        print(f"\nDesde la caché: {len(cached)} instancias en {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        predefined = {f"Instancia {host}": {"server_name": f"{host}\\{instance}"}
+                      for host, instance, _, _ in SERVERS}
+        predefined["SQLite de prueba"] = {"url": "sqlite://"}
+        start = time.perf_counter()
+        ranked = rank_instances(predefined, timeout=TIMEOUT, port=port)
+        print(f"Predefinidas medidas en {time.perf_counter() - start:.2f} s:")
+        for alias, ms in ranked:
+            print(f"  {alias:<22} {'sin medir' if ms is None else f'{ms:.2f} ms'}")
+    finally:
+        for responder in responders:
+            responder.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1434)
@@ -0,0 +1,104 @@
+"""
+Compara el camino de lectura anterior (fetchall + dict por fila + DataFrame +
+df[desired_cols].copy()) con la lectura columnar de db.columnar, en tiempo y en
+pico de memoria (tracemalloc), sobre una tabla SQLite con las columnas del cruce.
+
+Uso:
+    python -m benchmarks.bench_fetch [filas ...]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from db.columnar import read_frame_columnar
+from utils.postprocess import CRUCE_COLUMNS
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+SQL_COLUMNS = [c for c in CRUCE_COLUMNS if c != "Vendido"]
+
+
+def create_result_table(path, n_rows, seed=0):
+    """
+    Tabla 'cruce_resultado' con n_rows filas parecidas a las que devuelve el cruce.
+    """
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, max(1, n_rows // 4), n_rows)
+    df = pd.DataFrame({
+        "CodigoBarra": np.char.add("77", codes.astype(str)),
+        "Referencia": np.char.add("REF-", (codes % 50_000).astype(str)),
+        "CodigoMarca": np.char.add("M", rng.integers(0, 300, n_rows).astype(str)),
+        "Marca": np.char.add("Marca ", rng.integers(0, 300, n_rows).astype(str)),
+        "Nombre": np.char.add("Producto ", codes.astype(str)),
+        "Nombre_Fabricante": np.char.add("Fabricante ", rng.integers(0, 500, n_rows).astype(str)),
+        "CodigoFabricante": np.char.add("F", rng.integers(0, 500, n_rows).astype(str)),
+        "CategoriaCodigo": np.char.add("01", rng.integers(10, 99, n_rows).astype(str)),
+        "CategoriaNombre": np.char.add("Categoria ", rng.integers(0, 200, n_rows).astype(str)),
+        "Linea": np.char.add("Linea ", rng.integers(0, 40, n_rows).astype(str)),
+        "CantidadInicial": rng.integers(2, 500, n_rows),
+        "Cantidad_Inicial_Agrupada": rng.integers(2, 500, n_rows),
+        "ExistenciaActual": rng.integers(0, 300, n_rows),
+        "correccion": (rng.random(n_rows) < 0.05).astype(int),
+        "NumeroTransferencia": rng.integers(1, n_rows, n_rows),
+        "FechaLlegada": (np.datetime64("2024-01-01") + rng.integers(0, 900, n_rows)).astype(str),
+        "observacion": np.where(rng.random(n_rows) < 0.8, "", "Obs"),
+        "Queda": rng.random(n_rows) * 100,
+    })[SQL_COLUMNS]
+    conn = sqlite3.connect(path)
+    try:
+        df.to_sql("cruce_resultado", conn, if_exists="replace", index=False, chunksize=100_000)
+    finally:
+        conn.close()
+
+
+def legacy_fetch(engine, statement):
+    """
+    Réplica del camino anterior: get_cruce_data + import_cruce.
+    """
+    with engine.connect() as conn:
+        result = conn.execute(statement).fetchall()
+    data = [dict(row._mapping) for row in result]
+    df = pd.DataFrame(data) if data else pd.DataFrame()
+    return df[SQL_COLUMNS].copy()
+
+
+def columnar_fetch(engine, statement):
+    with engine.connect() as conn:
+        return read_frame_columnar(conn, statement, columns=SQL_COLUMNS)
+
+
+def _measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'filas':>10} {'anterior s':>11} {'pico MB':>9} {'columnar s':>11} {'pico MB':>9}")
+    for n_rows in sizes:
+        path = os.path.join(tempfile.gettempdir(), f"cruce_resultado_{n_rows}.db")
+        create_result_table(path, n_rows)
+        engine = create_engine(f"sqlite:///{path}")
+        statement = text(f"SELECT {', '.join(SQL_COLUMNS)} FROM cruce_resultado")
+
+        old_t, old_peak, old_df = _measure(lambda: legacy_fetch(engine, statement))
+        del old_df
+        new_t, new_peak, new_df = _measure(lambda: columnar_fetch(engine, statement))
+        assert len(new_df) == n_rows
+        engine.dispose()
+
+        print(f"{n_rows:>10,} {old_t:>11.2f} {old_peak / 2**20:>9.0f} "
+              f"{new_t:>11.2f} {new_peak / 2**20:>9.0f}")
+
+
+if __name__ == "__main__":
+    run(tuple(int(a) for a in sys.argv[1:]) or DEFAULT_SIZES)
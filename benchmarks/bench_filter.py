@@ -0,0 +1,93 @@
+"""
+Compara la latencia de búsqueda del filtro anterior de buscar_datos
+(copia + .astype(str)/.str.strip().str.lower() por búsqueda) contra CruceFilterEngine.
+
+Uso:
+    python -m benchmarks.bench_filter [filas ...]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from utils.filter_engine import CruceFilterEngine
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+REPEAT = 5
+
+
+def make_frame(n_rows, seed=0):
+    """
+    DataFrame sintético con las columnas que usan los filtros.
+    """
+    rng = np.random.default_rng(seed)
+    n_codes = max(1, n_rows // 4)
+    codes = rng.integers(0, n_codes, n_rows)
+    return pd.DataFrame({
+        "CodigoBarra": np.char.add("77", codes.astype(str)).astype(object),
+        "Referencia": np.char.add(" REF-", (codes % 50_000).astype(str)).astype(object),
+        "CategoriaNombre": np.char.add("Categoria ", rng.integers(0, 200, n_rows).astype(str)).astype(object),
+        "Linea": np.char.add("Linea ", rng.integers(0, 40, n_rows).astype(str)).astype(object),
+        "CodigoFabricante": np.char.add("F", rng.integers(0, 500, n_rows).astype(str)).astype(object),
+        "Marca": np.char.add("Marca ", rng.integers(0, 300, n_rows).astype(str)).astype(object),
+    })
+
+
+def legacy_search(df_cruce, filtros):
+    """
+    Réplica del filtro original de MainView.buscar_datos.
+    """
+    df = df_cruce.copy()
+    if filtros["CodigoBarra"]:
+        df = df[df["CodigoBarra"].astype(str) == filtros["CodigoBarra"]]
+    if filtros["Referencia"]:
+        df = df[df["Referencia"].str.strip().str.lower() == filtros["Referencia"]]
+    if filtros["CategoriaNombre"]:
+        df = df[df["CategoriaNombre"].str.strip().str.lower() == filtros["CategoriaNombre"]]
+    if filtros["Linea"]:
+        df = df[df["Linea"].str.strip().str.lower() == filtros["Linea"]]
+    if filtros["CodigoFabricante"]:
+        df = df[df["CodigoFabricante"].astype(str).str.strip() == filtros["CodigoFabricante"]]
+    return df
+
+
+def _best_of(func, repeat=REPEAT):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'filas':>10} {'construir':>10} {'anterior ms':>12} {'nuevo ms':>10} {'x':>8}")
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        sample = df.iloc[n_rows // 2]
+        filtros = {
+            "CodigoBarra": "",
+            "Referencia": sample["Referencia"].strip().lower(),
+            "CategoriaNombre": sample["CategoriaNombre"].lower(),
+            "Linea": "",
+            "CodigoFabricante": sample["CodigoFabricante"],
+        }
+
+        build_start = time.perf_counter()
+        engine = CruceFilterEngine(df)
+        build = time.perf_counter() - build_start
+
+        old, old_df = _best_of(lambda: legacy_search(df, filtros))
+        new, positions = _best_of(lambda: engine.search(
+            referencia=filtros["Referencia"],
+            categoria=filtros["CategoriaNombre"],
+            fabrica=filtros["CodigoFabricante"],
+        ))
+        assert np.array_equal(np.flatnonzero(df.index.isin(old_df.index)), positions)
+
+        print(f"{n_rows:>10,} {build:>9.2f}s {old * 1000:>12.2f} {new * 1000:>10.3f} {old / new:>8.0f}")
+
+
+if __name__ == "__main__":
+    run(tuple(int(a) for a in sys.argv[1:]) or DEFAULT_SIZES)
@@ -0,0 +1,64 @@
+"""
+Latencia por tecla de la búsqueda mientras se escribe (prefijos y n-gramas de
+CruceFilterEngine) contra str.startswith/str.contains de pandas sobre las filas.
+
+Uso:
+    python -m benchmarks.bench_live_search [filas ...]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmarks.bench_filter import make_frame, _best_of
+from utils.filter_engine import CruceFilterEngine, normalize_column
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+WORDS = ("zapato", "bota", "sandalia", "tenis", "correa", "bolso", "media", "gorra")
+COLORS = ("negro", "blanco", "azul", "rojo", "gris", "cafe", "verde")
+
+
+def add_names(df, seed=0):
+    rng = np.random.default_rng(seed)
+    n_names = max(1, len(df) // 6)
+    names = np.char.add(np.char.add(np.array(WORDS)[rng.integers(0, len(WORDS), n_names)], " "),
+                        np.array(COLORS)[rng.integers(0, len(COLORS), n_names)])
+    names = np.char.add(np.char.add(names, " T"), rng.integers(20, 46, n_names).astype(str))
+    df["Nombre"] = names[rng.integers(0, n_names, len(df))].astype(object)
+    return df
+
+
+def keystrokes(text):
+    return [text[:i] for i in range(1, len(text) + 1)]
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'filas':>10} {'campo':<12} {'construir':>10} {'teclas':>7} "
+          f"{'pandas ms/tecla':>16} {'índice ms/tecla':>16}")
+    for n_rows in sizes:
+        df = add_names(make_frame(n_rows))
+        start = time.perf_counter()
+        engine = CruceFilterEngine(df)
+        build = time.perf_counter() - start
+        sample = df.iloc[n_rows // 3]
+
+        cases = (
+            ("codigo", "CodigoBarra", sample["CodigoBarra"], "startswith"),
+            ("referencia", "Referencia", sample["Referencia"].strip().lower(), "startswith"),
+            ("nombre", "Nombre", sample["Nombre"].split(" ", 1)[1].lower(), "contains"),
+        )
+        for field, column, text, method in cases:
+            normalized = normalize_column(column, df[column])
+            typed = keystrokes(text)
+            old_total = new_total = 0.0
+            for partial in typed:
+                old, mask = _best_of(lambda: getattr(normalized.str, method)(partial).to_numpy(), 1)
+                new, positions = _best_of(lambda: engine.search(**{field: partial}, prefix=True), 3)
+                assert np.array_equal(np.flatnonzero(mask), positions), (field, partial)
+                old_total += old
+                new_total += new
+            print(f"{n_rows:>10,} {field:<12} {build:>9.2f}s {len(typed):>7} "
+                  f"{old_total / len(typed) * 1000:>16.2f} {new_total / len(typed) * 1000:>16.3f}")
+
+
+if __name__ == "__main__":
+    run(tuple(int(a) for a in sys.argv[1:]) or DEFAULT_SIZES)
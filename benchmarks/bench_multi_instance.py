@@ -0,0 +1,80 @@
+"""
+Cruce en varias instancias: una tras otra contra todas a la vez (db.multi), sobre
+bases SQLite de prueba distintas (una por instancia). La última corrida agrega una
+instancia que no responde para mostrar que las demás igual entregan su resultado.
+
+SQLite ejecuta el query en el mismo proceso, así que con un solo núcleo las instancias
+no se solapan. Con latencia > 0 cada consulta espera además esos segundos (como la
+ejecución y la red de un SQL Server remoto, que no ocupan al cliente).
+
+Uso:
+    python -m benchmarks.bench_multi_instance [lineas] [instancias] [latencia_s]
+"""
+import os
+import sys
+import time
+import tempfile
+from sqlalchemy import create_engine, event
+
+from benchmarks.fixture import create_fixture
+from db.connection import get_cruce_data_columnar
+from db.multi import INSTANCE_COLUMN, get_cruce_multi, compare_instances
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def add_latency(engine, seconds):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _wait(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+
+def make_engines(n_lines, n_instances, latency=0.0):
+    engines = {}
+    for i in range(n_instances):
+        path = os.path.join(tempfile.gettempdir(), f"cruce_multi_{n_lines}_{i}.db")
+        if not os.path.exists(path):
+            create_fixture(path, n_lines=n_lines, seed=i)
+        engines[f"Instancia {i + 1}"] = create_engine(f"sqlite:///{path}")
+        if latency:
+            # Cada instancia responde más lento que la anterior
+            add_latency(engines[f"Instancia {i + 1}"], latency * (i + 1))
+    return engines
+
+
+def run(n_lines=100_000, n_instances=3, latency=0.0):
+    engines = make_engines(n_lines, n_instances, latency)
+
+    print(f"{'instancia':<14} {'filas':>9} {'segundos':>9}")
+    serial = {}
+    for alias, engine in engines.items():
+        serial[alias] = _timed(lambda: get_cruce_data_columnar(engine))
+        print(f"{alias:<14} {len(serial[alias][1]):>9,} {serial[alias][0]:>9.2f}")
+    total = sum(t for t, _ in serial.values())
+    slowest = max(t for t, _ in serial.values())
+
+    t_multi, (df, errors) = _timed(lambda: get_cruce_multi(engines))
+    assert not errors
+    for alias, (_, expected) in serial.items():
+        assert (df[INSTANCE_COLUMN] == alias).sum() == len(expected), alias
+    t_compare, compared = _timed(lambda: compare_instances(df))
+
+    print(f"\nUna tras otra: {total:.2f} s (la más lenta: {slowest:.2f} s)")
+    print(f"A la vez:      {t_multi:.2f} s, {len(df):,} filas combinadas")
+    print(f"Comparación:   {t_compare:.2f} s, {len(compared):,} filas")
+
+    # Una instancia que no se puede abrir no impide recibir las otras
+    broken = dict(engines, Caida=create_engine("sqlite:////ruta/que/no/existe/cruce.db"))
+    t_broken, (df, errors) = _timed(lambda: get_cruce_multi(broken))
+    print(f"Con una caída: {t_broken:.2f} s, {len(df):,} filas, errores: {sorted(errors)}")
+    for engine in broken.values():
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(*(int(a) for a in args[:2]), *(float(a) for a in args[2:3]))
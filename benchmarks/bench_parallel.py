@@ -0,0 +1,65 @@
+"""
+Compara la lectura serial del cruce con la lectura en paralelo por rangos de
+FechaLlegada (db.parallel) sobre la base SQLite de prueba, y verifica que ambas
+devuelven las mismas filas. La última corrida usa el ajuste automático.
+
+Uso:
+    python -m benchmarks.bench_parallel [lineas] [particiones ...]
+"""
+import os
+import sys
+import time
+import tempfile
+from sqlalchemy import create_engine
+
+from benchmarks.fixture import create_fixture
+from db.connection import get_cruce_data_columnar
+from db.parallel import get_cruce_data_parallel, get_tuner
+
+DEFAULT_PARTITIONS = (2, 4, 8)
+AUTO_RUNS = 5
+KEY = ["FechaLlegada", "CodigoBarra"]
+
+
+def _sorted(df):
+    # Dentro de una misma fecha el orden de las filas no está definido
+    return df.sort_values(KEY, kind="stable").reset_index(drop=True)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(n_lines=200_000, partitions=DEFAULT_PARTITIONS):
+    path = os.path.join(tempfile.gettempdir(), f"cruce_fixture_parallel_{n_lines}.db")
+    if not os.path.exists(path):
+        create_fixture(path, n_lines=n_lines)
+    engine = create_engine(f"sqlite:///{path}")
+
+    serial_t, serial_df = _timed(lambda: get_cruce_data_columnar(engine))
+    expected = _sorted(serial_df)
+    print(f"{'modo':<14} {'filas':>10} {'segundos':>9} {'iguales':>8}")
+    print(f"{'serial':<14} {len(serial_df):>10,} {serial_t:>9.2f} {'-':>8}")
+
+    for n in partitions:
+        t, df = _timed(lambda: get_cruce_data_parallel(engine, partitions=n))
+        same = _sorted(df).equals(expected)
+        print(f"{f'{n} particiones':<14} {len(df):>10,} {t:>9.2f} {str(same):>8}")
+        assert same, f"Resultado distinto con {n} particiones"
+        assert df["FechaLlegada"].is_monotonic_increasing
+
+    tuner = get_tuner(engine)
+    for _ in range(AUTO_RUNS):
+        n = tuner.suggest()
+        t, df = _timed(lambda: get_cruce_data_parallel(engine))
+        assert _sorted(df).equals(expected)
+        print(f"{f'auto ({n})':<14} {len(df):>10,} {t:>9.2f} {'True':>8}")
+    print(f"Particiones elegidas: {tuner.suggest()} (estable: {tuner.settled})")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*args[:1], *([tuple(args[1:])] if len(args) > 1 else []))
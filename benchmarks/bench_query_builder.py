@@ -0,0 +1,130 @@
+"""
+Tiempos del query con predicados empujados (queries.cruce_builder) contra el armado
+anterior (filtros sobre Final2 con ensure_final_where y la fecha pegada en el texto)
+sobre la base SQLite de prueba. La igualdad de resultados la cubre
+tests/test_cruce_builder.py.
+
+Uso:
+    python -m benchmarks.bench_query_builder [lineas]
+"""
+import os
+import re
+import sys
+import time
+import tempfile
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from benchmarks.fixture import create_fixture
+from db.connection import prepare_statement
+from queries.cruce_builder import build_cruce_query
+from queries.query_cruce import get_query_cruce
+
+REPEAT = 3
+
+
+def ensure_final_where(query_base, final_alias="Final2"):
+    """
+    Réplica del ensure_final_where original.
+    """
+    m = re.search(rf"(FROM\s+{final_alias}\b.*)$", query_base, flags=re.IGNORECASE | re.DOTALL)
+    if m:
+        final_clause = m.group(1)
+        if not re.search(r"\bWHERE\b", final_clause, flags=re.IGNORECASE):
+            final_clause += " WHERE 1 = 1"
+        query_base = query_base[:m.start()] + final_clause
+    else:
+        query_base += " WHERE 1 = 1"
+    return query_base
+
+
+def legacy_cruce_sql(codigo_filter=None, referencia_filter=None, categoria_filter=None,
+                     linea_filter=None, fabrica_filter=None, fecha_option=2):
+    """
+    Réplica del armado original de get_cruce_data (texto parchado).
+    """
+    conditions, params = [], {}
+    if codigo_filter:
+        conditions.append("CodigoBarra = :codigoFilter")
+        params["codigoFilter"] = codigo_filter
+    if referencia_filter:
+        conditions.append("LOWER(LTRIM(RTRIM(Final2.CleanReferencia))) = :referenciaFilter")
+        params["referenciaFilter"] = referencia_filter.strip().lower()
+    if categoria_filter:
+        conditions.append("CategoriaNombre = :categoriaFilter")
+        params["categoriaFilter"] = categoria_filter
+    if linea_filter:
+        conditions.append("Linea = :lineaFilter")
+        params["lineaFilter"] = linea_filter
+    if fabrica_filter:
+        conditions.append("CodigoFabricante = :fabricaFilter")
+        params["fabricaFilter"] = fabrica_filter
+
+    fecha_start = '2023-01-01' if fecha_option == 1 else '2024-01-01'
+    base_query = get_query_cruce().strip().rstrip(';').replace(":fechaStart", f"'{fecha_start}'")
+    base_query = ensure_final_where(base_query, "Final2")
+    filter_clause = " AND " + " AND ".join(conditions) if conditions else ""
+    return text(base_query + filter_clause + " ORDER BY FechaLlegada ASC"), params
+
+
+def _run(engine, statement, params):
+    with engine.connect() as conn:
+        result = conn.execute(prepare_statement(engine, statement), params)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    return df.sort_values(["FechaLlegada", "CodigoBarra"], kind="stable").reset_index(drop=True)
+
+
+def _best_of(func):
+    best, result = float("inf"), None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(n_lines=20_000):
+    path = os.path.join(tempfile.gettempdir(), "cruce_fixture_builder.db")
+    engine = create_engine(create_fixture(path, n_lines=n_lines))
+
+    with engine.connect() as conn:
+        sample = conn.execute(text(
+            "SELECT I.CodigoBarra, I.Referencia, C.Nombre, CC.Nombre, I.Fabricante "
+            "FROM INVENTARIO I JOIN CATEGORIAS C ON C.Codigo = I.Categoria "
+            "JOIN CATEGORIAS CC ON CC.Codigo = SUBSTR(C.Codigo, 1, 4) LIMIT 1"
+        )).one()
+
+        # Referencia guardada con espacios y código con espacios en todas sus filas
+        # de tbDimInventario
+        padded_ref = conn.execute(text(
+            "SELECT Referencia FROM INVENTARIO WHERE Referencia LIKE ' %' LIMIT 1")).scalar()
+        padded_code = conn.execute(text(
+            "SELECT LTRIM(RTRIM(D.CodigoBarra)) AS codigo FROM tbDimInventario D "
+            "JOIN tbHecInventario H ON H.dimid_inventario = D.dimID_Inventario "
+            "WHERE D.CodigoBarra LIKE ' %' AND H.Existencia > 0 "
+            "AND NOT EXISTS (SELECT 1 FROM tbDimInventario D2 WHERE D2.CodigoBarra = codigo) "
+            "AND EXISTS (SELECT 1 FROM MOVTRANSFERENCIAS MT WHERE MT.CodigoBarra = codigo) "
+            "LIMIT 1")).scalar()
+
+    cases = {
+        "sin filtros": {},
+        "codigo": {"codigo_filter": sample[0]},
+        "codigo espacios": {"codigo_filter": padded_code},
+        "referencia": {"referencia_filter": f"  {sample[1].lower()} "},
+        "ref espacios": {"referencia_filter": padded_ref.strip().upper()},
+        "categoria": {"categoria_filter": sample[2]},
+        "linea + fabrica": {"linea_filter": sample[3], "fabrica_filter": sample[4]},
+        "fecha 2023": {"fecha_option": 1},
+    }
+
+    print(f"{'caso':<16} {'filas':>8} {'anterior ms':>12} {'nuevo ms':>10} {'iguales':>8}")
+    for name, filters in cases.items():
+        old, old_df = _best_of(lambda: _run(engine, *legacy_cruce_sql(**filters)))
+        new, new_df = _best_of(lambda: _run(engine, *build_cruce_query(**filters)))
+        same = old_df.equals(new_df)
+        print(f"{name:<16} {len(new_df):>8,} {old * 1000:>12.1f} {new * 1000:>10.1f} {str(same):>8}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:2]))
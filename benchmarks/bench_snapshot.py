@@ -0,0 +1,96 @@
+"""
+Tabla resumen del cruce (db.snapshot) sobre una copia de la base SQLite de prueba:
+tiempos de la actualización completa, de la lectura desde la tabla contra el query
+del cruce con y sin filtros, y de la actualización incremental después de agregar
+transferencias recientes y cambiar existencias. Que la tabla devuelva lo mismo que el
+query lo cubre tests/test_snapshot.py.
+
+Uso:
+    python -m benchmarks.bench_snapshot [lineas]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+
+from benchmarks.fixture import create_fixture
+from db.connection import get_cruce_data_columnar, set_read_mode
+from db.snapshot import refresh_snapshot
+
+FILTERS = (
+    {},
+    {"fecha_option": 1},
+    {"categoria_filter": "Categoria 3"},
+    {"fabrica_filter": "F001"},
+    {"codigo_filter": "770000000005", "fecha_option": 1},
+)
+NEW_TRANSFERS = 50
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def compare(engine):
+    print(f"{'filtros':<52} {'filas':>8} {'query s':>8} {'resumen s':>10}")
+    for filters in FILTERS:
+        set_read_mode("live")
+        t_live, live = _timed(lambda: get_cruce_data_columnar(engine, **filters))
+        set_read_mode("snapshot")
+        t_snap, snap = _timed(lambda: get_cruce_data_columnar(engine, **filters))
+        print(f"{str(filters or 'sin filtros'):<52} {len(live):>8,} {t_live:>8.2f} {t_snap:>10.3f}")
+
+
+def add_recent_transfers(path):
+    """
+    Transferencias de los últimos días y más existencia donde ya había.
+    """
+    conn = sqlite3.connect(path)
+    numero = conn.execute("SELECT MAX(numero) FROM TRANSFERENCIAS").fetchone()[0]
+    now = datetime.now()
+    for i in range(1, NEW_TRANSFERS + 1):
+        fecha = (now - timedelta(days=i % 3, hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("INSERT INTO TRANSFERENCIAS VALUES (?, ?, 0, '', 'J-1-0')", (numero + i, fecha))
+        conn.execute("INSERT INTO MOVTRANSFERENCIAS SELECT ?, CodigoBarra, 7 FROM INVENTARIO "
+                     "LIMIT 20 OFFSET ?", (numero + i, i * 37))
+    # Solo ubicaciones con existencia: una nueva cambiaría CantidadInicial de fechas
+    # viejas (BodegaCTE tiene una fila por ubicación), que solo corrige la completa
+    conn.execute("UPDATE tbHecInventario SET Existencia = Existencia + 3 "
+                 "WHERE Existencia > 0 AND dimid_inventario % 7 = 0")
+    conn.commit()
+    conn.close()
+
+
+def run(n_lines=100_000):
+    source = os.path.join(tempfile.gettempdir(), f"cruce_suite_{n_lines}_0.db")
+    if not os.path.exists(source):
+        create_fixture(source, n_lines=n_lines)
+    path = os.path.join(tempfile.mkdtemp(), "cruce_snapshot.db")
+    shutil.copy(source, path)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        report = refresh_snapshot(engine)
+        print(f"Actualización completa: {report['rows_total']:,} filas en {report['seconds']:.2f}s\n")
+        compare(engine)
+
+        add_recent_transfers(path)
+        report = refresh_snapshot(engine)
+        print(f"\nActualización {report['mode']} desde {report['desde']}: "
+              f"{report['rows_fetched']:,} de {report['rows_total']:,} filas en {report['seconds']:.2f}s")
+        full = _timed(lambda: refresh_snapshot(engine, full=True))[0]
+        print(f"(la completa tarda {full:.2f}s)\n")
+        compare(engine)
+    finally:
+        set_read_mode("live")
+        engine.dispose()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,55 @@
+"""
+Orden por encabezado: CruceFilterEngine.sort_positions (permutación guardada por
+columna, cruzada con las posiciones del filtro) contra ordenar la vista filtrada con
+DataFrame.sort_values en cada clic. Se mide sobre la vista completa, la mitad de las
+filas y un filtro chico.
+
+Uso:
+    python -m benchmarks.bench_sort [filas]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_filter import make_frame, _best_of
+from utils.filter_engine import CruceFilterEngine
+from utils.postprocess import compact_dtypes
+
+COLUMNS = ("ExistenciaActual", "Vendido", "Marca", "CodigoBarra", "FechaLlegada")
+FRACTIONS = (1.0, 0.5, 0.01)
+
+
+def add_columns(df, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    df["ExistenciaActual"] = rng.integers(-5, 500, n)
+    df["Vendido"] = np.where(rng.random(n) < 0.05, np.nan, rng.random(n) * 100)
+    df["FechaLlegada"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 600, n), unit="D")
+    return df
+
+
+def run(n_rows=1_000_000):
+    df, _ = compact_dtypes(add_columns(make_frame(n_rows)))
+    engine = CruceFilterEngine(df)
+    rng = np.random.default_rng(1)
+
+    print(f"{'columna':<18} {'filas':>10} {'primera vez ms':>15} {'pandas ms':>10} {'permutación ms':>15}")
+    for column in COLUMNS:
+        start = time.perf_counter()
+        engine.sort_order(column)
+        first = time.perf_counter() - start
+        for fraction in FRACTIONS:
+            positions = None if fraction == 1.0 else \
+                np.sort(rng.choice(n_rows, int(n_rows * fraction), replace=False))
+            view = df if positions is None else df.iloc[positions]
+            old, expected = _best_of(
+                lambda: view[column].sort_values(kind="stable", na_position="last").index.to_numpy(), 1)
+            engine.sort_positions(column, positions)  # rango para filtros chicos
+            new, got = _best_of(lambda: engine.sort_positions(column, positions), 3)
+            assert np.array_equal(got, expected), column
+            print(f"{column:<18} {len(got):>10,} {first * 1000:>15.0f} {old * 1000:>10.1f} {new * 1000:>15.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
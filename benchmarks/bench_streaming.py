@@ -0,0 +1,109 @@
+"""
+Pico de memoria (RSS) al exportar el cruce a CSV juntando todo el resultado
+(get_cruce_data_df + export_frame) contra el camino por bloques
+(iter_cruce_frames + export_frames) y los totales por categoría (aggregate_frames).
+Cada medición corre en un proceso aparte; la lectura usa la tabla resumen para que
+el tiempo del query no tape al de la lectura y la escritura.
+
+Uso:
+    python -m benchmarks.bench_streaming [lineas ...]
+"""
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+from sqlalchemy import create_engine
+
+from benchmarks.fixture import create_fixture
+
+DEFAULT_SIZES = (100_000, 300_000)
+MODES = ("df", "bloques", "agrupar")
+CHUNK_ROWS = 10_000
+
+
+def _rss_mb():
+    # ru_maxrss viene en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, path, n_lines=None):
+    """
+    Corre una exportación en este proceso e imprime filas, segundos, RSS inicial y pico.
+    Con mode "preparar" solo copia la base de prueba y crea la tabla resumen.
+    """
+    if mode == "preparar":
+        from db.snapshot import refresh_snapshot
+        source = os.path.join(tempfile.gettempdir(), f"cruce_suite_{n_lines}_0.db")
+        if not os.path.exists(source):
+            create_fixture(source, n_lines=n_lines)
+        shutil.copy(source, path)
+        engine = create_engine(f"sqlite:///{path}")
+        refresh_snapshot(engine, full=True)
+        engine.dispose()
+        return
+    from db.connection import get_cruce_data_df, iter_cruce_frames, set_read_mode
+    from utils.exporter import export_frame, export_frames
+    from utils.postprocess import aggregate_frames
+
+    engine = create_engine(f"sqlite:///{path}")
+    set_read_mode("snapshot")
+    output = os.path.join(os.path.dirname(path), f"salida_{mode}.csv")
+    base = _rss_mb()
+    start = time.perf_counter()
+    if mode == "df":
+        df = get_cruce_data_df(engine)
+        rows = len(df)
+        export_frame(df, output)
+    elif mode == "bloques":
+        sizes = []
+
+        def _counted(frames):
+            for chunk in frames:
+                sizes.append(len(chunk))
+                yield chunk
+
+        export_frames(_counted(iter_cruce_frames(engine, chunk_rows=CHUNK_ROWS, columns=None)), output)
+        rows = sum(sizes)
+    else:
+        totals = aggregate_frames(iter_cruce_frames(engine, chunk_rows=CHUNK_ROWS), "CategoriaNombre")
+        rows = int(totals["Filas"].sum())
+        export_frame(totals, output)
+    print(rows, time.perf_counter() - start, base, _rss_mb())
+    engine.dispose()
+
+
+def _child(*args):
+    # Proceso aparte también para preparar: ru_maxrss del hijo parte del pico del padre
+    return subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming", "--hijo", *args],
+                          capture_output=True, text=True, check=True)
+
+
+def _measure(mode, path):
+    out = _child(mode, path)
+    rows, seconds, base, peak = out.stdout.split()[-4:]
+    return int(rows), float(seconds), float(base), float(peak)
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'lineas':>8} {'modo':<8} {'filas':>8} {'seg':>7} {'RSS base MB':>12} "
+          f"{'RSS pico MB':>12} {'extra MB':>9}")
+    for n_lines in sizes:
+        path = os.path.join(tempfile.mkdtemp(), "cruce.db")
+        try:
+            _child("preparar", path, str(n_lines))
+            for mode in MODES:
+                rows, seconds, base, peak = _measure(mode, path)
+                print(f"{n_lines:>8,} {mode:<8} {rows:>8,} {seconds:>7.2f} {base:>12.1f} "
+                      f"{peak:>12.1f} {peak - base:>9.1f}")
+        finally:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--hijo":
+        child(sys.argv[2], sys.argv[3], *map(int, sys.argv[4:]))
+    else:
+        run([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
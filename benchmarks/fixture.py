@@ -0,0 +1,187 @@
+"""
+Base SQLite de prueba con las tablas que usa el query de cruce.
+
+Los nombres de tabla y columnas son los del servidor; los prefijos [BD].dbo. se
+quitan al traducir el query con queries.sqlite_compat.to_sqlite. Las columnas de
+texto que el servidor compara sin distinguir mayúsculas usan COLLATE NOCASE, salvo
+INVENTARIO.Referencia: como en la base real, algunas referencias y códigos de
+tbDimInventario traen espacios o mayúsculas distintas, que el cruce normaliza.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE tbDimInventario (dimID_Inventario INTEGER PRIMARY KEY, CodigoBarra TEXT, Fabricante TEXT);
+CREATE TABLE tbHecInventario (dimid_inventario INTEGER, Existencia INTEGER);
+CREATE TABLE tbDimFabricantes (Codigo TEXT PRIMARY KEY, Nombre TEXT);
+CREATE TABLE CATEGORIAS (Codigo TEXT PRIMARY KEY, Nombre TEXT COLLATE NOCASE);
+CREATE TABLE MARCAS (Codigo TEXT PRIMARY KEY, Nombre TEXT COLLATE NOCASE);
+CREATE TABLE FABRICANTES (Codigo TEXT PRIMARY KEY, Nombre TEXT COLLATE NOCASE);
+CREATE TABLE INVENTARIO (
+    CodigoBarra TEXT PRIMARY KEY, Referencia TEXT, CodigoMarca TEXT,
+    Nombre TEXT, Categoria TEXT, Fabricante TEXT
+);
+CREATE TABLE TRANSFERENCIAS (
+    numero INTEGER PRIMARY KEY, Fecha TEXT, correccion INTEGER, observacion TEXT, CodigoRecibe TEXT
+);
+CREATE TABLE MOVTRANSFERENCIAS (Numero INTEGER, CodigoBarra TEXT, Cantidad INTEGER);
+CREATE INDEX ix_mov_numero ON MOVTRANSFERENCIAS (Numero);
+CREATE INDEX ix_mov_codigo ON MOVTRANSFERENCIAS (CodigoBarra);
+CREATE INDEX ix_inv_referencia ON INVENTARIO (Referencia);
+CREATE INDEX ix_inv_fabricante ON INVENTARIO (Fabricante);
+CREATE INDEX ix_transf_fecha ON TRANSFERENCIAS (Fecha);
+CREATE INDEX ix_diminv_codigo ON tbDimInventario (CodigoBarra);
+CREATE INDEX ix_hecinv_dim ON tbHecInventario (dimid_inventario);
+"""
+
+EXCLUDED_RECEIVER = "J-40610499-0"
+
+# Escalas con nombre para los benchmarks (líneas de MOVTRANSFERENCIAS)
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "5m": 5_000_000}
+
+INSERT_BATCH = 200_000
+
+# Uno de cada PADDED_EVERY productos trae la referencia con espacios o en otro caso,
+# y una de cada PADDED_EVERY filas de tbDimInventario el código con espacios
+PADDED_EVERY = 20
+
+
+def cardinalities(n_lines):
+    """
+    Tamaño de cada tabla para n_lines líneas de transferencia. Las dimensiones
+    crecen más lento que las transferencias, como en la base real.
+    """
+    return {
+        "products": int(min(max(10, n_lines // 8), 400_000)),
+        "transfers": max(5, n_lines // 20),
+        "lineas": int(min(40, max(6, n_lines ** 0.25))),
+        "categories": int(min(800, max(30, n_lines ** 0.5 // 2))),
+        "brands": int(min(2_000, max(40, n_lines ** 0.5))),
+        "makers": int(min(400, max(20, n_lines ** 0.5 // 3))),
+    }
+
+
+def _insert(cur, table, columns):
+    """
+    Inserta columnas (listas o arreglos del mismo largo) por lotes.
+    """
+    n = len(columns[0])
+    placeholders = ", ".join("?" * len(columns))
+    for start in range(0, n, INSERT_BATCH):
+        batch = [c[start:start + INSERT_BATCH] for c in columns]
+        batch = [b.tolist() if isinstance(b, np.ndarray) else b for b in batch]
+        cur.executemany(f"INSERT INTO {table} VALUES ({placeholders})", zip(*batch))
+
+
+def _popular(rng, n_items, size, skew=2.5):
+    """
+    Índices en [0, n_items) con pocos elementos muy frecuentes (como los productos
+    más transferidos) y una cola larga de poco movimiento.
+    """
+    return np.minimum((n_items * rng.random(size) ** skew).astype(np.int64), n_items - 1)
+
+
+def _padded_references(n_products):
+    """
+    Referencias REF-n (compartidas por dos productos) con algunas variantes con
+    espacios, en minúsculas o capitalizadas.
+    """
+    refs = np.char.add("REF-", (np.arange(n_products) % (n_products // 2 + 1)).astype(str))
+    refs = refs.astype(object)
+    variant = np.arange(n_products) % PADDED_EVERY
+    refs[variant == 1] = [f"  {r.lower()} " for r in refs[variant == 1]]
+    refs[variant == 2] = [f"{r.title()}   " for r in refs[variant == 2]]
+    return refs
+
+
+def create_fixture(path, n_lines=10_000, seed=0, days=900):
+    """
+    Crea (o reemplaza) la base en 'path' con n_lines líneas de transferencia.
+    Retorna la URL de SQLAlchemy para usarla como instancia de prueba.
+    """
+    rng = np.random.default_rng(seed)
+    sizes = cardinalities(n_lines)
+    n_products, n_transfers = sizes["products"], sizes["transfers"]
+
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;")
+        cur.executescript(";".join(
+            f"DROP TABLE IF EXISTS {t}" for t in (
+                "tbDimInventario", "tbHecInventario", "tbDimFabricantes", "CATEGORIAS", "MARCAS",
+                "FABRICANTES", "INVENTARIO", "TRANSFERENCIAS", "MOVTRANSFERENCIAS")
+        ))
+        cur.executescript(SCHEMA)
+
+        # Líneas (códigos de 4) y categorías (códigos de 6 que empiezan con su línea)
+        lineas = [f"{i:04d}" for i in range(1, sizes["lineas"] + 1)]
+        cat_lineas = rng.choice(lineas, sizes["categories"])
+        categorias = [f"{linea}{i:02d}" for i, linea in enumerate(cat_lineas)]
+        _insert(cur, "CATEGORIAS", [
+            lineas + categorias,
+            [f"Linea {c}" for c in lineas] + [f"Categoria {i}" for i in range(len(categorias))],
+        ])
+        _insert(cur, "MARCAS", [[f"M{i}" for i in range(sizes["brands"])],
+                                [f"Marca {i}" for i in range(sizes["brands"])]])
+        fabricantes = [[f"F{i:03d}" for i in range(sizes["makers"])],
+                       [f"Fabricante {i}" for i in range(sizes["makers"])]]
+        _insert(cur, "FABRICANTES", fabricantes)
+        _insert(cur, "tbDimFabricantes", fabricantes)
+
+        codigos = np.char.add("77", np.char.zfill(np.arange(n_products).astype(str), 10))
+        prod_fabricante = np.char.add("F", np.char.zfill(
+            _popular(rng, sizes["makers"], n_products, 1.8).astype(str), 3))
+        _insert(cur, "INVENTARIO", [
+            codigos,
+            _padded_references(n_products),
+            np.char.add("M", _popular(rng, sizes["brands"], n_products, 2.0).astype(str)),
+            np.char.add("Producto ", np.arange(n_products).astype(str)),
+            np.array(categorias)[_popular(rng, len(categorias), n_products, 1.5)],
+            prod_fabricante,
+        ])
+
+        # Existencias en BODEGA_DATOS: de 0 a 3 ubicaciones por producto
+        ubicaciones = rng.integers(0, 4, n_products)
+        dim_codigo = np.repeat(np.arange(n_products), ubicaciones)
+        n_dim = len(dim_codigo)
+        dim_codigos = codigos[dim_codigo].astype(object)
+        dim_codigos[::PADDED_EVERY] = [f" {c}  " for c in dim_codigos[::PADDED_EVERY]]
+        _insert(cur, "tbDimInventario", [np.arange(1, n_dim + 1), dim_codigos,
+                                         prod_fabricante[dim_codigo]])
+        _insert(cur, "tbHecInventario", [np.arange(1, n_dim + 1), rng.integers(0, 61, n_dim)])
+
+        now = datetime.now()
+        offsets = rng.uniform(0, days * 86400, n_transfers)
+        fechas = [(now - timedelta(seconds=float(s))).strftime("%Y-%m-%d %H:%M:%S") for s in offsets]
+        numeros = np.arange(1, n_transfers + 1)
+        receptores = np.char.add("J-", np.char.add(
+            np.char.zfill(rng.integers(0, 10**8, n_transfers).astype(str), 8), "-0"))
+        receptores[rng.random(n_transfers) < 0.03] = EXCLUDED_RECEIVER
+        _insert(cur, "TRANSFERENCIAS", [
+            numeros, fechas, (rng.random(n_transfers) < 0.05).astype(int),
+            np.where(rng.random(n_transfers) < 0.8, "", np.char.add("Obs ", numeros.astype(str))),
+            receptores,
+        ])
+
+        _insert(cur, "MOVTRANSFERENCIAS", [
+            rng.integers(1, n_transfers + 1, n_lines),
+            codigos[_popular(rng, n_products, n_lines)],
+            rng.integers(1, 49, n_lines),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    return f"sqlite:///{path}"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Crea la base SQLite de prueba del cruce.")
+    parser.add_argument("ruta")
+    parser.add_argument("--escala", choices=list(SCALES), default="10k")
+    parser.add_argument("--lineas", type=int, help="Líneas de transferencia (reemplaza --escala)")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    print(create_fixture(args.ruta, n_lines=args.lineas or SCALES[args.escala], seed=args.semilla))
@@ -0,0 +1,262 @@
+"""
+Suite de rendimiento del cruce sobre la base SQLite de prueba (benchmarks.fixture).
+
+Mide por separado cada etapa: query (hasta el primer lote), fetch (resto de filas),
+armado del DataFrame, motor de filtros, pintado de la grilla virtual y exportación.
+Escribe los resultados en JSON para comparar entre versiones.
+
+Uso:
+    python -m benchmarks.suite --escala 100k --salida resultados.json
+    python -m benchmarks.suite --escala 100k --comparar resultados_anteriores.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import create_engine
+
+from benchmarks.fixture import SCALES, create_fixture
+from db.columnar import ColumnBuffer, FETCH_BATCH_SIZE, _type_codes
+from db.connection import prepare_statement
+from queries.cruce_builder import build_cruce_query
+from utils.display import CRUCE_COLUMNS
+from utils.exporter import export_frame
+from utils.filter_engine import CruceFilterEngine
+from utils.postprocess import add_percentage_columns, compact_dtypes
+from views.virtual_tree import VirtualTreeview
+
+SEARCHES = 20
+SCROLL_PAGES = 200
+EXPORT_FORMATS = ("xlsx", "csv", "parquet")
+DEFAULT_TOLERANCE = 0.2
+
+
+class _HeadlessTree:
+    """
+    Sustituto mínimo de ttk.Treeview/Scrollbar para medir la grilla virtual sin pantalla.
+    """
+
+    def __init__(self, height=30):
+        self.height = height
+        self.items = {}
+
+    def cget(self, option):
+        return self.height
+
+    def configure(self, **kwargs):
+        pass
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def set(self, *args):
+        pass
+
+    def insert(self, parent, index, values=()):
+        iid = f"I{len(self.items)}"
+        self.items[iid] = values
+        return iid
+
+    def move(self, iid, parent, index):
+        pass
+
+    def detach(self, *iids):
+        pass
+
+    def item(self, iid, values=None):
+        self.items[iid] = values
+
+    def selection(self):
+        return ()
+
+    def selection_remove(self, items):
+        pass
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage(results, name, seconds, rows, **extra):
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "rows": int(rows),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+        **extra,
+    }
+    print(f"{name:<16} {seconds:>9.3f}s {rows:>12,} filas")
+
+
+def bench_fetch(engine, results, fecha_option=2):
+    """
+    query: ejecución hasta el primer lote; fetch: el resto de las filas; dataframe: armado y tipos.
+    """
+    statement, params = build_cruce_query(fecha_option=fecha_option)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        result = conn.execution_options(stream_results=True).execute(
+            prepare_statement(engine, statement), params)
+        buffer = ColumnBuffer(result.keys(), _type_codes(result))
+        buffer.extend(result.fetchmany(FETCH_BATCH_SIZE))
+        _stage(results, "query", time.perf_counter() - start, len(buffer))
+
+        start = time.perf_counter()
+        while True:
+            rows = result.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            buffer.extend(rows)
+        _stage(results, "fetch", time.perf_counter() - start, len(buffer))
+
+    n_rows = len(buffer)
+    start = time.perf_counter()
+    df, _ = compact_dtypes(add_percentage_columns(buffer.to_frame(CRUCE_COLUMNS)))
+    df = df[[c for c in CRUCE_COLUMNS if c in df.columns]]
+    _stage(results, "dataframe", time.perf_counter() - start, n_rows,
+           bytes=int(df.memory_usage(deep=True).sum()))
+    return df
+
+
+def bench_filter(df, results, seed=0):
+    """
+    Construcción del motor de filtros y latencia media de búsquedas típicas.
+    """
+    start = time.perf_counter()
+    engine = CruceFilterEngine(df)
+    _stage(results, "filter_build", time.perf_counter() - start, len(df))
+
+    rng = np.random.default_rng(seed)
+    sample = df.iloc[rng.integers(0, len(df), SEARCHES)] if len(df) else df
+    searches = []
+    for _, row in sample.iterrows():
+        searches += [{"codigo": row["CodigoBarra"]}, {"categoria": row["CategoriaNombre"]},
+                     {"linea": row["Linea"], "ranges": {"Vendido": [(">", 50.0)]}}]
+    start = time.perf_counter()
+    matched = 0
+    for kwargs in searches:
+        positions = engine.search(**kwargs)
+        matched += 0 if positions is None else len(positions)
+    elapsed = time.perf_counter() - start
+    _stage(results, "filter", elapsed / max(1, len(searches)), len(df),
+           searches=len(searches), matched_rows=matched)
+    return engine.search(linea=df["Linea"].iloc[0]) if len(df) else None
+
+
+def bench_tree(df, positions, results):
+    """
+    Pintado inicial de la grilla virtual, desplazamiento por páginas y cambio de filtro.
+    """
+    tree = _HeadlessTree()
+    grid = VirtualTreeview(tree, _HeadlessTree())
+    start = time.perf_counter()
+    grid.set_frame(df)
+    for _ in range(SCROLL_PAGES):
+        grid.yview("scroll", 1, "pages")
+    grid.set_frame(df, positions)
+    grid.yview("moveto", 0.5)
+    _stage(results, "tree", time.perf_counter() - start, len(df), pages=SCROLL_PAGES)
+
+
+def bench_export(df, results, formats, folder):
+    for fmt in formats:
+        path = os.path.join(folder, f"cruce_bench.{fmt}")
+        start = time.perf_counter()
+        export_frame(df, path)
+        _stage(results, f"export_{fmt}", time.perf_counter() - start, len(df),
+               bytes=os.path.getsize(path))
+        os.remove(path)
+
+
+def compare(current, previous, tolerance=DEFAULT_TOLERANCE):
+    """
+    Imprime la razón actual/anterior por etapa. Retorna las etapas más lentas que la tolerancia.
+    """
+    regressions = []
+    print(f"\n{'etapa':<16} {'anterior s':>11} {'actual s':>10} {'razón':>7}")
+    for name, stage in current["stages"].items():
+        before = previous.get("stages", {}).get(name)
+        if not before or not before["seconds"]:
+            continue
+        ratio = stage["seconds"] / before["seconds"]
+        flag = "  REGRESIÓN" if ratio > 1 + tolerance else ""
+        print(f"{name:<16} {before['seconds']:>11.3f} {stage['seconds']:>10.3f} {ratio:>7.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def run(n_lines, seed=0, formats=EXPORT_FORMATS, db_path=None, regenerate=False):
+    db_path = db_path or os.path.join(tempfile.gettempdir(), f"cruce_suite_{n_lines}_{seed}.db")
+    if regenerate or not os.path.exists(db_path):
+        start = time.perf_counter()
+        create_fixture(db_path, n_lines=n_lines, seed=seed)
+        print(f"Base de prueba creada en {time.perf_counter() - start:.1f}s: {db_path}")
+
+    stages = {}
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        df = bench_fetch(engine, stages)
+    finally:
+        engine.dispose()
+    positions = bench_filter(df, stages, seed)
+    bench_tree(df, positions, stages)
+    with tempfile.TemporaryDirectory() as folder:
+        bench_export(df, stages, formats, folder)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "lineas": n_lines,
+            "semilla": seed,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "sqlalchemy": sqlalchemy.__version__,
+            "plataforma": platform.platform(),
+        },
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suite de rendimiento del cruce.")
+    parser.add_argument("--escala", choices=list(SCALES), default="10k")
+    parser.add_argument("--lineas", type=int, help="Líneas de transferencia (reemplaza --escala)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--base", help="Ruta de la base SQLite (se reutiliza si existe)")
+    parser.add_argument("--regenerar", action="store_true", help="Vuelve a crear la base")
+    parser.add_argument("--formatos", default=",".join(EXPORT_FORMATS),
+                        help="Formatos de exportación a medir, separados por coma")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    formats = [f for f in args.formatos.split(",") if f]
+    results = run(args.lineas or SCALES[args.escala], args.semilla, formats, args.base, args.regenerar)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerancia)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Extracción del cruce sin interfaz gráfica (para tareas programadas).
+
+Un solo filtro:
+    python cli.py --instancia "Servidor DOS" --categoria ZAPATOS --salida cruce.xlsx
+
+Varios filtros desde un archivo JSON (lista de objetos con las mismas claves que
+los argumentos: nombre, codigo, referencia, categoria, linea, fabrica, fecha_option,
+salida, agrupar), ejecutados en paralelo sobre el mismo pool de conexiones:
+    python cli.py --lote filtros.json --directorio salidas --formato csv --hilos 4
+
+El cruce se lee y se escribe por bloques (iter_cruce_frames): la memoria no crece
+con el tamaño del resultado. --bloques fija cuántos bloques se leen por adelantado.
+Con --agrupar se exportan los totales por esas columnas en lugar de las filas:
+    python cli.py --agrupar CategoriaNombre,Linea --salida totales.csv
+
+Tabla resumen del cruce en el servidor (db.snapshot), para una tarea programada;
+--completo la recrea en lugar de actualizar solo las fechas recientes:
+    python cli.py --instancia "Servidor DOS" --actualizar-resumen
+
+Con --lectura snapshot las extracciones leen esa tabla si está vigente.
+
+No importa tkinter ni customtkinter.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from db.connection import (
+    PREDEFINED_INSTANCES, POOL_OPTIONS, READ_MODES, get_engine, get_db_connection_for,
+    STREAM_MAX_CHUNKS, get_cruce_data_df, iter_cruce_frames, dispose_all_engines, set_read_mode,
+    url_key
+)
+from utils.exporter import EXPORT_FORMATS, export_frame, export_frames
+from utils.postprocess import aggregate_frames
+
+FILTER_KEYS = ("codigo", "referencia", "categoria", "linea", "fabrica")
+DEFAULT_FORMAT = "xlsx"
+DEFAULT_WORKERS = 4
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el cruce de inventario sin interfaz gráfica.")
+    origen = parser.add_mutually_exclusive_group()
+    origen.add_argument("--instancia", choices=list(PREDEFINED_INSTANCES),
+                        default=list(PREDEFINED_INSTANCES)[0], help="Instancia predefinida")
+    origen.add_argument("--url", help="URL de SQLAlchemy (p. ej. una base SQLite de prueba)")
+
+    for key in FILTER_KEYS:
+        parser.add_argument(f"--{key}", help=f"Filtro por {key}")
+    parser.add_argument("--fecha-option", type=int, choices=(1, 2), default=2,
+                        help="1: desde 2023-01-01, 2: desde 2024-01-01")
+
+    parser.add_argument("--salida", help="Archivo de salida (modo de un solo filtro)")
+    parser.add_argument("--lote", help="Archivo JSON con una lista de filtros")
+    parser.add_argument("--directorio", default=".", help="Carpeta de salida para los trabajos del lote")
+    parser.add_argument("--formato", choices=[e.lstrip(".") for e in EXPORT_FORMATS],
+                        help="Formato si la salida no trae extensión (por defecto xlsx)")
+    parser.add_argument("--hilos", type=int, default=DEFAULT_WORKERS,
+                        help="Trabajos del lote que corren a la vez")
+    parser.add_argument("--particiones", default=None,
+                        help="Lee cada trabajo en paralelo por rangos de fecha: un número o 'auto' "
+                             "(apagado por defecto; cada rango recalcula la existencia, ver db.parallel)")
+    parser.add_argument("--agrupar", help="Columnas separadas por coma: exporta sus totales")
+    parser.add_argument("--bloques", type=int, default=STREAM_MAX_CHUNKS,
+                        help="Bloques del cruce leídos por adelantado (0: sin hilo lector)")
+    parser.add_argument("--lectura", choices=READ_MODES,
+                        help="live: query del cruce; snapshot: tabla resumen si está vigente")
+    parser.add_argument("--actualizar-resumen", action="store_true",
+                        help="Actualiza la tabla resumen del cruce en el servidor y termina")
+    parser.add_argument("--completo", action="store_true",
+                        help="Con --actualizar-resumen, recrea la tabla completa")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.lote and not args.salida and not args.actualizar_resumen:
+        parser.error("Indique --salida, --lote o --actualizar-resumen.")
+    if args.particiones not in (None, "auto") and not args.particiones.isdigit():
+        parser.error("--particiones debe ser un número o 'auto'.")
+    capacity = POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"]
+    if args.particiones not in (None, "auto") and int(args.particiones) > capacity:
+        parser.error(f"--particiones no puede pasar de {capacity} (conexiones del pool).")
+    return args
+
+
+def _output_path(path, formato):
+    """
+    Agrega la extensión del formato si la ruta no trae una conocida.
+    """
+    if os.path.splitext(path)[1].lower() in EXPORT_FORMATS:
+        return path
+    return f"{path}.{formato or DEFAULT_FORMAT}"
+
+
+def load_jobs(args):
+    """
+    Lista de trabajos (dicts con nombre, filtros, fecha_option y salida).
+    """
+    if not args.lote:
+        job = {key: getattr(args, key) for key in FILTER_KEYS}
+        job.update(nombre="cruce", fecha_option=args.fecha_option, agrupar=args.agrupar,
+                   salida=_output_path(args.salida, args.formato))
+        return [job]
+
+    with open(args.lote, encoding="utf-8") as fh:
+        entries = json.load(fh)
+    if not isinstance(entries, list):
+        raise ValueError("El archivo de lote debe contener una lista de filtros.")
+
+    jobs = []
+    for i, entry in enumerate(entries, 1):
+        unknown = set(entry) - set(FILTER_KEYS) - {"nombre", "fecha_option", "salida", "agrupar"}
+        if unknown:
+            raise ValueError(f"Trabajo {i}: claves no reconocidas {sorted(unknown)}")
+        nombre = entry.get("nombre") or f"cruce_{i}"
+        salida = entry.get("salida") or os.path.join(args.directorio, nombre)
+        job = {key: entry.get(key) for key in FILTER_KEYS}
+        job.update(nombre=nombre, fecha_option=int(entry.get("fecha_option", args.fecha_option)),
+                   agrupar=entry.get("agrupar", args.agrupar),
+                   salida=_output_path(salida, args.formato))
+        jobs.append(job)
+    return jobs
+
+
+def _timed_frames(frames, result):
+    """
+    Pasa los bloques contando filas y sumando en result["consulta_s"] el tiempo que
+    se espera cada uno (el resto del trabajo es escritura).
+    """
+    frames = iter(frames)
+    try:
+        while True:
+            start = time.perf_counter()
+            df = next(frames, None)
+            result["consulta_s"] += time.perf_counter() - start
+            if df is None:
+                return
+            result["filas"] += len(df)
+            yield df
+    finally:
+        close = getattr(frames, "close", None)
+        if close is not None:
+            close()
+
+
+def run_job(engine, job, partitions=None, max_in_flight=STREAM_MAX_CHUNKS):
+    """
+    Ejecuta un trabajo y retorna su resumen (filas, segundos de consulta y de escritura).
+    El cruce se exporta bloque por bloque a medida que llega; con partitions se lee
+    completo en paralelo (db.parallel) y se exporta al final.
+    """
+    result = {"nombre": job["nombre"], "salida": job["salida"], "filas": 0,
+              "consulta_s": 0.0, "escritura_s": 0.0, "error": None}
+    filters = dict(codigo_filter=job["codigo"], referencia_filter=job["referencia"],
+                   categoria_filter=job["categoria"], linea_filter=job["linea"],
+                   fabrica_filter=job["fabrica"], fecha_option=job["fecha_option"])
+    try:
+        start = time.perf_counter()
+        folder = os.path.dirname(job["salida"])
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if partitions:
+            frames = [get_cruce_data_df(engine, partitions=partitions, **filters)]
+        else:
+            # columns=None: las columnas en el orden del query, como get_cruce_data_df
+            frames = iter_cruce_frames(engine, max_in_flight=max_in_flight, columns=None, **filters)
+        frames = _timed_frames(frames, result)
+        if job.get("agrupar"):
+            by = [c.strip() for c in job["agrupar"].split(",") if c.strip()]
+            export_frame(aggregate_frames(frames, by), job["salida"])
+        else:
+            export_frames(frames, job["salida"])
+        result["escritura_s"] = time.perf_counter() - start - result["consulta_s"]
+    except Exception as e:
+        logging.exception("Falló el trabajo '%s'", job["nombre"])
+        result["error"] = str(e)
+    return result
+
+
+def run_jobs(engine, jobs, workers=DEFAULT_WORKERS, partitions=None, max_in_flight=STREAM_MAX_CHUNKS):
+    """
+    Corre los trabajos en paralelo; todos comparten el pool del engine.
+    """
+    workers = max(1, min(workers, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cruce") as pool:
+        return list(pool.map(lambda job: run_job(engine, job, partitions, max_in_flight), jobs))
+
+
+def print_summary(results, elapsed):
+    print(f"{'trabajo':<24} {'filas':>10} {'consulta s':>11} {'escritura s':>12}  estado")
+    for r in results:
+        estado = "ok" if r["error"] is None else f"error: {r['error']}"
+        print(f"{r['nombre']:<24} {r['filas']:>10,} {r['consulta_s']:>11.2f} "
+              f"{r['escritura_s']:>12.2f}  {estado}")
+    total_rows = sum(r["filas"] for r in results)
+    print(f"{len(results)} trabajos, {total_rows:,} filas en {elapsed:.2f}s")
+
+
+def refresh_summary(args):
+    """
+    Actualiza la tabla resumen del cruce e imprime el reporte.
+    """
+    from db.snapshot import refresh_snapshot
+    engine = get_engine(url_key(args.url), args.url) if args.url else get_db_connection_for(args.instancia)
+    try:
+        report = refresh_snapshot(engine, full=args.completo)
+    finally:
+        dispose_all_engines()
+    print(f"Tabla resumen ({report['mode']} desde {report['desde']}): "
+          f"{report['rows_fetched']:,} filas recalculadas de {report['rows_total']:,} "
+          f"en {report['seconds']:.2f}s")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(levelname)s: %(message)s")
+    if args.lectura:
+        set_read_mode(args.lectura)
+    if args.actualizar_resumen:
+        return refresh_summary(args)
+
+    jobs = load_jobs(args)
+    if args.hilos > POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"]:
+        logging.warning("Hay más hilos que conexiones en el pool; algunos trabajos esperarán.")
+    elif args.particiones and args.hilos > 1:
+        logging.info("Las particiones de los %d hilos comparten el pool: se leen de a %d a la vez.",
+                     args.hilos, POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"])
+
+    engine = get_engine(url_key(args.url), args.url) if args.url else get_db_connection_for(args.instancia)
+    start = time.perf_counter()
+    try:
+        results = run_jobs(engine, jobs, args.hilos, args.particiones, args.bloques)
+    finally:
+        dispose_all_engines()
+    print_summary(results, time.perf_counter() - start)
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import logging
+import decimal
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from arrow_odbc import read_arrow_batches_from_odbc
+except ImportError:  # lector Arrow opcional; sin él se usa fetchmany
+    pa = None
+    read_arrow_batches_from_odbc = None
+
+FETCH_BATCH_SIZE = 50000
+
+# Tipos de Python (type_code de pyodbc o primer valor no nulo) -> dtype de NumPy
+_NUMERIC_DTYPES = {
+    int: "int64",
+    bool: "bool",
+    float: "float64",
+    decimal.Decimal: "float64",
+}
+
+
+def _column_type(values, type_code):
+    if isinstance(type_code, type):
+        return type_code
+    for value in values:
+        if value is not None:
+            return type(value)
+    return None
+
+
+def to_typed_array(values, type_code=None):
+    """
+    Convierte la lista de valores de una columna en un arreglo NumPy tipado.
+    Los enteros con nulos pasan a float64; texto y fechas quedan como object.
+    """
+    py_type = _column_type(values, type_code)
+    dtype = _NUMERIC_DTYPES.get(py_type)
+    if dtype is not None and None in values:
+        dtype = None if dtype == "bool" else "float64"
+        if dtype:
+            values = [np.nan if v is None else v for v in values]
+    if dtype is not None:
+        # Sin type_code declarado (p. ej. SQLite) una columna puede mezclar int y float
+        arr = np.array(values, dtype=None if dtype == "int64" else dtype)
+        if arr.dtype.kind in "iufb":
+            return arr
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+class ColumnBuffer:
+    """
+    Acumula lotes de filas en listas por columna (sin dicts ni tuplas por fila).
+    Permite leer filas por rebanada mientras crece y termina en un DataFrame.
+    """
+
+    def __init__(self, columns, type_codes=None):
+        self.columns = list(columns)
+        self.type_codes = list(type_codes or [None] * len(self.columns))
+        self._data = [[] for _ in self.columns]
+        self._len = 0
+
+    def extend(self, rows):
+        if not rows:
+            return
+        for target, values in zip(self._data, zip(*rows)):
+            target.extend(values)
+        self._len += len(rows)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        """
+        Filas (tuplas) de la rebanada pedida; se usa para pintar la ventana visible.
+        """
+        if not isinstance(index, slice):
+            return tuple(col[index] for col in self._data)
+        return list(zip(*(col[index] for col in self._data)))
+
+    def to_frame(self, columns=None):
+        """
+        Construye el DataFrame en una sola pasada, con las columnas en el orden pedido.
+        Las columnas pedidas que no existen se omiten. Cada lista se reemplaza por su
+        arreglo tipado apenas se convierte, así que el buffer se puede seguir leyendo
+        (p. ej. desde la grilla) mientras se arma el DataFrame en otro hilo.
+        """
+        columns = [c for c in (columns or self.columns) if c in self.columns]
+        arrays = {}
+        for col in columns:
+            i = self.columns.index(col)
+            arrays[col] = to_typed_array(self._data[i], self.type_codes[i])
+            self._data[i] = arrays[col]
+        return pd.DataFrame(arrays, columns=columns, copy=False)
+
+
+def _type_codes(result):
+    cursor = getattr(result, "cursor", None)
+    description = getattr(cursor, "description", None) or []
+    return [d[1] for d in description] or None
+
+
+def read_frame_columnar(conn, statement, params=None, columns=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Ejecuta el statement y arma el DataFrame leyendo lotes con fetchmany directo a columnas.
+    """
+    result = conn.execution_options(stream_results=True).execute(statement, params or {})
+    buffer = ColumnBuffer(result.keys(), _type_codes(result))
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        buffer.extend(rows)
+    return buffer.to_frame(columns)
+
+
+def iter_frames_columnar(conn, statement, params=None, columns=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Como read_frame_columnar pero entrega un DataFrame por cada lote de fetchmany, sin
+    juntar el resultado. Si no hay filas entrega un DataFrame vacío con las columnas.
+    """
+    result = conn.execution_options(stream_results=True).execute(statement, params or {})
+    keys, type_codes = list(result.keys()), _type_codes(result)
+    empty = True
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        buffer = ColumnBuffer(keys, type_codes)
+        buffer.extend(rows)
+        df = buffer.to_frame(columns)
+        del rows, buffer
+        empty = False
+        yield df
+        del df
+    if empty:
+        yield ColumnBuffer(keys, type_codes).to_frame(columns)
+
+
+def arrow_odbc_available(engine):
+    return read_arrow_batches_from_odbc is not None and engine.dialect.name == "mssql" \
+        and engine.dialect.driver == "pyodbc"
+
+
+def read_frame_arrow_odbc(engine, statement, params=None, columns=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Lee el resultado con arrow-odbc (lotes Arrow columnares, sin objetos Python por fila).
+    Solo para engines mssql+pyodbc; los parámetros se pasan como texto en orden posicional.
+    """
+    compiled = statement.bindparams(**(params or {})).compile(dialect=engine.dialect)
+    positional = [compiled.params[name] for name in compiled.positiontup]
+    args, _ = engine.dialect.create_connect_args(engine.url)
+    reader = read_arrow_batches_from_odbc(
+        query=str(compiled),
+        connection_string=args[0],
+        batch_size=batch_size,
+        parameters=[None if v is None else str(v) for v in positional],
+    )
+    table = pa.Table.from_batches(list(reader), schema=reader.schema)
+    if columns:
+        table = table.select([c for c in columns if c in table.column_names])
+    logging.debug("Lectura arrow-odbc: %d filas", table.num_rows)
+    return table.to_pandas()
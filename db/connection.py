@@ -1,146 +1,786 @@
-import re
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
 import pandas as pd
-from sqlalchemy import create_engine, text
-from tkinter import messagebox
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from urllib.parse import quote_plus
-from queries.query_cruce import get_query_cruce
+from queries.cruce_builder import (
+    FECHA_START, PAGE_SIZE, PAGE_WINDOW_DAYS, CODES_INSERT_CHUNK, CODES_TABLE_CREATE,
+    CODES_TABLE_DROP, build_cruce_query, build_cruce_page_query, build_codes_insert, slim_allowed
+)
+from queries.sqlite_compat import to_sqlite
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.postprocess import CRUCE_COLUMNS, add_percentage_columns
+from db.instances import PREDEFINED_INSTANCES
+from utils.perf import span, timed, record_span, frame_bytes
+from db.columnar import (
+    FETCH_BATCH_SIZE, read_frame_columnar, iter_frames_columnar, read_frame_arrow_odbc,
+    arrow_odbc_available
+)
 
 # Variable global para el connection string
 DEFAULT_CONNECTION_STR = None
 
-# Instancias predefinidas (solo estas se permiten)
-PREDEFINED_INSTANCES = {
-    "Servidor DOS": {
-        "server_name": "SERVERDOS\\SERVERSQL_DOS",
-        "login": "sa",
-        "password": "j2094l,."
-    },
-    "Analista Local": {
-        "server_name": "DESKTOP-POHBVL8\\ANALISTA",
-        "login": "sa",
-        "password": "123456"
-    }
+# Alias actualmente seleccionado en la aplicación
+DEFAULT_ALIAS = None
+
+# Origen del cruce: "live" ejecuta el query; "snapshot" lee la tabla resumen de
+# db.snapshot cuando está vigente y si no vuelve al query (CRUCE_READ_MODE)
+READ_MODES = ("live", "snapshot")
+READ_MODE = os.environ.get("CRUCE_READ_MODE", "live")
+
+# Antigüedad máxima de la tabla resumen para leer de ella; CRUCE_SNAPSHOT_MAX_AGE
+SNAPSHOT_MAX_AGE_SECONDS = float(os.environ.get("CRUCE_SNAPSHOT_MAX_AGE", 2 * 3600))
+
+# Filas por bloque de iter_cruce_frames y bloques que un hilo deja leídos por
+# adelantado mientras se procesa el actual (0: sin hilo); CRUCE_STREAM_MAX_CHUNKS
+STREAM_CHUNK_ROWS = 50000
+STREAM_MAX_CHUNKS = int(os.environ.get("CRUCE_STREAM_MAX_CHUNKS", 2))
+
+# Opciones del pool compartidas por todos los engines del registro
+POOL_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_pre_ping": True,   # descarta conexiones muertas antes de usarlas
+    "pool_recycle": 1800,    # segundos antes de reciclar una conexión
 }
 
+# Registro de engines por alias (o por la URL sin contraseña, ver url_key)
+_ENGINES = {}
+_ENGINE_STATS = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+class PoolStats:
+    """
+    Tiempos de conexión y checkout acumulados de un engine del registro.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connect_count = 0
+        self.connect_seconds = 0.0
+        self.checkout_count = 0
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connect_count += 1
+            self.connect_seconds += seconds
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkout_count += 1
+
+    def as_dict(self):
+        """
+        Retorna un resumen con la latencia ahorrada por reutilizar conexiones.
+        """
+        with self._lock:
+            avg_connect = self.connect_seconds / self.connect_count if self.connect_count else 0.0
+            reused = max(0, self.checkout_count - self.connect_count)
+            return {
+                "connect_count": self.connect_count,
+                "connect_seconds": round(self.connect_seconds, 4),
+                "avg_connect_ms": round(avg_connect * 1000, 2),
+                "checkout_count": self.checkout_count,
+                "reused_checkouts": reused,
+                "saved_seconds": round(reused * avg_connect, 4),
+            }
+
+
+def build_connection_str(config):
+    """
+    Construye la URL de SQLAlchemy para una instancia predefinida.
+    Si la configuración trae una clave 'url' se usa tal cual (p. ej. SQLite en pruebas).
+    """
+    if config.get("url"):
+        return config["url"]
+    password_enc = quote_plus(config['password'])
+    return (
+        f"mssql+pyodbc://{config['login']}:{password_enc}@{config['server_name']}/BODEGA_DATOS?driver=SQL+Server"
+    )
+
+def _engine_options(connection_str):
+    """
+    Opciones de create_engine según el dialecto; SQLite no admite el dimensionado del pool.
+    """
+    options = dict(POOL_OPTIONS)
+    if connection_str.startswith("sqlite"):
+        options.pop("pool_size", None)
+        options.pop("max_overflow", None)
+    return options
+
+def _attach_pool_timing(engine, stats):
+    """
+    Registra eventos del pool para medir el tiempo de cada conexión física.
+    """
+    @event.listens_for(engine, "do_connect")
+    def _before_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["_connect_start"] = time.perf_counter()
+
+    @event.listens_for(engine.pool, "connect")
+    def _after_connect(dbapi_conn, conn_rec):
+        start = conn_rec.info.pop("_connect_start", None)
+        if start is not None:
+            stats.record_connect(time.perf_counter() - start)
+
+    @event.listens_for(engine.pool, "checkout")
+    def _on_checkout(dbapi_conn, conn_rec, conn_proxy):
+        stats.record_checkout()
+
+def url_key(connection_str):
+    """
+    Clave de registro para un connection string explícito: la URL con la contraseña
+    oculta, para que no quede en el registro ni en los logs.
+    """
+    return make_url(connection_str).render_as_string(hide_password=True)
+
+def get_engine(key, connection_str):
+    """
+    Retorna el engine registrado bajo 'key', creándolo la primera vez.
+    'key' es un alias o url_key(connection_str), nunca la URL con contraseña.
+    """
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = create_engine(connection_str, **_engine_options(connection_str))
+            stats = PoolStats()
+            _attach_pool_timing(engine, stats)
+            _ENGINES[key] = engine
+            _ENGINE_STATS[key] = stats
+            logging.debug("Engine creado para '%s'", key)
+        return engine
+
+def dispose_engine(key):
+    """
+    Cierra las conexiones del engine registrado bajo 'key' y lo elimina del registro.
+    """
+    with _ENGINES_LOCK:
+        engine = _ENGINES.pop(key, None)
+        _ENGINE_STATS.pop(key, None)
+    if engine is not None:
+        engine.dispose()
+        logging.debug("Engine liberado para '%s'", key)
+
+def dispose_all_engines():
+    """
+    Libera todos los engines del registro (al cerrar la aplicación).
+    """
+    for key in list(_ENGINES):
+        dispose_engine(key)
+
+def get_pool_stats(key=None):
+    """
+    Retorna los tiempos de conexión/checkout del engine indicado (o del alias actual).
+    """
+    key = key or DEFAULT_ALIAS
+    stats = _ENGINE_STATS.get(key)
+    if stats is None:
+        return {}
+    data = stats.as_dict()
+    engine = _ENGINES.get(key)
+    if engine is not None:
+        data["pool_status"] = engine.pool.status()
+    return data
+
+def warm_up(key=None, background=True):
+    """
+    Abre una conexión del pool por adelantado para ocultar el login ODBC.
+    Con background=True se hace en un hilo daemon y retorna el hilo.
+    """
+    key = key or DEFAULT_ALIAS
+    if key is None:
+        return None
+
+    def _warm():
+        try:
+            with get_db_connection_for(key).connect():
+                pass
+            logging.debug("Conexión precalentada para '%s'", key)
+        except Exception as e:
+            logging.warning("No se pudo precalentar la conexión '%s': %s", key, e)
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name=f"warmup-{key}", daemon=True)
+    thread.start()
+    return thread
+
+def get_db_connection_for(alias):
+    """
+    Retorna el engine compartido de una instancia predefinida.
+    """
+    if alias not in PREDEFINED_INSTANCES:
+        raise ValueError(f"Alias '{alias}' no reconocido.")
+    return get_engine(alias, build_connection_str(PREDEFINED_INSTANCES[alias]))
+
 def set_default_instance(alias):
     """
     Configura la cadena de conexión usando un alias predefinido.
     No admite instancias manuales ni detección dinámica.
+    Al cambiar de instancia se libera el pool de la anterior (los engines del modo
+    de varias instancias, db.multi, se registran con otra clave y no se tocan).
     """
-    global DEFAULT_CONNECTION_STR
+    global DEFAULT_CONNECTION_STR, DEFAULT_ALIAS
 
     if alias not in PREDEFINED_INSTANCES:
         raise ValueError(f"Alias '{alias}' no reconocido.")
 
-    config = PREDEFINED_INSTANCES[alias]
+    previous = DEFAULT_ALIAS
+    DEFAULT_CONNECTION_STR = build_connection_str(PREDEFINED_INSTANCES[alias])
+    DEFAULT_ALIAS = alias
+    if previous and previous != alias:
+        dispose_engine(previous)
 
-    password_enc = quote_plus(config['password'])
-    DEFAULT_CONNECTION_STR = (
-        f"mssql+pyodbc://{config['login']}:{password_enc}@{config['server_name']}/BODEGA_DATOS?driver=SQL+Server"
-    )
+def set_read_mode(mode, max_age_seconds=None):
+    """
+    Cambia el origen del cruce ("live" o "snapshot") y, opcionalmente, la antigüedad
+    máxima aceptada para la tabla resumen.
+    """
+    global READ_MODE, SNAPSHOT_MAX_AGE_SECONDS
 
+    if mode not in READ_MODES:
+        raise ValueError(f"Modo de lectura '{mode}' no reconocido.")
+    READ_MODE = mode
+    if max_age_seconds is not None:
+        SNAPSHOT_MAX_AGE_SECONDS = float(max_age_seconds)
+
+def _snapshot_usable(engine, fecha_start):
+    """
+    True en modo "snapshot" si la tabla resumen está vigente y cubre desde fecha_start.
+    """
+    if READ_MODE != "snapshot":
+        return False
+    from db.snapshot import snapshot_status
+    try:
+        fresh, reason = snapshot_status(engine, SNAPSHOT_MAX_AGE_SECONDS, fecha_start)
+    except Exception as e:
+        logging.warning("No se pudo revisar la tabla resumen, se usa el query del cruce: %s", e)
+        return False
+    if not fresh:
+        logging.info("Se usa el query del cruce: %s.", reason)
+    return fresh
+
+def read_snapshot_if_fresh(engine, codigo_filter=None, referencia_filter=None,
+                           categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                           fecha_option=2, fecha_start=None, columns=CRUCE_COLUMNS):
+    """
+    En modo "snapshot" retorna el cruce leído de la tabla resumen si está vigente.
+    Retorna None (el llamador ejecuta el query) en modo "live" o si la tabla no existe,
+    está vencida, no cubre la fecha pedida o no se pudo leer.
+    """
+    fecha_start = fecha_start or FECHA_START.get(fecha_option, FECHA_START[2])
+    if not _snapshot_usable(engine, fecha_start):
+        return None
+    from db.snapshot import read_snapshot
+    try:
+        return read_snapshot(engine, codigo_filter, referencia_filter, categoria_filter,
+                             linea_filter, fabrica_filter, fecha_option, fecha_start, columns)
+    except Exception as e:
+        logging.warning("No se pudo leer la tabla resumen, se usa el query del cruce: %s", e)
+        return None
+
+@timed("get_db_connection")
 def get_db_connection(connection_str=None):
     """
-    Retorna una instancia de engine para la conexión a la base de datos.
+    Retorna el engine compartido para la conexión a la base de datos.
+    Sin argumentos se reutiliza el engine del alias seleccionado.
     """
     try:
+        if connection_str is None and DEFAULT_ALIAS is not None:
+            return get_db_connection_for(DEFAULT_ALIAS)
         connection_str = connection_str or DEFAULT_CONNECTION_STR
         if not connection_str:
             raise ValueError("No se ha configurado el connection string.")
-        return create_engine(connection_str, pool_size=10, max_overflow=20)
+        return get_engine(url_key(connection_str), connection_str)
     except Exception as e:
+        # Import diferido: el modo por línea de comandos (cli.py) no carga tkinter
+        from tkinter import messagebox
         messagebox.showerror("Error de conexión", f"No se pudo crear el engine: {e}")
         return None
 
-def ensure_final_where(query_base, final_alias="Final2"):
+def prepare_statement(engine, statement):
     """
-    Garantiza que la parte final del query cuente con una cláusula WHERE.
+    Adapta el T-SQL al dialecto del engine (SQLite se usa como base de prueba).
     """
-    m = re.search(rf"(FROM\s+{final_alias}\b.*)$", query_base, flags=re.IGNORECASE | re.DOTALL)
-    if m:
-        final_clause = m.group(1)
-        if not re.search(r"\bWHERE\b", final_clause, flags=re.IGNORECASE):
-            new_final_clause = final_clause + " WHERE 1 = 1"
-        else:
-            new_final_clause = final_clause
-        query_base = query_base[:m.start()] + new_final_clause
-    else:
-        query_base += " WHERE 1 = 1"
-    return query_base
+    if engine.dialect.name == "sqlite":
+        return text(to_sqlite(statement.text))
+    return statement
 
+@timed("get_cruce_data", rows=len)
 def get_cruce_data(engine, codigo_filter=None, referencia_filter=None,
                    categoria_filter=None, linea_filter=None, fabrica_filter=None,
                    fecha_option=2):
     """
     Ejecuta el query de cruce con filtros y retorna lista de diccionarios.
+    Queda y Vendido vienen numéricos (ver utils.postprocess).
     """
-    conditions = []
-    params = {}
-
-    if codigo_filter:
-        conditions.append("CodigoBarra = :codigoFilter")
-        params["codigoFilter"] = codigo_filter
-    if referencia_filter:
-        conditions.append("LOWER(LTRIM(RTRIM(Final2.CleanReferencia))) = :referenciaFilter")
-        params["referenciaFilter"] = referencia_filter.strip().lower()
-    if categoria_filter:
-        conditions.append("CategoriaNombre = :categoriaFilter")
-        params["categoriaFilter"] = categoria_filter
-    if linea_filter:
-        conditions.append("Linea = :lineaFilter")
-        params["lineaFilter"] = linea_filter
-    if fabrica_filter:
-        conditions.append("CodigoFabricante = :fabricaFilter")
-        params["fabricaFilter"] = fabrica_filter
-
-    params["fechaStart"] = '2023-01-01' if fecha_option == 1 else '2024-01-01'
-
-    base_query = get_query_cruce().strip().rstrip(';')
-    base_query = base_query.replace(":fechaStart", f"'{params['fechaStart']}'")
-    del params["fechaStart"]
-
-    base_query = ensure_final_where(base_query, "Final2")
-    filter_clause = " AND " + " AND ".join(conditions) if conditions else ""
-    full_sql = base_query + filter_clause + " ORDER BY FechaLlegada ASC"
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option)
 
     with engine.connect() as conn:
-        result = conn.execute(text(full_sql), params).fetchall()
-    return [dict(row._mapping) for row in result]
+        df = read_frame_columnar(conn, prepare_statement(engine, statement), params)
+    return add_percentage_columns(df).to_dict("records")
+
+def get_cruce_data_columnar(engine, codigo_filter=None, referencia_filter=None,
+                            categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                            fecha_option=2, columns=CRUCE_COLUMNS, batch_size=FETCH_BATCH_SIZE,
+                            dimensions=None):
+    """
+    Versión DataFrame que lee el cursor por lotes directo a arreglos por columna
+    (o con arrow-odbc si está instalado) y entrega las columnas en el orden pedido.
+    Con dimensions (db.dimensions) el servidor envía códigos en lugar de los nombres
+    de marca, fabricante, categoría y línea, y los nombres se unen en el cliente.
+    En modo "snapshot" se lee la tabla resumen si está vigente (read_snapshot_if_fresh).
+    """
+    df = read_snapshot_if_fresh(engine, codigo_filter, referencia_filter, categoria_filter,
+                                linea_filter, fabrica_filter, fecha_option, columns=columns)
+    if df is not None:
+        return df
+    slim = dimensions is not None and slim_allowed(linea_filter)
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option, slim=slim)
+    with span("get_cruce_data_columnar", arrow_odbc=arrow_odbc_available(engine), slim=slim) as s:
+        if arrow_odbc_available(engine):
+            df = read_frame_arrow_odbc(engine, statement, params, columns, batch_size)
+        else:
+            with engine.connect() as conn:
+                df = read_frame_columnar(conn, prepare_statement(engine, statement), params,
+                                         columns, batch_size)
+        if slim:
+            from db.dimensions import attach_dimension_names
+            df = attach_dimension_names(df, dimensions)
+        df = add_percentage_columns(df)
+        s.rows, s.bytes = len(df), frame_bytes(df)
+    return df
 
 def get_cruce_data_df(engine, codigo_filter=None, referencia_filter=None,
                       categoria_filter=None, linea_filter=None, fabrica_filter=None,
-                      fecha_option=2, chunksize=50000):
+                      fecha_option=2, chunksize=50000, fecha_start=None, partitions=None):
     """
     Versión para Pandas DataFrame.
+    Con partitions (un número o "auto") se lee en paralelo por rangos de fecha (db.parallel;
+    apagado por defecto porque cada rango recalcula la existencia).
+    En modo "snapshot" se lee la tabla resumen si está vigente (read_snapshot_if_fresh).
     """
-    conditions = []
-    params = {}
-
-    if codigo_filter:
-        conditions.append("CodigoBarra = :codigoFilter")
-        params["codigoFilter"] = codigo_filter
-    if referencia_filter:
-        conditions.append("LOWER(LTRIM(RTRIM(Final2.CleanReferencia))) = :referenciaFilter")
-        params["referenciaFilter"] = referencia_filter.strip().lower()
-    if categoria_filter:
-        conditions.append("CategoriaNombre = :categoriaFilter")
-        params["categoriaFilter"] = categoria_filter
-    if linea_filter:
-        conditions.append("Linea = :lineaFilter")
-        params["lineaFilter"] = linea_filter
-    if fabrica_filter:
-        conditions.append("CodigoFabricante = :fabricaFilter")
-        params["fabricaFilter"] = fabrica_filter
-
-    params["fechaStart"] = '2023-01-01' if fecha_option == 1 else '2024-01-01'
-
-    base_query = get_query_cruce().strip().rstrip(';')
-    base_query = base_query.replace(":fechaStart", f"'{params['fechaStart']}'")
-    del params["fechaStart"]
-
-    base_query = ensure_final_where(base_query, "Final2")
-    filter_clause = " AND " + " AND ".join(conditions) if conditions else ""
-    full_sql = base_query + filter_clause + " ORDER BY FechaLlegada ASC"
-
-    df_iter = pd.read_sql(full_sql, con=engine, params=params, chunksize=chunksize)
-    return pd.concat(df_iter, ignore_index=True)
+    df = read_snapshot_if_fresh(engine, codigo_filter, referencia_filter, categoria_filter,
+                                linea_filter, fabrica_filter, fecha_option, fecha_start,
+                                columns=None)
+    if df is not None:
+        return df
+    if partitions:
+        from db.parallel import get_cruce_data_parallel
+        return get_cruce_data_parallel(
+            engine, codigo_filter, referencia_filter, categoria_filter, linea_filter,
+            fabrica_filter, fecha_option, partitions=None if partitions == "auto" else int(partitions),
+            columns=None, fecha_start=fecha_start
+        )
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option, fecha_start)
+
+    # Los lotes de chunksize filas van directo a las columnas del único DataFrame
+    # (sin pd.concat de DataFrames parciales); para procesar por bloques, iter_cruce_frames
+    with span("get_cruce_data_df", delta=fecha_start is not None) as s:
+        with engine.connect() as conn:
+            df = read_frame_columnar(conn, prepare_statement(engine, statement), params,
+                                     batch_size=chunksize)
+        df = add_percentage_columns(df)
+        s.rows, s.bytes = len(df), frame_bytes(df)
+    return df
+
+def clean_codes(codes):
+    """
+    Códigos sin espacios ni vacíos, sin repetir y en el orden recibido.
+    """
+    return list(dict.fromkeys(c for c in (str(c).strip() for c in codes) if c))
+
+def load_codes_table(conn, engine, codes):
+    """
+    Crea la tabla temporal de códigos en la conexión y la llena con INSERT de varios
+    VALUES por bloques (una ida al servidor cada CODES_INSERT_CHUNK códigos).
+    """
+    conn.execute(prepare_statement(engine, text(CODES_TABLE_DROP)))
+    conn.execute(prepare_statement(engine, text(CODES_TABLE_CREATE)))
+    for start in range(0, len(codes), CODES_INSERT_CHUNK):
+        chunk = codes[start:start + CODES_INSERT_CHUNK]
+        conn.execute(prepare_statement(engine, build_codes_insert(len(chunk))),
+                     {f"c{i}": code for i, code in enumerate(chunk)})
+
+def get_cruce_data_for_codes(engine, codes, referencia_filter=None, categoria_filter=None,
+                             linea_filter=None, fabrica_filter=None, fecha_option=2,
+                             columns=CRUCE_COLUMNS, batch_size=FETCH_BATCH_SIZE):
+    """
+    Cruce de una lista de códigos de barra (cientos o miles) en una sola consulta.
+    La lista va a una tabla temporal de la misma conexión y el cruce la une dentro de
+    BodegaCTE y CreacionCTE, en lugar de un IN (...) con miles de literales.
+    """
+    codes = clean_codes(codes)
+    statement, params = build_cruce_query(None, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option,
+                                          codes_table=True)
+    with span("get_cruce_data_codigos", codigos=len(codes)) as s:
+        with engine.connect() as conn:
+            try:
+                start = time.perf_counter()
+                load_codes_table(conn, engine, codes)
+                record_span("carga_codigos", time.perf_counter() - start, rows=len(codes))
+                df = read_frame_columnar(conn, prepare_statement(engine, statement), params,
+                                         columns, batch_size)
+            finally:
+                # La conexión vuelve al pool: la tabla temporal no debe quedar viva
+                conn.execute(prepare_statement(engine, text(CODES_TABLE_DROP)))
+        df = add_percentage_columns(df)
+        s.rows, s.bytes = len(df), frame_bytes(df)
+    return df
+
+def _page_key(df):
+    """
+    Clave (fecha ISO, código) de la última fila de una página.
+    """
+    fecha, codigo = df["FechaLlegada"].iloc[-1], df["CodigoBarra"].iloc[-1]
+    fecha = fecha.date() if hasattr(fecha, "date") and callable(fecha.date) else fecha
+    fecha = fecha.isoformat() if hasattr(fecha, "isoformat") else str(fecha)[:10]
+    return fecha, codigo
+
+def get_cruce_page(engine, codigo_filter=None, referencia_filter=None,
+                   categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                   fecha_option=2, after=None, page_size=PAGE_SIZE, columns=CRUCE_COLUMNS):
+    """
+    Lee una página del cruce por clave (FechaLlegada, CodigoBarra).
+
+    Cada consulta se acota a una ventana de fechas (PAGE_WINDOW_DAYS, que se duplica
+    mientras no alcance para llenar la página) para que el servidor no agregue todo el
+    rango antes de devolver las primeras filas.
+    Retorna (DataFrame, clave siguiente); la clave es None cuando ya no quedan filas.
+    """
+    filters = (codigo_filter, referencia_filter, categoria_filter, linea_filter, fabrica_filter)
+    window = after[2] if after is not None and len(after) > 2 else PAGE_WINDOW_DAYS
+    cursor = tuple(after[:2]) if after is not None else None
+    start = date.fromisoformat(cursor[0] if cursor else FECHA_START.get(fecha_option, FECHA_START[2]))
+    today = date.today()
+    frames, needed, next_key = [], page_size, None
+
+    with span("get_cruce_page", primera=after is None) as s:
+        with engine.connect() as conn:
+            while True:
+                end = start + timedelta(days=window)
+                fecha_end = end.isoformat() if end <= today else None
+                statement, params = build_cruce_page_query(*filters, fecha_option, cursor,
+                                                           needed, fecha_end)
+                df = read_frame_columnar(conn, prepare_statement(engine, statement), params, columns)
+                frames.append(df)
+                needed -= len(df)
+                if needed == 0:
+                    next_key = (*_page_key(df), window)
+                    break
+                if fecha_end is None:
+                    break
+                # Ventana agotada: se sigue desde su fin con una ventana más grande
+                cursor, start, window = (fecha_end, ""), end, window * 2
+        frames = [f for f in frames if len(f)] or frames[:1]
+        df = add_percentage_columns(pd.concat(frames, ignore_index=True))
+        s.rows = len(df)
+    return df, next_key
+
+def iter_cruce_pages(engine, page_size=PAGE_SIZE, **filters):
+    """
+    Recorre el cruce página por página hasta el final.
+    """
+    after = None
+    while True:
+        df, after = get_cruce_page(engine, after=after, page_size=page_size, **filters)
+        if len(df):
+            yield df
+        if after is None:
+            break
+
+def cruce_cache_key(alias=None, codigo_filter=None, referencia_filter=None,
+                    categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                    fecha_option=2, codes=None):
+    """
+    Clave de la caché local para el cruce de una instancia con los filtros dados
+    (codes: lista de códigos de get_cruce_data_for_codes).
+    """
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option,
+                                          codes_table=bool(codes))
+    if codes:
+        params = dict(params, codigos=sorted(clean_codes(codes)))
+    return make_cache_key(alias or DEFAULT_ALIAS, fecha_option, statement.text, params)
+
+def get_cruce_data_df_cached(engine, codigo_filter=None, referencia_filter=None,
+                             categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                             fecha_option=2, alias=None, force_refresh=False, cache=None):
+    """
+    Igual que get_cruce_data_df pero reutiliza la copia local si no ha vencido.
+    Con force_refresh=True se consulta el servidor y se reemplaza la copia.
+    """
+    cache = cache or get_result_cache()
+    key = cruce_cache_key(alias, codigo_filter, referencia_filter, categoria_filter,
+                          linea_filter, fabrica_filter, fecha_option)
+    if not force_refresh:
+        df = cache.get(key)
+        if df is not None:
+            return df
+
+    df = get_cruce_data_df(engine, codigo_filter, referencia_filter, categoria_filter,
+                           linea_filter, fabrica_filter, fecha_option)
+    cache.put(key, df)
+    return df
+
+
+class QueryCancelled(Exception):
+    """
+    Se lanza cuando una consulta en curso fue cancelada por el usuario.
+    """
+
+
+class CancelToken:
+    """
+    Permite cancelar desde otro hilo la sentencia que se está ejecutando.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._cursor = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def bind(self, cursor):
+        """
+        Asocia el cursor DBAPI en ejecución; si ya se canceló lo aborta de inmediato.
+        """
+        with self._lock:
+            self._cursor = cursor
+        if self.cancelled:
+            self._cancel_cursor()
+
+    def cancel(self):
+        self._event.set()
+        self._cancel_cursor()
+
+    def _cancel_cursor(self):
+        with self._lock:
+            cursor = self._cursor
+        # pyodbc expone cursor.cancel() (SQLCancel); otros drivers pueden no tenerlo
+        if cursor is not None and hasattr(cursor, "cancel"):
+            try:
+                cursor.cancel()
+            except Exception as e:
+                logging.debug("No se pudo cancelar el cursor: %s", e)
+
+
+@contextmanager
+def _cancellable(conn, cancel_token):
+    """
+    Asocia a cancel_token cada cursor que abra conn y convierte en QueryCancelled el
+    error con que el driver aborta la sentencia cancelada. Sin token no hace nada.
+    """
+    if cancel_token is None:
+        yield
+        return
+
+    @event.listens_for(conn, "before_cursor_execute")
+    def _bind_cursor(connection, cursor, statement, parameters, context, executemany):
+        cancel_token.bind(cursor)
+
+    try:
+        yield
+    except QueryCancelled:
+        raise
+    except Exception:
+        if cancel_token.cancelled:
+            raise QueryCancelled()
+        raise
+
+
+def iter_cruce_batches(engine, codigo_filter=None, referencia_filter=None,
+                       categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                       fecha_option=2, batch_size=5000, cancel_token=None, slim=False):
+    """
+    Ejecuta el query de cruce y entrega las filas por lotes.
+    El primer elemento es la lista de columnas; luego listas de tuplas de hasta batch_size filas.
+    Con slim=True las columnas de nombres traen códigos (ver db.dimensions.attach_dimension_names).
+    Lanza QueryCancelled si cancel_token se cancela; la conexión vuelve al pool al salir.
+    """
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option,
+                                          slim=slim and slim_allowed(linea_filter))
+
+    with span("connect"):
+        conn = engine.connect()
+    fetch_seconds, fetched = 0.0, 0
+    with conn, _cancellable(conn, cancel_token):
+        try:
+            with span("sql_execute"):
+                result = conn.execution_options(stream_results=True).execute(
+                    prepare_statement(engine, statement), params
+                )
+            yield list(result.keys())
+            while True:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise QueryCancelled()
+                start = time.perf_counter()
+                rows = result.fetchmany(batch_size)
+                fetch_seconds += time.perf_counter() - start
+                if not rows:
+                    break
+                fetched += len(rows)
+                yield [tuple(r) for r in rows]
+        finally:
+            # Solo el tiempo dentro de fetchmany (sin lo que tarda el consumidor entre lotes)
+            record_span("fetch", fetch_seconds, rows=fetched)
+
+
+_STREAM_END = object()
+
+
+def _prefetch(frames, max_in_flight):
+    """
+    Recorre el generador frames en un hilo aparte con hasta max_in_flight elementos
+    listos en una cola. El hilo se bloquea cuando la cola está llena (lo que no se
+    consume no se sigue leyendo) y se detiene si el consumidor deja de pedir.
+    """
+    out = queue.Queue(maxsize=max_in_flight)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for df in frames:
+                if not _put((df, None)):
+                    break
+            else:
+                _put((_STREAM_END, None))
+        except BaseException as e:
+            _put((None, e))
+        finally:
+            # La conexión se cierra en el mismo hilo que la abrió
+            frames.close()
+
+    threading.Thread(target=_produce, name="cruce-stream", daemon=True).start()
+    try:
+        while True:
+            df, error = out.get()
+            if error is not None:
+                raise error
+            if df is _STREAM_END:
+                return
+            yield df
+    finally:
+        stop.set()
+
+
+def iter_cruce_frames(engine, codigo_filter=None, referencia_filter=None,
+                      categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                      fecha_option=2, fecha_start=None, chunk_rows=STREAM_CHUNK_ROWS,
+                      max_in_flight=None, columns=CRUCE_COLUMNS, cancel_token=None):
+    """
+    Entrega el cruce en DataFrames de hasta chunk_rows filas, ya tipados y con Queda y
+    Vendido, sin juntar el resultado: la memoria depende del bloque y no del total.
+    Si no hay filas entrega un bloque vacío con las columnas.
+
+    Con max_in_flight > 0 (por defecto STREAM_MAX_CHUNKS) un hilo lee los bloques
+    siguientes mientras el consumidor procesa el actual y se detiene con max_in_flight
+    esperando; con 0 se lee en el mismo hilo, un bloque a la vez. Dejar de iterar
+    (o cerrar el generador) devuelve la conexión al pool.
+    En modo "snapshot" se lee la tabla resumen si está vigente.
+    Lanza QueryCancelled si cancel_token se cancela.
+    """
+    filters = (codigo_filter, referencia_filter, categoria_filter, linea_filter, fabrica_filter)
+    build = build_cruce_query
+    if _snapshot_usable(engine, fecha_start or FECHA_START.get(fecha_option, FECHA_START[2])):
+        from queries.cruce_snapshot import build_snapshot_query as build
+    statement, params = build(*filters, fecha_option, fecha_start)
+    statement = prepare_statement(engine, statement)
+
+    def _frames():
+        with engine.connect() as conn, _cancellable(conn, cancel_token):
+            for df in iter_frames_columnar(conn, statement, params, columns, chunk_rows):
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise QueryCancelled()
+                yield add_percentage_columns(df)
+
+    max_in_flight = STREAM_MAX_CHUNKS if max_in_flight is None else max_in_flight
+    frames = _frames() if max_in_flight <= 0 else _prefetch(_frames(), max_in_flight)
+    rows = 0
+    with span("iter_cruce_frames", en_vuelo=max_in_flight) as s:
+        try:
+            for df in frames:
+                rows += len(df)
+                yield df
+        finally:
+            frames.close()
+            s.rows = rows
+
+def _collect_messages(cursor, messages):
+    # pyodbc >= 4.0.31 deja en cursor.messages los avisos del servidor (STATISTICS IO/TIME)
+    for _, text_ in getattr(cursor, "messages", None) or []:
+        messages.append(text_)
+
+
+def capture_query_plan(engine, codigo_filter=None, referencia_filter=None,
+                       categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                       fecha_option=2):
+    """
+    Ejecuta el cruce una vez con SET STATISTICS XML/IO/TIME y retorna un dict con el plan
+    real (XML), los mensajes de estadísticas y las filas devueltas. Vuelve a correr el
+    query completo, así que es solo para diagnóstico. En SQLite retorna EXPLAIN QUERY PLAN.
+    """
+    statement, params = build_cruce_query(codigo_filter, referencia_filter, categoria_filter,
+                                          linea_filter, fabrica_filter, fecha_option)
+    report = {"plan": None, "messages": [], "rows": 0}
+
+    with span("capture_query_plan") as s:
+        if engine.dialect.name == "sqlite":
+            sqlite_statement = prepare_statement(engine, statement)
+            with engine.connect() as conn:
+                plan = conn.execute(text("EXPLAIN QUERY PLAN " + sqlite_statement.text), params)
+                report["plan"] = "\n".join(str(row[-1]) for row in plan)
+            return report
+
+        compiled = statement.bindparams(**params).compile(dialect=engine.dialect)
+        positional = [compiled.params[name] for name in compiled.positiontup]
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SET STATISTICS IO ON; SET STATISTICS TIME ON; SET STATISTICS XML ON;")
+            cursor.execute(str(compiled), positional)
+            while True:
+                _collect_messages(cursor, report["messages"])
+                if cursor.description:
+                    rows = cursor.fetchall()
+                    columns = [d[0] for d in cursor.description]
+                    if len(columns) == 1 and "Showplan" in columns[0]:
+                        report["plan"] = rows[0][0] if rows else None
+                    else:
+                        report["rows"] += len(rows)
+                if not cursor.nextset():
+                    break
+            _collect_messages(cursor, report["messages"])
+            cursor.execute("SET STATISTICS IO OFF; SET STATISTICS TIME OFF; SET STATISTICS XML OFF;")
+        except Exception:
+            # La sesión pudo quedar con SET STATISTICS encendido: no se devuelve al pool
+            raw.invalidate()
+            raise
+        finally:
+            raw.close()
+        s.rows = report["rows"]
+    return report
@@ -0,0 +1,215 @@
+"""
+Caché de las tablas de dimensión (CATEGORIAS, MARCAS, FABRICANTES) por instancia.
+
+Se leen del servidor una vez por instancia, se guardan en disco junto a la caché de
+resultados y se vuelven a pedir cuando la copia tiene más de DIM_REFRESH_SECONDS
+(variable de entorno CRUCE_DIM_REFRESH). Alimentan las listas de los filtros y
+permiten pedir el cruce con códigos en lugar de nombres (ver render_query_cruce).
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from db.connection import prepare_statement
+from queries.query_cruce import DIMENSION_QUERIES
+from utils.result_cache import get_cache_folder
+from utils.perf import span
+
+DIM_REFRESH_SECONDS = float(os.environ.get("CRUCE_DIM_REFRESH", 12 * 3600))
+
+# Columna del cruce -> (dimensión, valor si el código no está o el nombre es nulo).
+# Replica los LEFT JOIN del query (nulo) y el COALESCE(F.Nombre, '') del fabricante.
+NAME_COLUMNS = {
+    "Marca": ("marcas", None),
+    "Nombre_Fabricante": ("fabricantes", ""),
+    "CategoriaNombre": ("categorias", None),
+    "Linea": ("categorias", None),
+}
+
+# Largo del código de una línea (prefijo del código de categoría)
+LINEA_CODE_LENGTH = 4
+
+
+def _code_key(value):
+    # El servidor compara sin distinguir mayúsculas ni espacios finales
+    return str(value).rstrip().upper()
+
+
+class Dimensions:
+    """
+    Tablas de dimensión de una instancia: nombre -> DataFrame con Codigo y Nombre.
+    """
+
+    def __init__(self, tables, loaded_at=None):
+        self.tables = tables
+        self.loaded_at = loaded_at or time.time()
+        self._lookups = {}
+
+    @property
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def lookup(self, dimension):
+        """
+        (Index de códigos normalizados, arreglo de nombres) para unir por código.
+        """
+        if dimension not in self._lookups:
+            table = self.tables[dimension].drop_duplicates("Codigo")
+            keys = pd.Index([_code_key(c) for c in table["Codigo"]], dtype=object)
+            keep = ~keys.duplicated()
+            self._lookups[dimension] = (keys[keep], table["Nombre"].to_numpy(dtype=object)[keep])
+        return self._lookups[dimension]
+
+    def names(self, dimension):
+        """
+        dict código -> nombre (para mostrar códigos mientras llega el cruce).
+        """
+        table = self.tables[dimension]
+        return dict(zip(table["Codigo"], table["Nombre"]))
+
+    def catalog(self, dimension):
+        """
+        Nombres distintos de una dimensión, ordenados. "lineas" son las categorías
+        con código de LINEA_CODE_LENGTH caracteres.
+        """
+        if dimension == "lineas":
+            table = self.tables["categorias"]
+            table = table[table["Codigo"].str.len() == LINEA_CODE_LENGTH]
+        else:
+            table = self.tables[dimension]
+        return sorted(set(table["Nombre"].dropna()))
+
+    def to_json(self):
+        return {
+            "cargado": self.loaded_at,
+            "tablas": {name: df.values.tolist() for name, df in self.tables.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        tables = {name: pd.DataFrame(rows, columns=["Codigo", "Nombre"], dtype=object)
+                  for name, rows in data["tablas"].items()}
+        return cls(tables, data["cargado"])
+
+
+def load_dimensions(engine):
+    """
+    Lee las tablas de dimensión del servidor.
+    """
+    tables = {}
+    with span("dimensiones") as s:
+        with engine.connect() as conn:
+            for name, sql in DIMENSION_QUERIES.items():
+                rows = conn.execute(prepare_statement(engine, text(sql))).fetchall()
+                tables[name] = pd.DataFrame([tuple(r) for r in rows], columns=["Codigo", "Nombre"],
+                                            dtype=object)
+        s.rows = sum(len(df) for df in tables.values())
+    return Dimensions(tables)
+
+
+def attach_dimension_names(df, dimensions):
+    """
+    Reemplaza los códigos de las columnas de NAME_COLUMNS por los nombres de la
+    dimensión (resultado de un query con slim=True). La unión se hace sobre los
+    valores distintos de cada columna y se expande con un solo índice por fila.
+    """
+    for column, (dimension, missing) in NAME_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        keys, names = dimensions.lookup(dimension)
+        codes, uniques = pd.factorize(df[column])
+        positions = keys.get_indexer(pd.Index([_code_key(u) for u in uniques], dtype=object))
+        labels = np.append(names, missing)[positions]
+        if missing is not None:
+            labels = np.where(pd.isna(labels), missing, labels)
+        # Código -1 (nulo) toma el último elemento: el valor de "no encontrado"
+        df[column] = np.append(labels, missing)[codes]
+    return df
+
+
+class DimensionCache:
+    """
+    Dimensiones por alias de instancia, en memoria y en un JSON por instancia.
+    Si el servidor no responde al refrescar se sigue usando la copia anterior.
+    """
+
+    def __init__(self, folder=None, refresh_seconds=DIM_REFRESH_SECONDS):
+        self.folder = folder or get_cache_folder()
+        self.refresh_seconds = refresh_seconds
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, alias):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", str(alias)).strip("_") or "default"
+        return os.path.join(self.folder, f"dimensiones_{slug}.json")
+
+    def _read(self, alias):
+        try:
+            with open(self._path(alias), encoding="utf-8") as fh:
+                return Dimensions.from_json(json.load(fh))
+        except (OSError, ValueError, KeyError) as e:
+            logging.debug("Sin dimensiones en disco para %s: %s", alias, e)
+            return None
+
+    def _write(self, alias, dimensions):
+        path = self._path(alias)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(dimensions.to_json(), fh, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning("No se pudieron guardar las dimensiones de %s: %s", alias, e)
+
+    def get(self, engine, alias, force_refresh=False):
+        """
+        Dimensiones de la instancia; se leen del servidor si no hay copia o si venció.
+        """
+        with self._lock:
+            dimensions = self._memory.get(alias)
+            if dimensions is None:
+                dimensions = self._read(alias)
+            if force_refresh or dimensions is None or dimensions.age > self.refresh_seconds:
+                try:
+                    dimensions = load_dimensions(engine)
+                    self._write(alias, dimensions)
+                except Exception:
+                    if dimensions is None:
+                        raise
+                    logging.warning("No se pudieron refrescar las dimensiones de %s; "
+                                    "se usa la copia de hace %.0f min", alias, dimensions.age / 60,
+                                    exc_info=True)
+            self._memory[alias] = dimensions
+            return dimensions
+
+    def peek(self, alias):
+        """
+        Dimensiones ya cargadas en memoria (sin ir al servidor), o None.
+        """
+        with self._lock:
+            return self._memory.get(alias)
+
+    def invalidate(self, alias):
+        with self._lock:
+            self._memory.pop(alias, None)
+        try:
+            os.remove(self._path(alias))
+        except OSError:
+            pass
+
+
+_CACHE = None
+
+
+def get_dimension_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = DimensionCache()
+    return _CACHE
@@ -0,0 +1,119 @@
+import time
+import logging
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from queries.query_cruce import get_query_existencias
+from db.connection import get_cruce_data_df, prepare_statement
+from utils.postprocess import percentages_from_existencia
+
+# Días que se vuelven a pedir antes de la marca de agua (transferencias cargadas con atraso)
+DELTA_OVERLAP_DAYS = 3
+
+KEY_COLUMNS = ["CodigoBarra", "FechaLlegada"]
+
+
+def code_key(codigo):
+    """
+    Clave de CódigoBarra comparable como en el servidor: sin espacios a los lados y
+    sin distinguir mayúsculas (LTRIM/RTRIM y la intercalación del servidor).
+    """
+    return str(codigo).strip().upper()
+
+
+def get_existencias(engine):
+    """
+    Retorna un dict CódigoBarra normalizado (code_key) -> existencia actual.
+    Si dos códigos quedan con la misma clave se toma la mayor, como el MAX del servidor.
+    """
+    with engine.connect() as conn:
+        statement = text(get_query_existencias().strip().rstrip(';'))
+        rows = conn.execute(prepare_statement(engine, statement)).fetchall()
+    existencias = {}
+    for codigo, existencia in rows:
+        key = code_key(codigo)
+        if key not in existencias or existencia > existencias[key]:
+            existencias[key] = existencia
+    return existencias
+
+
+def get_watermark(df):
+    """
+    Fecha de llegada más reciente del cruce cargado (o None si está vacío).
+    """
+    if df is None or df.empty:
+        return None
+    fechas = pd.to_datetime(df["FechaLlegada"], errors="coerce")
+    latest = fechas.max()
+    return None if pd.isna(latest) else latest.date()
+
+
+def merge_delta(df_prev, df_delta, desde, existencias):
+    """
+    Reemplaza en df_prev las filas desde 'desde' por las del delta (clave CodigoBarra + FechaLlegada)
+    y actualiza ExistenciaActual/Queda/Vendido en todas las filas.
+    Las claves de 'existencias' vienen normalizadas con code_key.
+    """
+    fechas_prev = pd.to_datetime(df_prev["FechaLlegada"], errors="coerce")
+    keep = df_prev[fechas_prev < pd.Timestamp(desde)]
+
+    df_delta = df_delta[df_prev.columns]
+    if pd.api.types.is_datetime64_any_dtype(df_prev["FechaLlegada"]):
+        # df_prev ya pasó por compact_dtypes: la clave debe compararse con el mismo tipo
+        df_delta = df_delta.assign(FechaLlegada=pd.to_datetime(df_delta["FechaLlegada"], errors="coerce"))
+
+    merged = pd.concat([keep, df_delta], ignore_index=True)
+    merged = merged.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+    order = pd.to_datetime(merged["FechaLlegada"], errors="coerce").argsort(kind="stable")
+    merged = merged.iloc[order].reset_index(drop=True)
+
+    codigos = merged["CodigoBarra"].astype(str).str.strip().str.upper()
+    existencia = codigos.map(existencias)
+    merged["ExistenciaActual"] = existencia.fillna(0)
+    prev_dtype = df_prev["ExistenciaActual"].dtype
+    if prev_dtype.kind in "iu":
+        # Se agranda el entero si las existencias nuevas no caben en el tipo reducido
+        values = pd.to_numeric(merged["ExistenciaActual"], downcast="integer")
+        merged["ExistenciaActual"] = values.astype(np.promote_types(prev_dtype, values.dtype))
+    return percentages_from_existencia(merged, existencia)
+
+
+def refresh_cruce_incremental(engine, df_prev, fecha_option=2, prev_fecha_option=None,
+                              overlap_days=DELTA_OVERLAP_DAYS):
+    """
+    Actualiza el cruce pidiendo solo las transferencias posteriores a la marca de agua.
+
+    Vuelve a una carga completa si no hay datos previos, si cambió la opción de fecha
+    o si el esquema del delta no coincide con el del DataFrame anterior.
+    Retorna (DataFrame, reporte) donde el reporte indica modo, filas del cruce
+    transferidas (rows_fetched), filas de existencia leídas (existencia_rows) y segundos.
+    """
+    start = time.perf_counter()
+    watermark = get_watermark(df_prev)
+    report = {"mode": "full", "watermark": watermark, "desde": None,
+              "rows_fetched": 0, "existencia_rows": 0, "rows_total": 0, "seconds": 0.0}
+
+    if watermark is None or prev_fecha_option != fecha_option:
+        df = get_cruce_data_df(engine, fecha_option=fecha_option)
+    else:
+        desde = watermark - timedelta(days=overlap_days)
+        df_delta = get_cruce_data_df(engine, fecha_option=fecha_option,
+                                     fecha_start=desde.isoformat())
+        if set(df_delta.columns) != set(df_prev.columns):
+            logging.info("El esquema del cruce cambió; se hace una carga completa.")
+            df = get_cruce_data_df(engine, fecha_option=fecha_option)
+        else:
+            existencias = get_existencias(engine)
+            df = merge_delta(df_prev, df_delta, desde, existencias)
+            report.update(mode="delta", desde=desde, rows_fetched=len(df_delta),
+                          existencia_rows=len(existencias))
+
+    if report["mode"] == "full":
+        report["rows_fetched"] = len(df)
+    report["rows_total"] = len(df)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info("Actualización %s: %d filas transferidas (+%d existencias) de %d en %.2fs",
+                 report["mode"], report["rows_fetched"], report["existencia_rows"],
+                 report["rows_total"], report["seconds"])
+    return df, report
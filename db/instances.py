@@ -0,0 +1,15 @@
+# Sin dependencias: la ventana lista las instancias antes de cargar SQLAlchemy.
+
+# Instancias predefinidas (solo estas se permiten)
+PREDEFINED_INSTANCES = {
+    "Servidor DOS": {
+        "server_name": "SERVERDOS\\SERVERSQL_DOS",
+        "login": "sa",
+        "password": "j2094l,."
+    },
+    "Analista Local": {
+        "server_name": "DESKTOP-POHBVL8\\ANALISTA",
+        "login": "sa",
+        "password": "123456"
+    }
+}
@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+import pandas as pd
+from db.connection import (
+    PREDEFINED_INSTANCES, build_connection_str, get_engine, dispose_engine, get_cruce_data_columnar
+)
+from utils.perf import span
+
+# Columna que identifica la instancia de origen en el resultado combinado
+INSTANCE_COLUMN = "Instancia"
+
+# Los engines del modo de varias instancias se registran con este prefijo para que
+# set_default_instance (que libera el pool del alias anterior) no los cierre
+ENGINE_PREFIX = "multi:"
+
+# Segundos que se espera a la instancia más lenta (0: sin límite); CRUCE_MULTI_TIMEOUT
+MULTI_TIMEOUT_SECONDS = float(os.environ.get("CRUCE_MULTI_TIMEOUT", 0))
+
+# Comparación lado a lado: una fila por producto y llegada, una columna por instancia
+COMPARE_KEY = ("CodigoBarra", "FechaLlegada")
+COMPARE_INFO = ("Referencia", "Nombre")
+COMPARE_COLUMNS = ("ExistenciaActual", "CantidadInicial", "Vendido")
+
+
+def get_instance_engine(alias):
+    """
+    Engine propio de la instancia para el modo de varias instancias.
+    """
+    if alias not in PREDEFINED_INSTANCES:
+        raise ValueError(f"Alias '{alias}' no reconocido.")
+    return get_engine(ENGINE_PREFIX + alias, build_connection_str(PREDEFINED_INSTANCES[alias]))
+
+
+def dispose_instance_engines(aliases=None):
+    for alias in aliases or PREDEFINED_INSTANCES:
+        dispose_engine(ENGINE_PREFIX + alias)
+
+
+def _fetch_instance(alias, engine, filters, fecha_option):
+    start = time.perf_counter()
+    with span("cruce_instancia", instancia=alias) as s:
+        df = get_cruce_data_columnar(engine, fecha_option=fecha_option, **filters)
+        s.rows = len(df)
+    return df, time.perf_counter() - start
+
+
+def iter_cruce_instances(engines, codigo_filter=None, referencia_filter=None,
+                         categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                         fecha_option=2, timeout=None):
+    """
+    Ejecuta el cruce en cada instancia a la vez (engines: alias -> engine) y entrega
+    (alias, DataFrame o None, error o None, segundos) a medida que termina cada una,
+    así una instancia lenta o caída no retrasa a las demás. Con timeout, las que no
+    terminaron a tiempo salen con TimeoutError (su consulta sigue hasta terminar).
+    """
+    filters = {
+        "codigo_filter": codigo_filter, "referencia_filter": referencia_filter,
+        "categoria_filter": categoria_filter, "linea_filter": linea_filter,
+        "fabrica_filter": fabrica_filter,
+    }
+    if not engines:
+        return
+    pool = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="instancia")
+    futures = {pool.submit(_fetch_instance, alias, engine, filters, fecha_option): alias
+               for alias, engine in engines.items()}
+    try:
+        for future in as_completed(futures, timeout=timeout or None):
+            alias = futures[future]
+            try:
+                df, seconds = future.result()
+            except Exception as e:
+                logging.warning("Falló el cruce en '%s': %s", alias, e)
+                yield alias, None, e, None
+            else:
+                yield alias, df, None, seconds
+    except FuturesTimeout:
+        for future, alias in futures.items():
+            if not future.done():
+                yield alias, None, TimeoutError(f"Sin respuesta en {timeout:.0f} s"), None
+    finally:
+        # No se espera a las consultas que siguen en curso
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def merge_instances(frames):
+    """
+    Une los resultados por instancia (alias -> DataFrame) en un solo DataFrame con la
+    columna INSTANCE_COLUMN al final (categórica, en el orden de frames).
+    """
+    parts = [df.assign(**{INSTANCE_COLUMN: alias}) for alias, df in frames.items() if len(df)]
+    if not parts:
+        parts = [df.assign(**{INSTANCE_COLUMN: alias}) for alias, df in list(frames.items())[:1]]
+    if not parts:
+        return pd.DataFrame(columns=[INSTANCE_COLUMN])
+    df = pd.concat(parts, ignore_index=True)
+    df[INSTANCE_COLUMN] = pd.Categorical(df[INSTANCE_COLUMN], categories=list(frames))
+    return df
+
+
+def get_cruce_multi(engines, timeout=None, **filters):
+    """
+    Cruce de varias instancias: retorna (DataFrame combinado, {alias: error}).
+    """
+    frames, errors = {}, {}
+    with span("get_cruce_multi", instancias=len(engines)) as s:
+        for alias, df, error, _ in iter_cruce_instances(engines, timeout=timeout, **filters):
+            if error is None:
+                frames[alias] = df
+            else:
+                errors[alias] = error
+        # Se conserva el orden en que se pidieron las instancias
+        df = merge_instances({alias: frames[alias] for alias in engines if alias in frames})
+        s.rows = len(df)
+    return df, errors
+
+
+def compare_instances(df, columns=COMPARE_COLUMNS, key=COMPARE_KEY, info=COMPARE_INFO):
+    """
+    Vista lado a lado del resultado combinado: una fila por clave y, para cada columna
+    comparada, una columna por instancia ("ExistenciaActual [Servidor DOS]"). "Instancias"
+    cuenta en cuántas aparece la fila; con dos instancias se agrega la diferencia.
+    """
+    key, columns = list(key), [c for c in columns if c in df.columns]
+    aliases = list(df[INSTANCE_COLUMN].cat.categories) if isinstance(
+        df[INSTANCE_COLUMN].dtype, pd.CategoricalDtype) else list(pd.unique(df[INSTANCE_COLUMN]))
+    instance = df[INSTANCE_COLUMN].astype(object)
+
+    grouped = df.groupby(key, sort=True, observed=True)
+    out = grouped[[c for c in info if c in df.columns]].first()
+    out["Instancias"] = grouped.size()
+    wide = df[key + columns].assign(**{INSTANCE_COLUMN: instance})\
+        .pivot(index=key, columns=INSTANCE_COLUMN, values=columns)
+    for column in columns:
+        for alias in aliases:
+            out[f"{column} [{alias}]"] = wide[(column, alias)] if (column, alias) in wide.columns \
+                else float("nan")
+        if len(aliases) == 2:
+            out[f"Diferencia {column}"] = out[f"{column} [{aliases[1]}]"] - out[f"{column} [{aliases[0]}]"]
+    return out.reset_index()
@@ -0,0 +1,167 @@
+"""
+Lectura del cruce en paralelo por rangos de FechaLlegada (get_cruce_data_parallel).
+
+Limitación: cada partición ejecuta el query completo, y BodegaCTE (la existencia de
+todo el inventario) no depende de la fecha, así que se recalcula una vez por partición.
+En la base de prueba (benchmarks.bench_parallel) el cruce tardó 8,9 s en serie y entre
+9,9 y 15,8 s con particiones: solo conviene cuando el servidor tiene núcleos y E/S
+libres y el costo está en las transferencias, no en la existencia. Por eso las
+particiones están apagadas por defecto (get_cruce_data_df y cli.py leen en serie salvo
+que se pidan con partitions / --particiones).
+"""
+import time
+import logging
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from queries.cruce_builder import FECHA_START, build_cruce_query
+from db.connection import POOL_OPTIONS, prepare_statement
+from db.columnar import FETCH_BATCH_SIZE, read_frame_columnar
+from utils.postprocess import CRUCE_COLUMNS, add_percentage_columns
+from utils.perf import span
+
+# Particiones iniciales cuando no hay historial de tiempos para el engine
+DEFAULT_PARTITIONS = 4
+# Mejora mínima de filas/s para seguir subiendo o bajando las particiones
+TUNE_MIN_GAIN = 0.10
+# Conexiones que el pool abre a la vez: más particiones esperarían en el pool hasta
+# su TimeoutError, así que se recortan a este valor
+MAX_PARTITIONS = POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"]
+
+_TUNERS = {}
+_TUNERS_LOCK = threading.Lock()
+# Un semáforo por engine limita las particiones que leen a la vez entre llamadas
+# simultáneas (p. ej. varios trabajos de cli.py con --hilos)
+_SLOTS = {}
+
+
+class PartitionTuner:
+    """
+    Ajusta la cantidad de particiones por prueba y error: duplica (o reduce a la mitad)
+    mientras las filas por segundo mejoren al menos TUNE_MIN_GAIN; cuando ninguno de los
+    dos sentidos mejora se queda con la mejor cantidad medida.
+    """
+
+    def __init__(self, initial=DEFAULT_PARTITIONS, minimum=1, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum or POOL_OPTIONS["pool_size"]
+        self.current = max(self.minimum, min(initial, self.maximum))
+        self.best = None          # (particiones, filas/s)
+        self.direction = 1
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def settled(self):
+        return self.failures >= 2
+
+    def suggest(self):
+        with self._lock:
+            return self.current
+
+    def record(self, partitions, rows, seconds):
+        rate = rows / seconds if seconds > 0 else 0.0
+        with self._lock:
+            if self.best is None or rate > self.best[1] * (1 + TUNE_MIN_GAIN):
+                self.best = (partitions, rate)
+                self.failures = 0
+            else:
+                self.failures += 1
+                self.direction = -self.direction
+            best = self.best[0]
+            if self.settled:
+                self.current = best
+            else:
+                step = best * 2 if self.direction > 0 else best // 2
+                self.current = max(self.minimum, min(step, self.maximum))
+                if self.current == best:
+                    # Ya en el límite en ese sentido: se prueba el otro
+                    self.failures += 1
+                    self.direction = -self.direction
+            logging.debug("Particiones: %d a %.0f filas/s; siguiente %d", partitions, rate, self.current)
+
+
+def get_tuner(engine):
+    """
+    Ajustador de particiones del engine (uno por URL, compartido entre llamadas).
+    """
+    key = str(engine.url)
+    with _TUNERS_LOCK:
+        if key not in _TUNERS:
+            _TUNERS[key] = PartitionTuner()
+        return _TUNERS[key]
+
+
+def _slots(engine):
+    key = str(engine.url)
+    with _TUNERS_LOCK:
+        if key not in _SLOTS:
+            _SLOTS[key] = threading.BoundedSemaphore(MAX_PARTITIONS)
+        return _SLOTS[key]
+
+
+def date_slices(start, partitions, end=None):
+    """
+    Divide [start, end) en rangos de días enteros. El último queda abierto (hasta GETDATE()).
+    Retorna una lista de tuplas (desde, hasta) como texto ISO; hasta es None en el último.
+    """
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = end or date.today() + timedelta(days=1)
+    days = max(1, (end - start).days)
+    partitions = max(1, min(partitions, days))
+    step = -(-days // partitions)
+    bounds = [start + timedelta(days=i * step) for i in range(partitions) if i * step < days]
+    return [(b.isoformat(), bounds[i + 1].isoformat() if i + 1 < len(bounds) else None)
+            for i, b in enumerate(bounds)]
+
+
+def _fetch_slice(engine, filters, fecha_start, fecha_end, columns, batch_size):
+    statement, params = build_cruce_query(fecha_start=fecha_start, fecha_end=fecha_end, **filters)
+    with span("fetch_particion", desde=fecha_start, hasta=fecha_end) as s:
+        with _slots(engine), engine.connect() as conn:
+            df = read_frame_columnar(conn, prepare_statement(engine, statement), params,
+                                     columns, batch_size)
+        s.rows = len(df)
+    return df
+
+
+def get_cruce_data_parallel(engine, codigo_filter=None, referencia_filter=None,
+                            categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                            fecha_option=2, partitions=None, columns=CRUCE_COLUMNS,
+                            batch_size=FETCH_BATCH_SIZE, fecha_start=None):
+    """
+    Ejecuta el cruce en paralelo por rangos de FechaLlegada, cada uno en su conexión del pool.
+    El agrupamiento es por (CodigoBarra, FechaLlegada) y los cortes caen en días enteros,
+    así que ninguna fila se reparte entre particiones. Los resultados se concatenan en orden
+    de fecha. Sin partitions se usa la cantidad sugerida por el ajustador del engine.
+    Las particiones se recortan a MAX_PARTITIONS (conexiones del pool) y entre llamadas
+    simultáneas no leen más de MAX_PARTITIONS a la vez.
+    """
+    tuner = get_tuner(engine)
+    auto = partitions is None
+    partitions = tuner.suggest() if auto else partitions
+    if partitions > MAX_PARTITIONS:
+        logging.warning("Particiones recortadas de %d a %d (conexiones del pool)",
+                        partitions, MAX_PARTITIONS)
+        partitions = MAX_PARTITIONS
+    filters = {
+        "codigo_filter": codigo_filter, "referencia_filter": referencia_filter,
+        "categoria_filter": categoria_filter, "linea_filter": linea_filter,
+        "fabrica_filter": fabrica_filter,
+    }
+    slices = date_slices(fecha_start or FECHA_START.get(fecha_option, FECHA_START[2]), partitions)
+
+    start = time.perf_counter()
+    with span("get_cruce_data_parallel", particiones=len(slices), auto=auto) as s:
+        with ThreadPoolExecutor(max_workers=len(slices), thread_name_prefix="particion") as pool:
+            futures = [pool.submit(_fetch_slice, engine, filters, desde, hasta, columns, batch_size)
+                       for desde, hasta in slices]
+            frames = [f.result() for f in futures]
+        frames = [f for f in frames if len(f)] or frames[:1]
+        df = add_percentage_columns(pd.concat(frames, ignore_index=True))
+        s.rows = len(df)
+
+    if auto:
+        tuner.record(len(slices), len(df), time.perf_counter() - start)
+    return df
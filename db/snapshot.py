@@ -0,0 +1,145 @@
+import time
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import inspect, text
+from queries.cruce_builder import FECHA_START
+from queries.cruce_snapshot import (
+    SNAPSHOT_NAME, SNAPSHOT_TABLE, SNAPSHOT_STATE_TABLE, SNAPSHOT_STATE_CREATE,
+    get_snapshot_create, get_snapshot_indexes, get_snapshot_insert, get_snapshot_delete,
+    get_snapshot_existencias_update, get_snapshot_state_query, get_snapshot_state_write,
+    build_snapshot_query
+)
+from db.connection import prepare_statement
+from db.columnar import FETCH_BATCH_SIZE, read_frame_columnar
+from db.incremental import DELTA_OVERLAP_DAYS
+from utils.postprocess import CRUCE_COLUMNS, add_percentage_columns
+from utils.perf import span, frame_bytes
+
+# La tabla resumen guarda el cruce desde la fecha más antigua que ofrece la vista,
+# así sirve para cualquier opción de fecha (se filtra FechaLlegada al leer)
+SNAPSHOT_FECHA_START = min(FECHA_START.values())
+
+_STATE_NAME = SNAPSHOT_STATE_TABLE.rsplit(".", 1)[1]
+
+
+def _to_date(value):
+    return None if value is None or pd.isna(value) else pd.Timestamp(value).date()
+
+
+def _to_datetime(value):
+    return None if value is None or pd.isna(value) else pd.Timestamp(value).to_pydatetime()
+
+
+def get_snapshot_state(engine):
+    """
+    Estado de la tabla resumen (dict con fecha_inicio, ultima_actualizacion, modo,
+    filas, segundos y marca_agua: la FechaLlegada más reciente) o None si no existe.
+    """
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        if not (inspector.has_table(SNAPSHOT_NAME) and inspector.has_table(_STATE_NAME)):
+            return None
+        row = conn.execute(prepare_statement(engine, get_snapshot_state_query())).fetchone()
+    if row is None:
+        return None
+    return {
+        "fecha_inicio": _to_date(row[0]),
+        "ultima_actualizacion": _to_datetime(row[1]),
+        "modo": row[2],
+        "filas": row[3],
+        "segundos": row[4],
+        "marca_agua": _to_date(row[5]),
+    }
+
+
+def snapshot_status(engine, max_age_seconds, fecha_start=None):
+    """
+    Retorna (vigente, motivo): la tabla resumen sirve si existe, se actualizó hace
+    menos de max_age_seconds y cubre desde fecha_start (ISO). motivo explica por qué no.
+    """
+    state = get_snapshot_state(engine)
+    if state is None or state["ultima_actualizacion"] is None:
+        return False, "la tabla resumen no existe"
+    age = (datetime.now() - state["ultima_actualizacion"]).total_seconds()
+    if age > max_age_seconds:
+        return False, f"la tabla resumen tiene {age / 60:.0f} min (máximo {max_age_seconds / 60:.0f})"
+    if fecha_start and pd.Timestamp(fecha_start).date() < state["fecha_inicio"]:
+        return False, f"la tabla resumen empieza el {state['fecha_inicio']}"
+    return True, None
+
+
+def refresh_snapshot(engine, full=False, overlap_days=DELTA_OVERLAP_DAYS,
+                     fecha_inicio=SNAPSHOT_FECHA_START):
+    """
+    Materializa el cruce en la tabla resumen (pensado para una tarea programada).
+
+    La primera vez, con full=True o si cambió fecha_inicio se recrea la tabla con sus
+    índices. Si no, se reemplazan solo las fechas desde la marca de agua menos
+    overlap_days y se actualiza la existencia de todas las filas en el servidor.
+    Todo corre en una transacción y al final se guarda la hora de la actualización.
+    Retorna un reporte como el de db.incremental (modo, desde, filas, segundos).
+    """
+    start = time.perf_counter()
+    # Hora de inicio: los datos reflejan el servidor en ese momento
+    started_at = datetime.now().replace(microsecond=0)
+    state = get_snapshot_state(engine)
+    if full or state is None or state["marca_agua"] is None \
+            or state["fecha_inicio"] != pd.Timestamp(fecha_inicio).date():
+        mode, desde = "full", fecha_inicio
+    else:
+        mode = "delta"
+        desde = (state["marca_agua"] - timedelta(days=overlap_days)).isoformat()
+    report = {"mode": mode, "desde": desde, "rows_fetched": 0, "rows_total": 0, "seconds": 0.0}
+
+    with span("refresh_snapshot", modo=mode) as s:
+        with engine.begin() as conn:
+            def run(statement, params=None):
+                return conn.execute(prepare_statement(engine, statement), params or {})
+
+            if mode == "full":
+                run(text(f"DROP TABLE IF EXISTS {SNAPSHOT_TABLE}"))
+                run(get_snapshot_create(engine.dialect.name), {"fechaStart": desde})
+                for statement in get_snapshot_indexes():
+                    run(statement)
+                if not inspect(conn).has_table(_STATE_NAME):
+                    run(text(SNAPSHOT_STATE_CREATE))
+            else:
+                run(get_snapshot_delete(), {"fechaStart": desde})
+                run(get_snapshot_insert(), {"fechaStart": desde})
+                for statement in get_snapshot_existencias_update(engine.dialect.name):
+                    run(statement)
+
+            report["rows_total"] = run(text(f"SELECT COUNT(*) FROM {SNAPSHOT_TABLE}")).scalar()
+            report["rows_fetched"] = report["rows_total"] if mode == "full" else \
+                run(text(f"SELECT COUNT(*) FROM {SNAPSHOT_TABLE} WHERE FechaLlegada >= :desde"),
+                    {"desde": desde}).scalar()
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            delete, insert = get_snapshot_state_write()
+            run(delete)
+            run(insert, {"fechaInicio": fecha_inicio, "ultima": started_at.isoformat(),
+                         "modo": mode, "filas": report["rows_total"], "segundos": report["seconds"]})
+        s.rows = report["rows_fetched"]
+
+    logging.info("Tabla resumen (%s desde %s): %d filas recalculadas de %d en %.2fs",
+                 mode, desde, report["rows_fetched"], report["rows_total"], report["seconds"])
+    return report
+
+
+def read_snapshot(engine, codigo_filter=None, referencia_filter=None,
+                  categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                  fecha_option=2, fecha_start=None, columns=CRUCE_COLUMNS,
+                  batch_size=FETCH_BATCH_SIZE):
+    """
+    Lee el cruce de la tabla resumen con los mismos filtros que get_cruce_data_columnar.
+    No revisa si está vigente (ver snapshot_status).
+    """
+    statement, params = build_snapshot_query(codigo_filter, referencia_filter, categoria_filter,
+                                             linea_filter, fabrica_filter, fecha_option, fecha_start)
+    with span("cruce_snapshot") as s:
+        with engine.connect() as conn:
+            df = read_frame_columnar(conn, prepare_statement(engine, statement), params,
+                                     columns, batch_size)
+        df = add_percentage_columns(df)
+        s.rows, s.bytes = len(df), frame_bytes(df)
+    return df
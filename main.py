@@ -1,11 +1,12 @@
+from utils import startup_profiler
+startup_profiler.install()
+
 import sys
 import os
 import logging
 import traceback
 import customtkinter as ctk
 from views.main_view import MainView
-from db.connection import PREDEFINED_INSTANCES, set_default_instance
-from utils.helpers import export_to_excel, obtener_datos_treeview, get_save_path
 
 # Configuración básica de logging
 logging.basicConfig(level=logging.DEBUG, format="%(levelname)s: %(message)s")
@@ -18,50 +19,43 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def export_demo(parent, data=None):
+def exportar_vista(main_app):
     """
-    Exporta los datos del Treeview a Excel.
+    Pide la ruta y exporta la vista actual desde el DataFrame (no desde el Treeview).
     """
-    if data is None:
-        data = [{"Columna1": "Dato 1", "Columna2": "Dato 2"}]
-    output_file = get_save_path(parent)
+    from utils.helpers import get_save_path
+    output_file = get_save_path(main_app)
     if not output_file:
         logging.info("Exportación cancelada.")
         return
-    try:
-        export_to_excel(data, output_file)
-    except Exception as e:
-        logging.error("Error al exportar: %s", e)
-        import tkinter.messagebox as messagebox
-        messagebox.showerror("Error al exportar", f"Se produjo un error:\n{e}")
-    else:
-        import tkinter.messagebox as messagebox
-        messagebox.showinfo("Exportación exitosa", f"Archivo guardado:\n{output_file}")
+    main_app.export_view(output_file)
 
 def run_view():
     """
     Lanza la aplicación principal.
     """
-    # Selección automática de instancia al iniciar
-    alias_default = list(PREDEFINED_INSTANCES.keys())[0]
-    set_default_instance(alias_default)
-    logging.debug(f"Instancia predeterminada seleccionada: {alias_default}")
-
+    # La instancia inicial se selecciona cuando terminan de cargarse las
+    # librerías de datos (MainView._load_backend), sin demorar la ventana
     try:
         main_app = MainView(refresh_callback=lambda: None)
+        startup_profiler.mark("ventana creada")
 
         export_button = ctk.CTkButton(
             main_app,
-            text="Exportar a Excel",
-            command=lambda: export_demo(main_app, obtener_datos_treeview(main_app.tree_cruce))
+            text="Exportar",
+            command=lambda: exportar_vista(main_app)
         )
         export_button.grid(row=99, column=0, pady=10, sticky="ew")
 
+        startup_profiler.first_frame(main_app)
         main_app.mainloop()
 
     except Exception as e:
         logging.error("Error en la aplicación: %s", e)
         traceback.print_exc()
+    finally:
+        if "db.connection" in sys.modules:
+            sys.modules["db.connection"].dispose_all_engines()
 
 if __name__ == "__main__":
     run_view()
@@ -10,7 +10,9 @@ a = Analysis(
     hiddenimports=['pyodbc', 'pandas', 'sqlalchemy'],
     hookspath=[],
     runtime_hooks=[],
-    excludes=[],
+    # Paquetes del entorno que la aplicación no usa y alargan el arranque del ejecutable
+    excludes=['IPython', 'jedi', 'dask', 'distributed', 'matplotlib', 'zmq', 'tornado',
+              'jupyter_client', 'PyQt5', 'gevent'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
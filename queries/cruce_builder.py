@@ -0,0 +1,166 @@
+from functools import lru_cache
+from sqlalchemy import text
+from queries.query_cruce import render_query_cruce
+
+# Fecha inicial según la opción elegida en la vista
+FECHA_START = {1: '2023-01-01', 2: '2024-01-01'}
+
+# Tabla temporal de sesión para filtrar por una lista de códigos de barra.
+# DATABASE_DEFAULT evita el conflicto de intercalación entre tempdb y la base del cruce.
+CODES_TABLE = "#CruceCodigos"
+CODES_TABLE_CREATE = (f"CREATE TABLE {CODES_TABLE} "
+                      "(CodigoBarra VARCHAR(100) COLLATE DATABASE_DEFAULT PRIMARY KEY)")
+CODES_TABLE_DROP = f"DROP TABLE IF EXISTS {CODES_TABLE}"
+# Filas por INSERT de varios VALUES (SQL Server admite 1000; SQLite, 999 parámetros)
+CODES_INSERT_CHUNK = 900
+
+# Filtro -> (parámetro, predicados en BodegaCTE, predicados en CreacionCTE).
+# Se filtra dentro de los CTE de origen en lugar de sobre Final2, con la misma
+# normalización que el query original: BodegaCTE se une por el código sin espacios
+# (LTRIM/RTRIM) y la referencia se compara sin espacios y en minúsculas (el
+# parámetro llega igual, ver _shape_and_params), sin depender de la intercalación.
+PUSHDOWN = {
+    "codigo": ("codigoFilter",
+               ["LTRIM(RTRIM(tbDimInventario.CodigoBarra)) = :codigoFilter"],
+               ["I.CodigoBarra = :codigoFilter"]),
+    "referencia": ("referenciaFilter",
+                   [],
+                   ["LOWER(LTRIM(RTRIM(I.Referencia))) = :referenciaFilter"]),
+    "categoria": ("categoriaFilter",
+                  [],
+                  ["C.Nombre = :categoriaFilter"]),
+    "linea": ("lineaFilter",
+              [],
+              ["CC.Nombre = :lineaFilter"]),
+    "fabrica": ("fabricaFilter",
+                [],
+                ["I.Fabricante = :fabricaFilter"]),
+    # Fin (exclusivo) del rango de fechas; lo usan las particiones de db.parallel
+    "hasta": ("fechaEnd",
+              [],
+              ["T.Fecha < :fechaEnd"]),
+    # Lista de códigos cargada en CODES_TABLE (sin parámetro); semijoin en ambos CTE
+    "codigos": (None,
+                [f"LTRIM(RTRIM(tbDimInventario.CodigoBarra)) IN (SELECT CodigoBarra FROM {CODES_TABLE})"],
+                [f"I.CodigoBarra IN (SELECT CodigoBarra FROM {CODES_TABLE})"]),
+}
+
+ORDER_BY = " ORDER BY FechaLlegada ASC"
+
+# Paginación por clave (FechaLlegada, CodigoBarra): única por el GROUP BY de FinalCTE
+KEYSET_WHERE = (" WHERE (FechaLlegada > :afterFecha"
+                " OR (FechaLlegada = :afterFecha AND CodigoBarra > :afterCodigo))")
+KEYSET_ORDER_BY = " ORDER BY FechaLlegada ASC, CodigoBarra ASC"
+PAGE_LIMIT = " OFFSET 0 ROWS FETCH NEXT :pageSize ROWS ONLY"
+PAGE_SIZE = 500
+# Días de la primera ventana de fechas de una página; se duplica si no alcanza
+PAGE_WINDOW_DAYS = 31
+
+
+def _and(predicates, indent):
+    return "".join(f"\n{indent}AND {p}" for p in predicates)
+
+
+@lru_cache(maxsize=None)
+def get_cruce_template(shape, slim=False):
+    """
+    SQL del cruce para una combinación de filtros (tupla ordenada de nombres de PUSHDOWN).
+    Se guarda en caché: cada forma de filtro se arma una sola vez.
+    slim: códigos en lugar de nombres de dimensión (ver render_query_cruce).
+    """
+    bodega, creacion = [], []
+    for name in shape:
+        _, bodega_preds, creacion_preds = PUSHDOWN[name]
+        bodega.extend(bodega_preds)
+        creacion.extend(creacion_preds)
+    sql = render_query_cruce(
+        bodega_filters=_and(bodega, "      "),
+        creacion_filters=_and(creacion, "      "),
+        slim=slim,
+    )
+    return sql.strip().rstrip(';') + ORDER_BY
+
+
+@lru_cache(maxsize=None)
+def _compiled_template(shape, slim=False):
+    return text(get_cruce_template(shape, slim))
+
+
+@lru_cache(maxsize=None)
+def _compiled_page_template(shape, keyset):
+    sql = get_cruce_template(shape)[:-len(ORDER_BY)]
+    return text(sql + (KEYSET_WHERE if keyset else "") + KEYSET_ORDER_BY + PAGE_LIMIT)
+
+
+def _shape_and_params(codigo_filter, referencia_filter, categoria_filter, linea_filter,
+                      fabrica_filter, fecha_option, fecha_start, fecha_end, codes_table):
+    values = {
+        "codigo": codigo_filter,
+        "referencia": referencia_filter.strip().lower() if referencia_filter else None,
+        "categoria": categoria_filter,
+        "linea": linea_filter,
+        "fabrica": fabrica_filter,
+        "hasta": fecha_end,
+        "codigos": codes_table,
+    }
+    shape = tuple(name for name in PUSHDOWN if values[name])
+    params = {PUSHDOWN[name][0]: values[name] for name in shape if PUSHDOWN[name][0]}
+    params["fechaStart"] = fecha_start or FECHA_START.get(fecha_option, FECHA_START[2])
+    return shape, params
+
+
+def build_cruce_query(codigo_filter=None, referencia_filter=None,
+                      categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                      fecha_option=2, fecha_start=None, fecha_end=None, codes_table=False,
+                      slim=False):
+    """
+    Arma el query del cruce con los filtros empujados a los CTE de origen.
+    La fecha inicial viaja como parámetro (:fechaStart) para reutilizar el plan;
+    fecha_end (exclusiva) corta el rango antes de hoy. Con codes_table=True se
+    limita a los códigos de CODES_TABLE, que debe existir en la misma conexión.
+    slim=True pide códigos de dimensión en lugar de nombres (no se combina con el
+    filtro de línea, que compara el nombre de la línea; ver slim_allowed).
+    Retorna la tupla (TextClause, params).
+    """
+    shape, params = _shape_and_params(codigo_filter, referencia_filter, categoria_filter,
+                                      linea_filter, fabrica_filter, fecha_option,
+                                      fecha_start, fecha_end, codes_table)
+    return _compiled_template(shape, slim), params
+
+
+def slim_allowed(linea_filter=None):
+    """
+    El query con códigos de dimensión no tiene el JOIN de las líneas que usa su filtro.
+    """
+    return not linea_filter
+
+
+@lru_cache(maxsize=32)
+def build_codes_insert(n_codes):
+    """
+    INSERT de varios VALUES para n_codes códigos en CODES_TABLE (parámetros :c0, :c1, ...).
+    """
+    values = ", ".join(f"(:c{i})" for i in range(n_codes))
+    return text(f"INSERT INTO {CODES_TABLE} (CodigoBarra) VALUES {values}")
+
+
+def build_cruce_page_query(codigo_filter=None, referencia_filter=None,
+                           categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                           fecha_option=2, after=None, page_size=PAGE_SIZE, fecha_end=None):
+    """
+    Una página del cruce ordenada por (FechaLlegada, CodigoBarra), a continuación de la
+    clave after=(fecha ISO, código) de la página anterior (None para la primera).
+    La fecha de la clave también se usa como fechaStart: el servidor no vuelve a
+    agregar transferencias de días ya entregados. fecha_end (exclusiva) acota la ventana.
+    Retorna la tupla (TextClause, params).
+    """
+    fecha_start = None
+    if after is not None:
+        fecha_start = max(FECHA_START.get(fecha_option, FECHA_START[2]), after[0])
+    shape, params = _shape_and_params(codigo_filter, referencia_filter, categoria_filter,
+                                      linea_filter, fabrica_filter, fecha_option,
+                                      fecha_start, fecha_end, False)
+    if after is not None:
+        params.update(afterFecha=after[0], afterCodigo=after[1])
+    params["pageSize"] = int(page_size)
+    return _compiled_page_template(shape, after is not None), params
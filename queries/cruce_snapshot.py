@@ -0,0 +1,154 @@
+from functools import lru_cache
+from sqlalchemy import text
+from queries.query_cruce import render_query_cruce, get_query_existencias
+from queries.cruce_builder import CODES_TABLE, _shape_and_params
+
+# Tabla resumen del cruce (ya agregado por CodigoBarra + FechaLlegada) y su estado.
+# Viven en la base de la conexión; el prefijo [BD].dbo. se quita en SQLite.
+SNAPSHOT_NAME = "CruceSnapshot"
+SNAPSHOT_TABLE = f"[BODEGA_DATOS].dbo.{SNAPSHOT_NAME}"
+SNAPSHOT_STATE_TABLE = "[BODEGA_DATOS].dbo.CruceSnapshotEstado"
+# Tabla temporal de sesión con la existencia por código durante la actualización
+EXISTENCIAS_TABLE = "#CruceExistencias"
+
+# Columnas que entrega el cruce, en el orden del SELECT final
+SNAPSHOT_COLUMNS = (
+    "Referencia", "CodigoBarra", "CodigoMarca", "Marca", "Nombre", "Nombre_Fabricante",
+    "CodigoFabricante", "CategoriaCodigo", "CategoriaNombre", "Linea", "CantidadInicial",
+    "Cantidad_Inicial_Agrupada", "ExistenciaActual", "correccion", "NumeroTransferencia",
+    "FechaLlegada", "observacion", "Queda",
+)
+
+# Índices de la tabla resumen: la clave del cruce (agrupada, también evita filas repetidas
+# si dos actualizaciones se cruzan) y las columnas por las que filtra la vista
+SNAPSHOT_INDEXES = (
+    ("UX_CruceSnapshot_Clave", "UNIQUE CLUSTERED INDEX", ("FechaLlegada", "CodigoBarra")),
+    ("IX_CruceSnapshot_CodigoBarra", "INDEX", ("CodigoBarra",)),
+    ("IX_CruceSnapshot_CategoriaNombre", "INDEX", ("CategoriaNombre",)),
+    ("IX_CruceSnapshot_CodigoFabricante", "INDEX", ("CodigoFabricante",)),
+)
+
+SNAPSHOT_STATE_CREATE = (
+    f"CREATE TABLE {SNAPSHOT_STATE_TABLE} (Id INT PRIMARY KEY, FechaInicio DATE, "
+    "UltimaActualizacion DATETIME, Modo VARCHAR(10), Filas INT, Segundos FLOAT)"
+)
+
+# Filtro del cruce (nombre de PUSHDOWN) -> predicado sobre las columnas de la tabla resumen
+SNAPSHOT_FILTERS = {
+    "codigo": "CodigoBarra = :codigoFilter",
+    "referencia": "LOWER(Referencia) = :referenciaFilter",
+    "categoria": "CategoriaNombre = :categoriaFilter",
+    "linea": "Linea = :lineaFilter",
+    "fabrica": "CodigoFabricante = :fabricaFilter",
+    "hasta": "FechaLlegada < :fechaEnd",
+    "codigos": f"CodigoBarra IN (SELECT CodigoBarra FROM {CODES_TABLE})",
+}
+
+
+def _split_cruce():
+    """
+    Separa el query del cruce en (CTE, lista de columnas del SELECT final) para
+    reutilizar la misma agregación al llenar la tabla resumen.
+    """
+    sql = render_query_cruce().strip().rstrip(';')
+    ctes, select = sql.rsplit("\nSELECT", 1)
+    columns, _ = select.rsplit("\nFROM", 1)
+    return ctes, columns.strip()
+
+
+def get_snapshot_create(dialect="mssql"):
+    """
+    Crea la tabla resumen con el resultado completo del cruce desde :fechaStart.
+    Se usa SELECT ... INTO (CREATE TABLE ... AS en SQLite) para que las columnas
+    tomen los mismos tipos que devuelve el query.
+    """
+    ctes, columns = _split_cruce()
+    if dialect == "sqlite":
+        return text(f"CREATE TABLE {SNAPSHOT_TABLE} AS\n{ctes}\nSELECT {columns}\nFROM Final2")
+    return text(f"{ctes}\nSELECT {columns}\nINTO {SNAPSHOT_TABLE}\nFROM Final2")
+
+
+def get_snapshot_indexes():
+    return [text(f"CREATE {kind} {name} ON {SNAPSHOT_TABLE} ({', '.join(columns)})")
+            for name, kind, columns in SNAPSHOT_INDEXES]
+
+
+def get_snapshot_insert():
+    """
+    Agrega a la tabla resumen las filas del cruce con FechaLlegada desde :fechaStart
+    (antes se borran las mismas fechas con get_snapshot_delete).
+    """
+    ctes, columns = _split_cruce()
+    return text(f"{ctes}\nINSERT INTO {SNAPSHOT_TABLE} ({', '.join(SNAPSHOT_COLUMNS)})\n"
+                f"SELECT {columns}\nFROM Final2")
+
+
+def get_snapshot_delete():
+    return text(f"DELETE FROM {SNAPSHOT_TABLE} WHERE FechaLlegada >= :fechaStart")
+
+
+def get_snapshot_existencias_update(dialect="mssql"):
+    """
+    Sentencias que actualizan ExistenciaActual y Queda de todas las filas con la
+    existencia actual de BODEGA_DATOS (get_query_existencias, la misma de BodegaCTE).
+    La existencia se deja primero en EXISTENCIAS_TABLE con su índice, para que cada
+    fila la busque por código en lugar de volver a agregar el inventario.
+    """
+    query = get_query_existencias().strip().rstrip(';')
+    head, source = query.rsplit("\nFROM BodegaCTE", 1)
+    index = f"CREATE UNIQUE INDEX UX_CruceExistencias ON {EXISTENCIAS_TABLE} (CodigoBarra)"
+    if dialect == "sqlite":
+        # SQLite lleva el esquema temp en el nombre del índice, no en el de la tabla
+        create = f"CREATE TABLE {EXISTENCIAS_TABLE} AS\n{query}"
+        index = "CREATE UNIQUE INDEX temp.UX_CruceExistencias ON CruceExistencias (CodigoBarra)"
+    else:
+        create = f"{head}\nINTO {EXISTENCIAS_TABLE}\nFROM BodegaCTE{source}"
+    existencia = (f"(SELECT e.ExistenciaActual FROM {EXISTENCIAS_TABLE} e "
+                  f"WHERE e.CodigoBarra = {SNAPSHOT_NAME}.CodigoBarra)")
+    return [
+        text(f"DROP TABLE IF EXISTS {EXISTENCIAS_TABLE}"),
+        text(create),
+        text(index),
+        # Queda sale de la existencia sin ISNULL, como en Final2 (NULL sin existencia)
+        text(f"UPDATE {SNAPSHOT_TABLE} SET ExistenciaActual = ISNULL({existencia}, 0), "
+             f"Queda = {existencia} * 100.0 / NULLIF(Cantidad_Inicial_Agrupada, 0)"),
+        text(f"DROP TABLE {EXISTENCIAS_TABLE}"),
+    ]
+
+
+def get_snapshot_state_query():
+    """
+    Estado de la tabla resumen y la fecha de llegada más reciente (marca de agua).
+    """
+    return text(f"SELECT e.FechaInicio, e.UltimaActualizacion, e.Modo, e.Filas, e.Segundos, "
+                f"(SELECT MAX(FechaLlegada) FROM {SNAPSHOT_TABLE}) AS MarcaAgua "
+                f"FROM {SNAPSHOT_STATE_TABLE} e WHERE e.Id = 1")
+
+
+def get_snapshot_state_write():
+    return [
+        text(f"DELETE FROM {SNAPSHOT_STATE_TABLE} WHERE Id = 1"),
+        text(f"INSERT INTO {SNAPSHOT_STATE_TABLE} "
+             "(Id, FechaInicio, UltimaActualizacion, Modo, Filas, Segundos) "
+             "VALUES (1, :fechaInicio, :ultima, :modo, :filas, :segundos)"),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _compiled_snapshot_select(shape):
+    where = "".join(f"\n  AND {SNAPSHOT_FILTERS[name]}" for name in shape)
+    return text(f"SELECT {', '.join(SNAPSHOT_COLUMNS)}\nFROM {SNAPSHOT_TABLE}\n"
+                f"WHERE FechaLlegada >= :fechaStart{where}\nORDER BY FechaLlegada ASC")
+
+
+def build_snapshot_query(codigo_filter=None, referencia_filter=None,
+                         categoria_filter=None, linea_filter=None, fabrica_filter=None,
+                         fecha_option=2, fecha_start=None, fecha_end=None, codes_table=False):
+    """
+    Lectura de la tabla resumen con los mismos filtros y parámetros que build_cruce_query.
+    Retorna la tupla (TextClause, params).
+    """
+    shape, params = _shape_and_params(codigo_filter, referencia_filter, categoria_filter,
+                                      linea_filter, fabrica_filter, fecha_option,
+                                      fecha_start, fecha_end, codes_table)
+    return _compiled_snapshot_select(shape), params
@@ -1,5 +1,7 @@
-def get_query_cruce():
-    query = """
+# Plantilla del cruce. {bodega_filters} y {creacion_filters} reciben predicados
+# adicionales ("AND ...") que se aplican dentro de BodegaCTE y CreacionCTE.
+# Las columnas de nombres de dimensión y sus JOIN salen de NAME_COLUMNS (ver slim).
+CRUCE_TEMPLATE = """
 -- CTE que consolida la existencia de inventario en BODEGA_DATOS
 WITH BodegaCTE AS (
     SELECT 
@@ -29,7 +31,7 @@ WITH BodegaCTE AS (
         ON tbDimInventario.dimID_Inventario = tbHecInventario.dimid_inventario
     LEFT JOIN [BODEGA_DATOS].dbo.tbDimFabricantes F 
         ON F.Codigo = tbDimInventario.Fabricante
-    WHERE tbHecInventario.Existencia > 0
+    WHERE tbHecInventario.Existencia > 0{bodega_filters}
     GROUP BY LTRIM(RTRIM(tbDimInventario.CodigoBarra)), tbDimInventario.dimID_Inventario
 ),
 
@@ -39,13 +41,13 @@ CreacionCTE AS (
         LTRIM(RTRIM(I.Referencia)) AS CleanReferencia,
         I.CodigoBarra,
         I.CodigoMarca,
-        M.Nombre AS Marca,
+        {marca} AS Marca,
         I.Nombre,
-        COALESCE(F.Nombre, '') AS Nombre_Fabricante,
+        {nombre_fabricante} AS Nombre_Fabricante,
         COALESCE(F.Codigo, '') AS CodigoFabricante,
         LEFT(C.Codigo, 4) AS CategoriaCodigo,
-        C.Nombre AS CategoriaNombre,
-        CC.Nombre AS Linea,
+        {categoria_nombre} AS CategoriaNombre,
+        {linea} AS Linea,
         MT.Cantidad AS Cantidad,
         CASE WHEN T.correccion = 1 THEN 1 ELSE 0 END AS correccion,
         MT.Numero AS NumeroTransferencia,
@@ -56,17 +58,13 @@ CreacionCTE AS (
         ON I.CodigoBarra = MT.CodigoBarra
     RIGHT JOIN [J101010100_999911].dbo.CATEGORIAS C
         ON I.Categoria = C.Codigo
-    LEFT JOIN [J101010100_999911].dbo.MARCAS M
-        ON I.CodigoMarca = M.Codigo
-    LEFT JOIN [J101010100_999911].dbo.CATEGORIAS CC
-        ON LEFT(C.Codigo, 4) = CC.Codigo
-    INNER JOIN [J101010100_999911].dbo.TRANSFERENCIAS T
+{marca_join}{linea_join}    INNER JOIN [J101010100_999911].dbo.TRANSFERENCIAS T
         ON T.numero = MT.numero
     INNER JOIN [J101010100_999911].dbo.FABRICANTES F
         ON F.Codigo = I.Fabricante
-    -- Utiliza el parámetro :fechaStart para definir el inicio del rango y GETDATE() como final
+    -- Utiliza el parámetro fechaStart para definir el inicio del rango y GETDATE() como final
     WHERE T.Fecha BETWEEN :fechaStart AND GETDATE()
-      AND T.CodigoRecibe <> 'J-40610499-0'
+      AND T.CodigoRecibe <> 'J-40610499-0'{creacion_filters}
 ),
 
 -- CTE que agrupa los datos y asocia inventario con transferencias 
@@ -97,19 +95,12 @@ FinalCTE AS (
     GROUP BY c.CodigoBarra, c.FechaLlegada
 ),
 
--- CTE final para formatear números en la presentación
+-- CTE final: Queda como porcentaje numérico (NULL si la división no es válida).
+-- Vendido y el formato con '%' se calculan en el cliente (utils.postprocess).
 Final2 AS (
     SELECT 
         *,
-        -- En Queda y Vendido, si la división es inválida se devuelve COALESCE para mostrar '0%'
-        CASE 
-            WHEN Cantidad_Inicial_Agrupada = 0 THEN '0%'
-            ELSE FORMAT(ExistenciaActual * 100.0 / NULLIF(Cantidad_Inicial_Agrupada, 0), 'N2') + '%'
-        END AS Queda,
-        CASE 
-            WHEN Cantidad_Inicial_Agrupada = 0 THEN '0%'
-            ELSE FORMAT(100.0 - (ExistenciaActual * 100.0 / NULLIF(Cantidad_Inicial_Agrupada, 0)), 'N2') + '%'
-        END AS Vendido
+        ExistenciaActual * 100.0 / NULLIF(Cantidad_Inicial_Agrupada, 0) AS Queda
     FROM FinalCTE
 )
 
@@ -131,8 +122,76 @@ SELECT
     NumeroTransferencia,
     FechaLlegada,
     observacion,
-    COALESCE(Queda, '0%') AS Queda,
-    COALESCE(Vendido, '0%') AS Vendido
+    Queda
 FROM Final2;
     """
+
+
+_MARCA_JOIN = """    LEFT JOIN [J101010100_999911].dbo.MARCAS M
+        ON I.CodigoMarca = M.Codigo
+"""
+_LINEA_JOIN = """    LEFT JOIN [J101010100_999911].dbo.CATEGORIAS CC
+        ON LEFT(C.Codigo, 4) = CC.Codigo
+"""
+
+# Columna -> (expresión con el nombre, expresión con el código de la dimensión).
+NAME_COLUMNS = {
+    "marca": ("M.Nombre", "I.CodigoMarca"),
+    "nombre_fabricante": ("COALESCE(F.Nombre, '')", "F.Codigo"),
+    "categoria_nombre": ("C.Nombre", "C.Codigo"),
+    "linea": ("CC.Nombre", "LEFT(C.Codigo, 4)"),
+}
+
+
+def render_query_cruce(bodega_filters="", creacion_filters="", slim=False):
+    """
+    Retorna el query de cruce con predicados extra dentro de BodegaCTE y CreacionCTE.
+    Con slim=True las columnas Marca, Nombre_Fabricante, CategoriaNombre y Linea traen
+    el código de la dimensión (sin los JOIN a MARCAS y a las líneas); los nombres se
+    agregan en el cliente con db.dimensions.attach_dimension_names.
+    """
+    columns = {name: exprs[1 if slim else 0] for name, exprs in NAME_COLUMNS.items()}
+    return CRUCE_TEMPLATE.format(
+        bodega_filters=bodega_filters, creacion_filters=creacion_filters,
+        marca_join="" if slim else _MARCA_JOIN, linea_join="" if slim else _LINEA_JOIN,
+        **columns
+    )
+
+
+def get_query_cruce():
+    query = render_query_cruce()
+    return query
+
+
+# Tablas de dimensión que la vista guarda en caché (db.dimensions)
+DIMENSION_QUERIES = {
+    "categorias": "SELECT Codigo, Nombre FROM [J101010100_999911].dbo.CATEGORIAS",
+    "marcas": "SELECT Codigo, Nombre FROM [J101010100_999911].dbo.MARCAS",
+    "fabricantes": "SELECT Codigo, Nombre FROM [J101010100_999911].dbo.FABRICANTES",
+}
+
+
+def get_query_existencias():
+    """
+    Existencia actual por CódigoBarra, igual que la que el cruce toma de BodegaCTE.
+    Se usa en la actualización incremental para refrescar todas las filas sin re-agregar transferencias.
+    """
+    query = """
+WITH BodegaCTE AS (
+    SELECT 
+        LTRIM(RTRIM(tbDimInventario.CodigoBarra)) AS CleanCodigoBarra,
+        SUM(tbHecInventario.Existencia) AS Existencia_Total
+    FROM [BODEGA_DATOS].dbo.tbDimInventario
+    LEFT JOIN [BODEGA_DATOS].dbo.tbHecInventario 
+        ON tbDimInventario.dimID_Inventario = tbHecInventario.dimid_inventario
+    WHERE tbHecInventario.Existencia > 0
+    GROUP BY LTRIM(RTRIM(tbDimInventario.CodigoBarra)), tbDimInventario.dimID_Inventario
+)
+
+SELECT 
+    CleanCodigoBarra AS CodigoBarra,
+    MAX(Existencia_Total) AS ExistenciaActual
+FROM BodegaCTE
+GROUP BY CleanCodigoBarra;
+    """
     return query
@@ -0,0 +1,27 @@
+import re
+
+# Reemplazos directos de T-SQL a SQLite
+_SIMPLE = [
+    (re.compile(r"\[\w+\]\.dbo\."), ""),                              # [BD].dbo.Tabla -> Tabla
+    (re.compile(r"\bGETDATE\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bISNULL\(", re.IGNORECASE), "IFNULL("),
+    (re.compile(r"\bCAST\(([\w.]+) AS DATE\)", re.IGNORECASE), r"DATE(\1)"),
+    (re.compile(r"\bLEFT\(([^(),]+),\s*(\d+)\)", re.IGNORECASE), r"SUBSTR(\1, 1, \2)"),
+    (re.compile(r"\bOFFSET 0 ROWS FETCH NEXT (:?\w+) ROWS ONLY", re.IGNORECASE), r"LIMIT \1"),
+    (re.compile(r"#(\w+)"), r"temp.\1"),                              # tabla temporal de sesión
+    (re.compile(r"\s+COLLATE DATABASE_DEFAULT", re.IGNORECASE), ""),
+    (re.compile(r"\bCLUSTERED\s+", re.IGNORECASE), ""),             # índice agrupado
+    # Sin afinidad TEXT SQLite no crea índice automático para el JOIN con BodegaCTE
+    # y recorre la CTE completa por cada fila (cuadrático)
+    (re.compile(r"\b(LTRIM\(RTRIM\([\w.]+\)\)) AS (\w+)", re.IGNORECASE), r"CAST(\1 AS TEXT) AS \2"),
+]
+
+
+def to_sqlite(sql):
+    """
+    Traduce el T-SQL del cruce al dialecto de SQLite, para correrlo contra la base de prueba.
+    Solo cubre las construcciones que usan los queries de este proyecto.
+    """
+    for pattern, repl in _SIMPLE:
+        sql = pattern.sub(repl, sql)
+    return sql
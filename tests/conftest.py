@@ -0,0 +1,42 @@
+"""
+Fixtures comunes: la base SQLite de prueba del cruce (benchmarks.fixture), creada
+una vez por sesión, y un engine sobre una copia por prueba cuando la prueba escribe.
+"""
+import os
+import sys
+import shutil
+import pytest
+from sqlalchemy import create_engine
+
+# La raíz del repo tiene __init__.py: pytest agrega su carpeta padre, no la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture import create_fixture  # noqa: E402
+
+FIXTURE_LINES = 4_000
+
+
+@pytest.fixture(scope="session")
+def fixture_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("cruce") / "cruce.db")
+    create_fixture(path, n_lines=FIXTURE_LINES)
+    return path
+
+
+@pytest.fixture(scope="session")
+def engine(fixture_path):
+    engine = create_engine(f"sqlite:///{fixture_path}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def writable_engine(fixture_path, tmp_path):
+    """
+    Engine sobre una copia de la base, para pruebas que la modifican.
+    """
+    path = str(tmp_path / "cruce.db")
+    shutil.copy(fixture_path, path)
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from views.background import run_in_background
+
+
+class FakeWidget:
+    """
+    Cola de llamadas de after(); pump() las ejecuta como el bucle de la ventana.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def after(self, ms, func, *args):
+        self.calls.append((func, args))
+
+    def pump(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self.calls and time.monotonic() < deadline:
+            func, args = self.calls.pop(0)
+            time.sleep(0.001)
+            func(*args)
+        assert not self.calls, "la tarea siguió sondeando"
+
+
+def test_messages_arrive_in_order_on_the_polling_thread():
+    widget, received = FakeWidget(), []
+
+    def work(post):
+        for i in range(5):
+            post("rows", i)
+        post("done", "fin")
+
+    task = run_in_background(widget, work, lambda *m: received.append((*m, threading.current_thread())),
+                             max_per_poll=2)
+    widget.pump()
+    assert [(k, p) for k, p, _ in received] == [("rows", i) for i in range(5)] + [("done", "fin")]
+    assert all(t is threading.current_thread() for _, _, t in received)
+    assert not task.running
+
+
+def test_uncaught_error_is_posted():
+    widget, received = FakeWidget(), []
+
+    def work(post):
+        raise ValueError("falló")
+
+    run_in_background(widget, work, lambda *m: received.append(m))
+    widget.pump()
+    assert len(received) == 1 and received[0][0] == "error"
+    assert isinstance(received[0][1], ValueError)
+
+
+def test_discarded_task_delivers_nothing():
+    widget, received, release = FakeWidget(), [], threading.Event()
+
+    def work(post):
+        release.wait(5)
+        post("done", 1)
+
+    task = run_in_background(widget, work, lambda *m: received.append(m))
+    assert task.running
+    task.discard()
+    release.set()
+    widget.pump()
+    assert received == [] and not task.running
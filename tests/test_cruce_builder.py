@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from benchmarks.bench_query_builder import legacy_cruce_sql
+from db.connection import prepare_statement
+from queries.cruce_builder import build_cruce_query
+
+
+def _run(engine, statement, params):
+    with engine.connect() as conn:
+        result = conn.execute(prepare_statement(engine, statement), params)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    return df.sort_values(["FechaLlegada", "CodigoBarra"], kind="stable").reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def samples(engine):
+    with engine.connect() as conn:
+        sample = conn.execute(text(
+            "SELECT I.CodigoBarra, I.Referencia, C.Nombre, CC.Nombre, I.Fabricante "
+            "FROM INVENTARIO I JOIN CATEGORIAS C ON C.Codigo = I.Categoria "
+            "JOIN CATEGORIAS CC ON CC.Codigo = SUBSTR(C.Codigo, 1, 4) "
+            "JOIN MOVTRANSFERENCIAS MT ON MT.CodigoBarra = I.CodigoBarra LIMIT 1"
+        )).one()
+        # Referencia guardada con espacios y código con espacios en tbDimInventario
+        padded_ref = conn.execute(text(
+            "SELECT Referencia FROM INVENTARIO WHERE Referencia LIKE ' %' LIMIT 1")).scalar()
+        padded_code = conn.execute(text(
+            "SELECT LTRIM(RTRIM(D.CodigoBarra)) FROM tbDimInventario D "
+            "JOIN tbHecInventario H ON H.dimid_inventario = D.dimID_Inventario "
+            "WHERE D.CodigoBarra LIKE ' %' AND H.Existencia > 0 LIMIT 1")).scalar()
+    assert padded_ref and padded_code
+    return {"codigo": sample[0], "referencia": sample[1], "categoria": sample[2],
+            "linea": sample[3], "fabrica": sample[4], "padded_ref": padded_ref,
+            "padded_code": padded_code}
+
+
+CASES = {
+    "sin filtros": lambda s: {},
+    "codigo": lambda s: {"codigo_filter": s["codigo"]},
+    "codigo espacios": lambda s: {"codigo_filter": s["padded_code"]},
+    "referencia": lambda s: {"referencia_filter": f"  {s['referencia'].lower()} "},
+    "referencia mayusculas": lambda s: {"referencia_filter": s["referencia"].upper()},
+    "ref espacios": lambda s: {"referencia_filter": s["padded_ref"].strip().upper()},
+    "categoria": lambda s: {"categoria_filter": s["categoria"]},
+    "linea + fabrica": lambda s: {"linea_filter": s["linea"], "fabrica_filter": s["fabrica"]},
+    "fecha 2023": lambda s: {"fecha_option": 1},
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_builder_matches_legacy_query(engine, samples, case):
+    filters = CASES[case](samples)
+    legacy = _run(engine, *legacy_cruce_sql(**filters))
+    built = _run(engine, *build_cruce_query(**filters))
+    pd.testing.assert_frame_equal(legacy, built)
+    if filters.get("codigo_filter") or filters.get("referencia_filter"):
+        assert len(built) > 0
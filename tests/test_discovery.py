@@ -0,0 +1,72 @@
+import socket
+
+import pytest
+
+from benchmarks.bench_discovery import BrowserResponder
+from utils.my_sql_detector import (
+    DiscoveryCache, SqlServerDiscovery, instance_latency, iter_sql_servers, rank_instances,
+    rank_servers
+)
+
+TIMEOUT = 1.0
+# (host, instancia, retardo de la respuesta UDP en s, acepta TCP)
+SERVERS = (
+    ("127.0.0.2", "SERVERSQL_DOS", 0.0, True),
+    ("127.0.0.3", "ANALISTA", 0.2, True),
+    ("127.0.0.4", "APAGADA", 0.1, False),
+)
+
+
+def _free_udp_port():
+    # El mismo puerto tiene que estar libre en todos los hosts de SERVERS
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.bind((SERVERS[0][0], 0))
+            port = probe.getsockname()[1]
+        try:
+            for host, *_ in SERVERS[1:]:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as other:
+                    other.bind((host, port))
+            return port
+        except OSError:
+            continue
+
+
+@pytest.fixture(scope="module")
+def browser():
+    port = _free_udp_port()
+    responders = [BrowserResponder(host, instance, delay, accept, port)
+                  for host, instance, delay, accept in SERVERS]
+    yield port
+    for responder in responders:
+        responder.close()
+
+
+def test_iter_sql_servers_yields_in_arrival_order(browser):
+    found = list(iter_sql_servers(TIMEOUT, ["127.0.0.0/29"], broadcast=False, port=browser))
+    assert [s.instance for s in found] == ["SERVERSQL_DOS", "APAGADA", "ANALISTA"]
+    assert {s.ip for s in found} == {host for host, *_ in SERVERS}
+
+
+def test_discovery_ranks_and_caches(browser, tmp_path):
+    cache = DiscoveryCache(folder=str(tmp_path))
+    discovery = SqlServerDiscovery(TIMEOUT, ["127.0.0.0/29"], broadcast=False, port=browser,
+                                   cache=cache)
+    ranked = [payload for kind, payload in discovery.start().results() if kind == "done"][0]
+    assert ranked == rank_servers(ranked)
+    assert [s.reachable for s in ranked] == [True, True, False]
+
+    cached = [payload for kind, payload in SqlServerDiscovery(cache=cache).start().results()
+              if kind == "done"][0]
+    assert [s.key for s in cached] == [s.key for s in ranked]
+
+
+def test_rank_instances(browser):
+    assert instance_latency("127.0.0.4\\APAGADA", TIMEOUT, browser) == float("inf")
+    instances = {f"Instancia {host}": {"server_name": f"{host}\\{instance}"}
+                 for host, instance, _, _ in SERVERS}
+    instances["SQLite de prueba"] = {"url": "sqlite://"}
+    ranked = rank_instances(instances, timeout=TIMEOUT, port=browser, login=False)
+    assert [alias for alias, _ in ranked][-2:] == ["Instancia 127.0.0.4", "SQLite de prueba"]
+    assert ranked[-2][1] == float("inf") and ranked[-1][1] is None
+    assert all(ms < TIMEOUT * 1000 for _, ms in ranked[:2])
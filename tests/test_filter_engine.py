@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filter_engine import CruceFilterEngine
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "CodigoBarra": ["c1", "c2", "c3", "c4", "c5", "c6", "c7"],
+        "CategoriaNombre": pd.Categorical(["B", "A", "B", None, "A", "B", "A"]),
+        "Linea": ["x", "y", "x", None, "y", "x", "z"],
+        "ExistenciaActual": [3, 1, 3, 2, 1, 3, np.nan],
+        "FechaLlegada": pd.to_datetime(["2024-01-02", "2024-01-01", "2024-01-02", None,
+                                        "2024-01-01", "2024-01-03", "2024-01-01"]),
+    })
+
+
+@pytest.mark.parametrize("column", ["CategoriaNombre", "Linea", "ExistenciaActual", "FechaLlegada"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_sort_keeps_ties_in_row_order(frame, column, descending):
+    engine = CruceFilterEngine(frame)
+    expected = frame[column].sort_values(ascending=not descending, kind="stable",
+                                         na_position="last").index.to_numpy()
+    np.testing.assert_array_equal(engine.sort_positions(column, descending=descending), expected)
+
+    positions = np.array([0, 2, 3, 4, 5])
+    expected = frame.iloc[positions][column].sort_values(
+        ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+    np.testing.assert_array_equal(
+        engine.sort_positions(column, positions, descending=descending), expected)
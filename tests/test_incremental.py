@@ -0,0 +1,36 @@
+import pandas as pd
+
+from benchmarks.bench_snapshot import add_recent_transfers
+from db.connection import get_cruce_data_df
+from db.incremental import code_key, merge_delta, refresh_cruce_incremental
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["CodigoBarra", "FechaLlegada", "Cantidad_Inicial_Agrupada",
+                                       "ExistenciaActual"])
+
+
+def test_merge_delta_matches_codes_like_the_server():
+    prev = _frame([(" abc1", "2024-01-05", 10, 1), ("X2 ", "2024-03-01", 4, 1)])
+    delta = _frame([("X2 ", "2024-03-01", 5, 0), ("z3", "2024-03-02", 8, 0)])
+    existencias = {code_key(c): e for c, e in (("ABC1", 6), (" x2", 2), ("Z3 ", 4))}
+
+    merged = merge_delta(prev, delta, "2024-03-01", existencias)
+    assert merged["CodigoBarra"].tolist() == [" abc1", "X2 ", "z3"]
+    assert merged["Cantidad_Inicial_Agrupada"].tolist() == [10, 5, 8]
+    assert merged["ExistenciaActual"].tolist() == [6, 2, 4]
+
+
+def test_refresh_reports_delta_and_existencia_rows(writable_engine):
+    df_prev = get_cruce_data_df(writable_engine)
+    add_recent_transfers(writable_engine.url.database)
+
+    df, report = refresh_cruce_incremental(writable_engine, df_prev, 2, 2)
+    assert report["mode"] == "delta"
+    assert 0 < report["rows_fetched"] < report["rows_total"] == len(df)
+    assert report["existencia_rows"] > 0
+
+    full = get_cruce_data_df(writable_engine)
+    key = ["FechaLlegada", "CodigoBarra"]
+    pd.testing.assert_frame_equal(df.sort_values(key).reset_index(drop=True),
+                                  full.sort_values(key).reset_index(drop=True), check_dtype=False)
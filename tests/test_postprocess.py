@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from utils.postprocess import aggregate_frames
+
+
+@pytest.fixture
+def cruce():
+    # A llega tres veces con la misma existencia actual (7)
+    return pd.DataFrame({
+        "CodigoBarra": ["A", "A", "A", "B", "C"],
+        "CategoriaNombre": ["X", "X", "X", "X", "Y"],
+        "FechaLlegada": ["2024-01-01", "2024-02-01", "2024-03-01", "2024-01-01", "2024-01-01"],
+        "CantidadInicial": [10, 20, 30, 5, 8],
+        "Cantidad_Inicial_Agrupada": [10, 20, 30, 5, 8],
+        "ExistenciaActual": [7, 7, 7, 2, 4],
+    })
+
+
+@pytest.mark.parametrize("cuts", [[], [2], [1, 3]])
+def test_existencia_counted_once_per_code(cruce, cuts):
+    bounds = [0, *cuts, len(cruce)]
+    chunks = [cruce.iloc[a:b] for a, b in zip(bounds, bounds[1:])]
+    out = aggregate_frames(iter(chunks), "CategoriaNombre").set_index("CategoriaNombre")
+    assert out.loc["X", "ExistenciaActual"] == 9
+    assert out.loc["X", "Cantidad_Inicial_Agrupada"] == 65
+    assert out.loc["X", "Filas"] == 4
+    assert out.loc["X", "Queda"] == pytest.approx(9 * 100 / 65)
+    assert out.loc["Y", "ExistenciaActual"] == 4
+
+
+def test_group_by_code(cruce):
+    out = aggregate_frames(iter([cruce]), ["CategoriaNombre", "CodigoBarra"])
+    assert out.set_index("CodigoBarra")["ExistenciaActual"].to_dict() == {"A": 7, "B": 2, "C": 4}
+
+
+def test_empty_stream_keeps_columns():
+    out = aggregate_frames(iter([]), "Linea")
+    assert len(out) == 0
+    assert list(out.columns[:4]) == ["Linea", "CantidadInicial", "Cantidad_Inicial_Agrupada",
+                                     "ExistenciaActual"]
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from benchmarks.bench_snapshot import add_recent_transfers
+from db.connection import get_cruce_data_columnar, set_read_mode
+from db.snapshot import SNAPSHOT_NAME, get_snapshot_state, refresh_snapshot, snapshot_status
+
+FILTERS = (
+    {},
+    {"fecha_option": 1},
+    {"categoria_filter": "Categoria 3"},
+    {"fabrica_filter": "F001"},
+)
+
+
+@pytest.fixture
+def read_mode():
+    yield set_read_mode
+    set_read_mode("live")
+
+
+def _sorted(df):
+    df = df.assign(FechaLlegada=df["FechaLlegada"].astype(str))
+    return df.sort_values(["FechaLlegada", "CodigoBarra"], kind="stable").reset_index(drop=True)
+
+
+def _assert_snapshot_matches_query(engine, read_mode):
+    for filters in FILTERS:
+        read_mode("live")
+        live = get_cruce_data_columnar(engine, **filters)
+        read_mode("snapshot")
+        snap = get_cruce_data_columnar(engine, **filters)
+        pd.testing.assert_frame_equal(_sorted(live), _sorted(snap), check_dtype=False)
+
+
+def _table(engine):
+    with engine.connect() as conn:
+        df = pd.read_sql(text(f"SELECT * FROM {SNAPSHOT_NAME}"), conn)
+    return df.sort_values(list(df.columns), kind="stable").reset_index(drop=True)
+
+
+def test_full_refresh(writable_engine, read_mode):
+    assert snapshot_status(writable_engine, 60)[0] is False
+    report = refresh_snapshot(writable_engine)
+    assert report["mode"] == "full" and report["rows_total"] > 0
+    assert report["rows_fetched"] == report["rows_total"]
+    assert snapshot_status(writable_engine, 60) == (True, None)
+    assert get_snapshot_state(writable_engine)["filas"] == report["rows_total"]
+    _assert_snapshot_matches_query(writable_engine, read_mode)
+
+
+def test_delta_refresh_matches_full(writable_engine, read_mode):
+    first = refresh_snapshot(writable_engine)
+    add_recent_transfers(writable_engine.url.database)
+
+    delta = refresh_snapshot(writable_engine)
+    assert delta["mode"] == "delta"
+    assert 0 < delta["rows_fetched"] < delta["rows_total"]
+    assert delta["rows_total"] > first["rows_total"]
+    _assert_snapshot_matches_query(writable_engine, read_mode)
+
+    after_delta = _table(writable_engine)
+    refresh_snapshot(writable_engine, full=True)
+    pd.testing.assert_frame_equal(after_delta, _table(writable_engine))
@@ -0,0 +1,54 @@
+# Columnas y formatos de la grilla. No importa pandas: la ventana lo usa antes
+# de que terminen de cargarse las librerías de datos (ver views.main_view).
+
+# Orden de columnas del cruce en la vista y en las exportaciones
+CRUCE_COLUMNS = [
+    "CodigoBarra", "Referencia", "CodigoMarca", "Marca", "Nombre",
+    "Nombre_Fabricante", "CodigoFabricante", "CategoriaCodigo", "CategoriaNombre",
+    "Linea", "CantidadInicial", "Cantidad_Inicial_Agrupada", "ExistenciaActual",
+    "correccion", "NumeroTransferencia", "FechaLlegada", "observacion", "Queda", "Vendido"
+]
+
+# Columnas de porcentaje: se guardan numéricas y solo se formatean al mostrar/exportar
+PERCENT_COLUMNS = ("Queda", "Vendido")
+
+
+def _is_missing(value):
+    # NaN y NaT son distintos de sí mismos
+    return value is None or value != value
+
+
+def format_percentage(value):
+    """
+    Formatea un porcentaje como lo hacía FORMAT(..., 'N2') + '%'; vacío si no hay valor.
+    """
+    if _is_missing(value):
+        return ""
+    return f"{value:,.2f}%"
+
+
+def format_date(value):
+    """
+    Fecha sin hora para mostrar (FechaLlegada es datetime64 tras compact_dtypes).
+    """
+    if _is_missing(value):
+        return ""
+    return value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else str(value)
+
+
+def format_flag(value):
+    """
+    correccion se muestra como 0/1 aunque se guarde como booleano.
+    """
+    if _is_missing(value):
+        return ""
+    return int(value)
+
+
+def format_number(value):
+    """
+    Cantidad entera con separador de miles; vacío si la fila no está en esa instancia.
+    """
+    if _is_missing(value):
+        return ""
+    return f"{value:,.0f}"
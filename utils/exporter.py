@@ -0,0 +1,264 @@
+import os
+import logging
+import itertools
+import pandas as pd
+from utils.postprocess import format_for_export
+
+try:
+    import xlsxwriter
+except ImportError:  # sin xlsxwriter se usa openpyxl en modo write_only
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = None
+    pq = None
+
+# Filas por hoja de Excel (incluye el encabezado)
+EXCEL_MAX_ROWS = 1_048_576
+EXPORT_CHUNK_ROWS = 50_000
+SHEET_NAME = "Cruce"
+
+# Extensión -> descripción para el diálogo de guardado
+EXPORT_FORMATS = {
+    ".xlsx": "Archivos Excel",
+    ".csv": "Archivos CSV",
+    ".parquet": "Archivos Parquet",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def iter_chunks(df, positions=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Recorre las filas de la vista (todas o las posiciones del filtro) en bloques,
+    sin copiar el DataFrame completo.
+    """
+    total = len(df) if positions is None else len(positions)
+    for start in range(0, total, chunk_rows):
+        stop = min(start + chunk_rows, total)
+        if positions is None:
+            yield df.iloc[start:stop]
+        else:
+            yield df.iloc[positions[start:stop]]
+
+
+def _plain_rows(chunk):
+    """
+    Filas del bloque como tuplas de valores Python, con None en lugar de NaN.
+    """
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+
+def _sheet_name(index):
+    return SHEET_NAME if index == 0 else f"{SHEET_NAME} ({index + 1})"
+
+
+class _XlsxSheets:
+    """
+    Escribe filas en hojas sucesivas; abre una hoja nueva al llegar al límite de Excel.
+    Con xlsxwriter usa constant_memory; si no está, openpyxl en modo write_only.
+    """
+
+    def __init__(self, output_file, columns, sheet_rows):
+        self.columns = list(columns)
+        self.sheet_rows = sheet_rows
+        self.sheet_index = -1
+        self.row = sheet_rows
+        if xlsxwriter is not None:
+            self.book = xlsxwriter.Workbook(output_file, {
+                "constant_memory": True,
+                "default_date_format": "yyyy-mm-dd",
+                "nan_inf_to_errors": True,
+            })
+        else:
+            from openpyxl import Workbook
+            self.book = Workbook(write_only=True)
+            self.output_file = output_file
+        self.sheet = None
+
+    def _new_sheet(self):
+        self.sheet_index += 1
+        name = _sheet_name(self.sheet_index)
+        if xlsxwriter is not None:
+            self.sheet = self.book.add_worksheet(name)
+            self.sheet.write_row(0, 0, self.columns)
+        else:
+            self.sheet = self.book.create_sheet(name)
+            self.sheet.append(self.columns)
+        self.row = 1
+
+    def append(self, values):
+        if self.row >= self.sheet_rows:
+            self._new_sheet()
+        if xlsxwriter is not None:
+            self.sheet.write_row(self.row, 0, values)
+        else:
+            self.sheet.append(values)
+        self.row += 1
+
+    def close(self):
+        if self.sheet is None:
+            self._new_sheet()
+        if xlsxwriter is not None:
+            self.book.close()
+        else:
+            self.book.save(self.output_file)
+
+
+def _total(df, positions):
+    return len(df) if positions is None else len(positions)
+
+
+def write_xlsx(df, output_file, positions=None, progress=None, cancel_event=None,
+               sheet_rows=EXCEL_MAX_ROWS):
+    """
+    Exporta a Excel en bloques (memoria constante). Pasado el límite de filas
+    continúa en 'Cruce (2)', 'Cruce (3)', etc.
+    """
+    return _xlsx_chunks(iter_chunks(df, positions), df.iloc[:0], output_file,
+                        _total(df, positions), progress, cancel_event, sheet_rows)
+
+
+def write_csv(df, output_file, positions=None, progress=None, cancel_event=None):
+    """
+    Exporta a CSV en bloques (UTF-8 con BOM para que Excel respete los acentos).
+    """
+    _csv_chunks(iter_chunks(df, positions), df.iloc[:0], output_file,
+                _total(df, positions), progress, cancel_event)
+
+
+def write_parquet(df, output_file, positions=None, progress=None, cancel_event=None):
+    """
+    Exporta a Parquet por grupos de filas, conservando los tipos (porcentajes numéricos).
+    """
+    _parquet_chunks(iter_chunks(df, positions), df.iloc[:0], output_file,
+                    _total(df, positions), progress, cancel_event)
+
+
+# Escritores por bloques: reciben los bloques, un DataFrame vacío con las columnas
+# (y tipos) del resultado y el total de filas si se conoce (None si no)
+def _xlsx_chunks(chunks, template, output_file, total, progress, cancel_event,
+                 sheet_rows=EXCEL_MAX_ROWS):
+    sheets = _XlsxSheets(output_file, template.columns, sheet_rows)
+    try:
+        _write_rows(chunks, total, progress, cancel_event, sheets.append)
+    finally:
+        sheets.close()
+    return sheets.sheet_index + 1
+
+
+def _csv_chunks(chunks, template, output_file, total, progress, cancel_event):
+    with open(output_file, "w", encoding="utf-8-sig", newline="") as fh:
+        header = True
+        written = 0
+        for chunk in chunks:
+            _check_cancel(cancel_event)
+            if not len(chunk):
+                continue
+            format_for_export(chunk).to_csv(fh, header=header, index=False)
+            header = False
+            written += len(chunk)
+            _report(progress, written, total)
+        if header:
+            pd.DataFrame(columns=template.columns).to_csv(fh, index=False)
+
+
+def _parquet_chunks(chunks, template, output_file, total, progress, cancel_event):
+    if pq is None:
+        raise RuntimeError("Para exportar a Parquet se necesita pyarrow.")
+    schema = pa.Schema.from_pandas(template, preserve_index=False)
+    written = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for chunk in chunks:
+            _check_cancel(cancel_event)
+            if not len(chunk):
+                continue
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            written += len(chunk)
+            _report(progress, written, total)
+
+
+def _write_rows(chunks, total, progress, cancel_event, append):
+    written = 0
+    for chunk in chunks:
+        _check_cancel(cancel_event)
+        for values in _plain_rows(format_for_export(chunk)):
+            append(values)
+        written += len(chunk)
+        _report(progress, written, total)
+
+
+def _check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+
+
+def _report(progress, written, total):
+    if progress is not None:
+        progress(written, total)
+
+
+_WRITERS = {".xlsx": write_xlsx, ".csv": write_csv, ".parquet": write_parquet}
+_CHUNK_WRITERS = {".xlsx": _xlsx_chunks, ".csv": _csv_chunks, ".parquet": _parquet_chunks}
+
+
+def _writer_for(output_file, writers):
+    ext = os.path.splitext(output_file)[1].lower()
+    writer = writers.get(ext)
+    if writer is None:
+        raise ValueError(f"Formato de exportación no soportado: '{ext}'")
+    return writer
+
+
+def _remove_partial(output_file):
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+
+def export_frame(df, output_file, positions=None, progress=None, cancel_event=None):
+    """
+    Exporta df (o solo las filas en positions) según la extensión del archivo.
+    progress(escritas, total) se llama después de cada bloque. Si se cancela,
+    se borra el archivo parcial y se lanza ExportCancelled.
+    """
+    writer = _writer_for(output_file, _WRITERS)
+    try:
+        writer(df, output_file, positions=positions, progress=progress, cancel_event=cancel_event)
+    except BaseException:
+        _remove_partial(output_file)
+        raise
+    logging.info("Archivo guardado exitosamente en: %s", output_file)
+    return output_file
+
+
+def export_frames(frames, output_file, total=None, progress=None, cancel_event=None):
+    """
+    Exporta bloques con las mismas columnas (p. ej. db.connection.iter_cruce_frames)
+    a medida que llegan, sin juntarlos: la memoria depende del bloque, no del total.
+    El primer bloque define las columnas (puede venir vacío). progress(escritas, total)
+    recibe total=None si no se indica. Si se cancela o falla se borra el archivo parcial.
+    """
+    writer = _writer_for(output_file, _CHUNK_WRITERS)
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("No se recibió ningún bloque para exportar.")
+    try:
+        writer(itertools.chain([first], frames), first.iloc[:0], output_file, total,
+               progress, cancel_event)
+    except BaseException:
+        _remove_partial(output_file)
+        raise
+    finally:
+        # Si el origen es un generador se cierra (p. ej. devuelve la conexión al pool)
+        close = getattr(frames, "close", None)
+        if close is not None:
+            close()
+    logging.info("Archivo guardado exitosamente en: %s", output_file)
+    return output_file
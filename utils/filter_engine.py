@@ -0,0 +1,435 @@
+import re
+import logging
+import operator
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+# Columnas con índice hash valor -> posiciones de fila
+INDEXED_COLUMNS = ("CodigoBarra", "Referencia")
+
+# Columnas con índice de prefijos (búsqueda mientras se escribe)
+PREFIX_COLUMNS = ("CodigoBarra", "Referencia")
+
+# Columnas con índice de n-gramas para buscar subcadenas
+NGRAM_COLUMNS = ("Nombre",)
+NGRAM_SIZE = 3
+
+# Columnas de baja cardinalidad que se filtran por código categórico
+CATEGORICAL_COLUMNS = ("CategoriaNombre", "Linea", "CodigoFabricante", "Marca")
+
+# Columnas numéricas que admiten filtros por rango (p. ej. "Vendido > 80")
+RANGE_COLUMNS = ("Queda", "Vendido", "ExistenciaActual", "Cantidad_Inicial_Agrupada")
+
+# Con menos de n_rows / SORT_RANK_RATIO posiciones filtradas se ordenan por rango
+# (k log k) en vez de recorrer la permutación completa
+SORT_RANK_RATIO = 16
+
+_OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "=": operator.eq}
+_RANGE_RE = re.compile(r"^\s*(>=|<=|>|<|=)?\s*(-?\d+(?:[.,]\d+)?)\s*%?\s*$")
+_CODE_SEPARATORS_RE = re.compile(r"[\s,;]+")
+_BETWEEN_RE = re.compile(r"^\s*(-?\d+(?:[.,]\d+)?)\s*%?\s*-\s*(-?\d+(?:[.,]\d+)?)\s*%?\s*$")
+
+# Normalización por columna; se replica la comparación que hacía buscar_datos
+_LOWERED = {"Referencia", "CategoriaNombre", "Linea", "Marca", "Nombre"}
+_STRIPPED = {"Referencia", "CategoriaNombre", "Linea", "Marca", "CodigoFabricante", "Nombre"}
+
+# Mayor carácter posible: prefijo + _MAX_CHAR acota el rango de valores que empiezan con prefijo
+_MAX_CHAR = "\U0010ffff"
+
+
+def normalize_value(column, value):
+    """
+    Normaliza un valor de búsqueda igual que la columna correspondiente.
+    """
+    value = str(value)
+    if column in _STRIPPED:
+        value = value.strip()
+    if column in _LOWERED:
+        value = value.lower()
+    return value
+
+
+def parse_range(text):
+    """
+    Convierte un texto como ">80", "<= 20%", "50-80" o "80" en una lista de (operador, valor).
+    Un número solo se toma como mínimo (>=). Retorna None si el texto está vacío.
+    Lanza ValueError si no se reconoce.
+    """
+    if _is_blank(text):
+        return None
+    m = _BETWEEN_RE.match(text)
+    if m:
+        lo, hi = (float(g.replace(",", ".")) for g in m.groups())
+        return [(">=", lo), ("<=", hi)]
+    m = _RANGE_RE.match(text)
+    if not m:
+        raise ValueError(f"Rango no válido: '{text}'")
+    return [(m.group(1) or ">=", float(m.group(2).replace(",", ".")))]
+
+
+def parse_code_list(text):
+    """
+    Códigos de barra de un texto pegado (p. ej. una columna de Excel): separados por
+    saltos de línea, tabuladores, espacios, comas o punto y coma. Sin repetir, en orden.
+    """
+    return list(dict.fromkeys(c for c in _CODE_SEPARATORS_RE.split(text or "") if c))
+
+
+def value_counts_catalog(series):
+    """
+    Lista de (valor, filas) ordenada de más a menos filas, para autocompletar filtros.
+    Si la columna es categórica (ver compact_dtypes) se cuentan sus códigos con bincount.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        labels = series.cat.categories.to_numpy(dtype=object)
+    else:
+        counted = series.dropna().value_counts(sort=False)
+        counts, labels = counted.to_numpy(), counted.index.to_numpy(dtype=object)
+    order = np.argsort(-counts, kind="stable")
+    return [(str(labels[i]), int(counts[i])) for i in order if counts[i] and str(labels[i]).strip()]
+
+
+def _is_blank(value):
+    return value is None or not str(value).strip()
+
+
+def normalize_column(column, series):
+    """
+    Retorna la columna como texto normalizado (sin espacios y/o en minúsculas).
+    """
+    values = series.astype(object).where(series.notna(), "").astype(str)
+    if column in _STRIPPED:
+        values = values.str.strip()
+    if column in _LOWERED:
+        values = values.str.lower()
+    return values
+
+
+def _categorical_codes(column, series):
+    """
+    Códigos y mapa valor normalizado -> código. Si la columna ya es categórica
+    (ver compact_dtypes) solo se normalizan sus categorías, no cada fila.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = normalize_column(column, pd.Series(series.cat.categories, dtype=object))
+        remap, uniques = pd.factorize(labels.to_numpy())
+        blank = len(uniques)
+        if "" in uniques:
+            blank = int(np.flatnonzero(uniques == "")[0])
+        else:
+            uniques = np.append(uniques, "")
+        # Los nulos (código -1) se normalizan a "" igual que en normalize_column
+        codes = np.append(remap, blank)[series.cat.codes.to_numpy()]
+        return codes, {v: i for i, v in enumerate(uniques)}
+    cat = pd.Categorical(normalize_column(column, series))
+    return cat.codes, {v: i for i, v in enumerate(cat.categories)}
+
+
+def _sorted_codes(values):
+    """
+    Valores únicos ordenados y, por fila, la posición de su valor entre ellos.
+    Se factoriza con hash y solo se ordenan los únicos.
+    """
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(uniques.astype(str), kind="stable")
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return uniques[order].astype(str), rank[codes]
+
+
+def _rows_for_codes(codes, hit, candidates):
+    """
+    Filas cuyo código está marcado en hit (arreglo booleano por valor único).
+    """
+    if candidates is None:
+        return np.flatnonzero(hit[codes])
+    return candidates[hit[codes[candidates]]]
+
+
+def _sort_order(series, descending=False):
+    """
+    (permutación estable que ordena la columna con los nulos al final, cantidad de
+    valores no nulos). Los números se ordenan por valor (también si llegaron como
+    objetos, p. ej. Decimal), las categóricas por sus categorías. Los empates quedan
+    en el orden de las filas también en descendente.
+    """
+    values = series.reset_index(drop=True)
+    n_valid = int(values.notna().sum())
+    if values.dtype == object:
+        numeric = pd.to_numeric(values, errors="coerce")
+        if numeric.notna().sum() == n_valid:
+            values = numeric
+    if pd.api.types.is_numeric_dtype(values.dtype) or isinstance(values.dtype, pd.CategoricalDtype) \
+            or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        order = values.sort_values(ascending=not descending, kind="stable", na_position="last").index
+        return order.to_numpy(dtype=np.intp), n_valid
+    # Texto: se ordenan solo los valores distintos y las filas por su código (nulos al final)
+    codes, uniques = pd.factorize(values, sort=True)
+    if descending:
+        codes = np.where(codes < 0, len(uniques), len(uniques) - 1 - codes)
+    else:
+        codes = np.where(codes < 0, len(uniques), codes)
+    return np.argsort(codes, kind="stable").astype(np.intp, copy=False), n_valid
+
+
+class PrefixIndex:
+    """
+    Índice de prefijos de una columna de texto normalizada: los valores únicos
+    ordenados y el código de cada fila. Los valores que empiezan con un prefijo
+    ocupan un rango contiguo de códigos, que se ubica con dos búsquedas binarias.
+    """
+
+    def __init__(self, values):
+        self.uniques, self.codes = _sorted_codes(values)
+        # Tabla hash de los valores únicos; se arma con la primera lista de valores
+        self._hash = None
+
+    def code_range(self, prefix):
+        lo = int(np.searchsorted(self.uniques, prefix, side="left"))
+        hi = int(np.searchsorted(self.uniques, prefix + _MAX_CHAR, side="left"))
+        return lo, hi
+
+    def match(self, prefix, candidates=None):
+        """
+        Posiciones ordenadas de las filas que empiezan con prefix.
+        """
+        lo, hi = self.code_range(prefix)
+        if lo == hi:
+            return np.empty(0, dtype=np.intp)
+        codes = self.codes if candidates is None else self.codes[candidates]
+        mask = (codes >= lo) & (codes < hi)
+        return np.flatnonzero(mask) if candidates is None else candidates[mask]
+
+    def match_values(self, values, candidates=None):
+        """
+        Posiciones ordenadas de las filas cuyo valor está en values (pertenencia por hash
+        sobre los valores únicos; luego una sola pasada por los códigos de fila).
+        """
+        if self._hash is None:
+            self._hash = pd.Index(self.uniques, dtype=object)
+        found = self._hash.get_indexer(pd.Index(values, dtype=object).unique())
+        hit = np.zeros(len(self.uniques), dtype=bool)
+        hit[found[found >= 0]] = True
+        return _rows_for_codes(self.codes, hit, candidates)
+
+
+class NgramIndex:
+    """
+    Índice de n-gramas sobre los valores únicos de una columna de texto normalizada.
+    Una subcadena de al menos n caracteres solo puede estar en los valores que tienen
+    todos sus n-gramas: se cruzan esas listas y se verifica cada candidato.
+    Las subcadenas más cortas recorren los valores únicos (no las filas).
+    """
+
+    def __init__(self, values, n=NGRAM_SIZE):
+        self.n = n
+        codes, uniques = pd.factorize(values)
+        self.codes = codes.astype(np.int32)
+        self.uniques = np.asarray(uniques, dtype=object)
+        postings = defaultdict(list)
+        for i, text in enumerate(self.uniques):
+            for gram in {text[j:j + n] for j in range(len(text) - n + 1)}:
+                postings[gram].append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def matching_values(self, text):
+        """
+        Índices de los valores únicos que contienen text.
+        """
+        if len(text) < self.n:
+            return [i for i, value in enumerate(self.uniques) if text in value]
+        grams = {text[j:j + self.n] for j in range(len(text) - self.n + 1)}
+        lists = [self.postings.get(gram) for gram in grams]
+        if any(ids is None for ids in lists):
+            return []
+        lists.sort(key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+            if not len(ids):
+                return []
+        if len(text) == self.n:
+            return ids
+        return [i for i in ids if text in self.uniques[i]]
+
+    def match(self, text, candidates=None):
+        """
+        Posiciones ordenadas de las filas que contienen text.
+        """
+        hit = np.zeros(len(self.uniques), dtype=bool)
+        hit[np.asarray(self.matching_values(text), dtype=np.intp)] = True
+        return _rows_for_codes(self.codes, hit, candidates)
+
+
+class CruceFilterEngine:
+    """
+    Motor de filtros en memoria para df_cruce.
+
+    Se construye una sola vez después de importar: precalcula las columnas
+    normalizadas, los códigos categóricos y los índices hash, de prefijos y de
+    n-gramas. Cada búsqueda devuelve un arreglo de posiciones de fila sin copiar
+    el DataFrame.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.indexes = {}
+        self.prefixes = {}
+        self.ngrams = {}
+        self.codes = {}
+        self.categories = {}
+        self.numeric = {}
+        # Permutaciones de orden por (columna, descendente) y sus rangos, al primer uso
+        self._frame = df
+        self._orders = {}
+        self._ranks = {}
+
+        for col in INDEXED_COLUMNS:
+            if col in df.columns:
+                normalized = normalize_column(col, df[col])
+                self.indexes[col] = normalized.groupby(normalized.to_numpy(), sort=False).indices
+                if col in PREFIX_COLUMNS:
+                    self.prefixes[col] = PrefixIndex(normalized.to_numpy())
+
+        for col in NGRAM_COLUMNS:
+            if col in df.columns:
+                self.ngrams[col] = NgramIndex(normalize_column(col, df[col]).to_numpy())
+
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                self.codes[col], self.categories[col] = _categorical_codes(col, df[col])
+
+        for col in RANGE_COLUMNS:
+            if col in df.columns:
+                self.numeric[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+
+        logging.debug("Motor de filtros construido para %d filas", self.n_rows)
+
+    def sort_order(self, column, descending=False):
+        """
+        Permutación de todas las filas ordenadas por column (se calcula una vez por
+        sentido). Descendente deja los nulos al final y los empates en orden de fila.
+        """
+        key = (column, descending)
+        if key not in self._orders:
+            self._orders[key] = _sort_order(self._frame[column], descending)
+        return self._orders[key][0]
+
+    def _sort_rank(self, column, descending):
+        key = (column, descending)
+        if key not in self._ranks:
+            order = self.sort_order(column, descending)
+            rank = np.empty(self.n_rows, dtype=np.intp)
+            rank[order] = np.arange(self.n_rows)
+            self._ranks[key] = rank
+        return self._ranks[key]
+
+    def sort_positions(self, column, positions=None, descending=False):
+        """
+        positions (resultado de un filtro, None = todas las filas) en el orden de column,
+        a partir de la permutación guardada: sin volver a ordenar el DataFrame.
+        """
+        order = self.sort_order(column, descending)
+        if positions is None:
+            return order
+        if len(positions) * SORT_RANK_RATIO < self.n_rows:
+            rank = self._sort_rank(column, descending)
+            return positions[np.argsort(rank[positions], kind="stable")]
+        selected = np.zeros(self.n_rows, dtype=bool)
+        selected[positions] = True
+        return order[selected[order]]
+
+    def _lookup(self, column, value):
+        """
+        Posiciones (ordenadas) donde la columna indexada es igual a value.
+        """
+        positions = self.indexes[column].get(normalize_value(column, value))
+        if positions is None:
+            return np.empty(0, dtype=np.intp)
+        return positions
+
+    def _match_code(self, column, value, candidates):
+        """
+        Filtra por código categórico, sobre los candidatos o sobre todas las filas.
+        """
+        code = self.categories[column].get(normalize_value(column, value))
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        codes = self.codes[column]
+        if candidates is None:
+            return np.flatnonzero(codes == code)
+        return candidates[codes[candidates] == code]
+
+    def _match_code_prefix(self, column, value, candidates):
+        """
+        Filtra por las categorías que empiezan con value.
+        """
+        prefix = normalize_value(column, value)
+        categories = self.categories[column]
+        hit = np.zeros(len(categories) + 1, dtype=bool)
+        for label, code in categories.items():
+            if label.startswith(prefix):
+                hit[code] = True
+        # Código -1 (nulo) cae en la posición extra, que queda en False
+        return _rows_for_codes(self.codes[column], hit, candidates)
+
+    def _match_range(self, column, conditions, candidates):
+        """
+        Filtra por condiciones numéricas [(operador, valor), ...] sobre la columna.
+        """
+        values = self.numeric[column]
+        if candidates is not None:
+            values = values[candidates]
+        mask = np.ones(len(values), dtype=bool)
+        for op, value in conditions:
+            mask &= _OPERATORS[op](values, value)
+        return np.flatnonzero(mask) if candidates is None else candidates[mask]
+
+    def search(self, codigo=None, referencia=None, categoria=None,
+               linea=None, fabrica=None, marca=None, nombre=None, ranges=None,
+               prefix=False, codigos=None):
+        """
+        Aplica los filtros indicados (igualdad exacta tras normalizar).
+        Con prefix=True los textos se buscan como prefijo (búsqueda mientras se escribe).
+        nombre siempre se busca como subcadena; codigos es una lista de códigos de barra.
+        ranges es un dict columna -> [(operador, valor), ...] (ver parse_range).
+        Retorna un arreglo ordenado de posiciones, o None si no hay filtros.
+        """
+        candidates = None
+
+        if codigos and "CodigoBarra" in self.prefixes:
+            values = [normalize_value("CodigoBarra", c) for c in codigos]
+            candidates = self.prefixes["CodigoBarra"].match_values(values)
+
+        # Primero los índices hash: suelen reducir el conjunto a pocas filas
+        for column, value in (("CodigoBarra", codigo), ("Referencia", referencia)):
+            if _is_blank(value) or column not in self.indexes:
+                continue
+            if prefix and column in self.prefixes:
+                candidates = self.prefixes[column].match(normalize_value(column, value), candidates)
+                continue
+            positions = self._lookup(column, value)
+            candidates = positions if candidates is None else np.intersect1d(
+                candidates, positions, assume_unique=True
+            )
+
+        for column, value in (("CategoriaNombre", categoria), ("Linea", linea),
+                              ("CodigoFabricante", fabrica), ("Marca", marca)):
+            if _is_blank(value) or column not in self.codes:
+                continue
+            if prefix:
+                candidates = self._match_code_prefix(column, value, candidates)
+            else:
+                candidates = self._match_code(column, value, candidates)
+
+        if not _is_blank(nombre) and "Nombre" in self.ngrams:
+            candidates = self.ngrams["Nombre"].match(normalize_value("Nombre", nombre), candidates)
+
+        for column, conditions in (ranges or {}).items():
+            if conditions and column in self.numeric:
+                candidates = self._match_range(column, conditions, candidates)
+
+        return candidates
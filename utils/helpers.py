@@ -2,9 +2,9 @@ import os
 import platform
 from pathlib import Path
 import pandas as pd
-import tkinter as tk
 from tkinter import filedialog
 import logging
+from utils.exporter import EXPORT_FORMATS
 
 # Configurar logging para un mejor rastreo de la ejecución.
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -21,34 +21,15 @@ def get_desktop_folder() -> str:
     else:
         return str(Path.home() / "Desktop")
 
-def export_to_excel(data, output_file: str) -> None:
-    """
-    Exporta los datos proporcionados a un archivo Excel en la ruta especificada.
-
-    Args:
-        data: Lista de diccionarios con los datos a exportar.
-              Cada diccionario representa una fila, donde las claves son los nombres de las columnas.
-        output_file (str): Ruta absoluta y nombre del archivo Excel.
-    """
-    try:
-        # Se obtiene un DataFrame con las columnas definidas por las claves del primer diccionario.
-        df = pd.DataFrame(data, columns=data[0].keys()) if data else pd.DataFrame()
-        with pd.ExcelWriter(output_file) as writer:
-            df.to_excel(writer, sheet_name="Cruce", index=False)
-        logging.info("Archivo guardado exitosamente en: %s", output_file)
-    except Exception as e:
-        logging.error("Error al exportar a Excel: %s", e)
-        raise
-
 def get_save_path(parent):
     """
-    Abre un diálogo para guardar un archivo Excel, iniciando en el Escritorio.
+    Abre un diálogo para guardar la exportación (Excel, CSV o Parquet), iniciando en el Escritorio.
 
     Args:
         parent (tk.Tk): La ventana padre para el diálogo.
     
     Returns:
-        str: La ruta seleccionada (incluyendo la extensión .xlsx) o una cadena vacía si se cancela.
+        str: La ruta seleccionada (con su extensión; .xlsx por defecto) o una cadena vacía si se cancela.
     """
     desktop_path = get_desktop_folder()
     
@@ -57,43 +38,41 @@ def get_save_path(parent):
     # Aquí usamos 'parent' para que el diálogo se muestre como hijo de dicha ventana.
     file_path = filedialog.asksaveasfilename(
         parent=parent,
-        title="Guardar archivo Excel",
+        title="Guardar exportación",
         initialdir=desktop_path,
         defaultextension=".xlsx",
-        filetypes=[("Archivos Excel", "*.xlsx")]
+        filetypes=[(name, f"*{ext}") for ext, name in EXPORT_FORMATS.items()]
     )
     return file_path
 
-def obtener_datos_treeview(tree: tk.ttk.Treeview) -> list:
+def read_code_file(path) -> list:
     """
-    Extrae los datos actualmente visibles en el widget Treeview.
+    Lee una lista de códigos de barra de un archivo: la primera columna de un Excel
+    o todo el texto de un .txt/.csv (ver parse_code_list).
 
     Args:
-        tree (tk.ttk.Treeview): Widget Treeview del cual extraer los datos.
+        path (str): Ruta del archivo.
 
     Returns:
-        list: Lista de diccionarios, donde cada diccionario representa una fila del Treeview.
+        list: Códigos sin repetir, en el orden del archivo.
     """
-    datos = []
-    for item_id in tree.get_children():
-        valores = tree.item(item_id)["values"]
-        fila = dict(zip(tree["columns"], valores))
-        datos.append(fila)
-    return datos
+    from utils.filter_engine import parse_code_list
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        column = pd.read_excel(path, header=None, dtype=str).iloc[:, 0].dropna()
+        return parse_code_list("\n".join(column))
+    with open(path, encoding="utf-8-sig", errors="replace") as fh:
+        return parse_code_list(fh.read())
 
-if __name__ == '__main__':
-    # Datos de ejemplo (esto simula la salida real que podrías extraer de un Treeview)
-    data = [
-        {"Columna1": "Dato 1", "Columna2": "Dato 2"},
-        {"Columna1": "Dato 3", "Columna2": "Dato 4"}
-    ]
-    
-    # Solicita la ruta donde se guardará el archivo Excel.
-    output_file = get_save_path()
-    if output_file:
-        try:
-            export_to_excel(data, output_file)
-        except Exception as e:
-            print("Ocurrió un error durante la exportación:", e)
-    else:
-        logging.info("Operación cancelada. No se ha guardado el archivo.")
+def ask_code_file(parent) -> str:
+    """
+    Abre un diálogo para elegir el archivo con la lista de códigos.
+
+    Returns:
+        str: La ruta seleccionada o una cadena vacía si se cancela.
+    """
+    return filedialog.askopenfilename(
+        parent=parent,
+        title="Lista de códigos de barra",
+        initialdir=get_desktop_folder(),
+        filetypes=[("Listas de códigos", "*.xlsx *.xls *.txt *.csv"), ("Todos", "*.*")]
+    )
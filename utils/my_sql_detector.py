@@ -1,46 +1,438 @@
 # utils/my_sql_detector.py
+"""
+Descubrimiento de instancias SQL Server con el protocolo del servicio SQL Browser
+(UDP 1434): un broadcast general, más sondeos dirigidos a las subredes indicadas, todos
+desde el mismo socket. Las instancias se entregan a medida que responden y, en
+paralelo, se mide la latencia de conexión TCP de cada una para ordenarlas (sin
+credenciales no hay login). Las instancias predefinidas (rank_instances) se ordenan
+por el tiempo de conexión e inicio de sesión ODBC si pyodbc está instalado.
 
-import socket
+Solo usa la biblioteca estándar (pyodbc es opcional y se importa al medir): la
+ventana lo puede importar antes de cargar pandas.
+"""
+
+import os
+import json
 import time
+import queue
+import select
+import socket
 import getpass
+import logging
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def get_available_sql_servers(timeout=5):
+BROWSER_PORT = 1434
+# CLNT_BCAST_EX / CLNT_UCAST_EX / CLNT_UCAST_INST del protocolo SQL Browser
+CLNT_BCAST_EX = b"\x02"
+CLNT_UCAST_EX = b"\x03"
+CLNT_UCAST_INST = b"\x04"
+SVR_RESP = 0x05
+
+# Subredes más grandes que esto solo reciben el broadcast dirigido (no host por host)
+MAX_SWEEP_HOSTS = 1024
+# Segundos para el connect TCP al medir la latencia
+LATENCY_TIMEOUT = 2.0
+# Segundos para conectarse e iniciar sesión por ODBC (timeout de login de pyodbc)
+LOGIN_TIMEOUT = 5
+ODBC_DRIVER = "SQL Server"
+LATENCY_WORKERS = 16
+
+# Vigencia de las listas guardadas en disco; CRUCE_DISCOVERY_TTL
+DISCOVERY_TTL_SECONDS = float(os.environ.get("CRUCE_DISCOVERY_TTL", 3600))
+DISCOVERY_FILE = "servidores_sql.json"
+RANKING_FILE = "latencia_instancias.json"
+
+# Subredes a sondear además del broadcast ("192.168.1.0/24,10.0.5.0/24"); CRUCE_DISCOVERY_SUBNETS
+DISCOVERY_SUBNETS = [s.strip() for s in os.environ.get("CRUCE_DISCOVERY_SUBNETS", "").split(",") if s.strip()]
+
+
+class SqlServerInfo:
     """
-    Escanea la red por broadcast UDP para descubrir instancias SQL Server.
-    Devuelve una lista de strings con formato IP\INSTANCIA o IP si no tiene nombre.
+    Una instancia que respondió al SQL Browser; latency_ms es None si no se midió
+    y float("inf") si no se pudo conectar.
+    """
+
+    def __init__(self, ip, instance="", server_name="", version="", tcp_port=None, latency_ms=None):
+        self.ip = ip
+        self.instance = instance
+        self.server_name = server_name
+        self.version = version
+        self.tcp_port = tcp_port
+        self.latency_ms = latency_ms
+
+    @property
+    def label(self):
+        """
+        IP\\INSTANCIA, o solo la IP para la instancia por defecto (MSSQLSERVER).
+        """
+        if self.instance and self.instance.upper() != "MSSQLSERVER":
+            return f"{self.ip}\\{self.instance}"
+        return self.ip
+
+    @property
+    def key(self):
+        return (self.ip, self.instance.upper())
+
+    @property
+    def reachable(self):
+        return self.latency_ms is not None and self.latency_ms != float("inf")
+
+    def to_json(self):
+        return {"ip": self.ip, "instance": self.instance, "server_name": self.server_name,
+                "version": self.version, "tcp_port": self.tcp_port, "latency_ms": self.latency_ms}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["ip"], data.get("instance", ""), data.get("server_name", ""),
+                   data.get("version", ""), data.get("tcp_port"), data.get("latency_ms"))
+
+    def __repr__(self):
+        latency = "-" if self.latency_ms is None else f"{self.latency_ms:.1f} ms"
+        return f"SqlServerInfo({self.label}, puerto={self.tcp_port}, {latency})"
+
+
+def rank_servers(servers):
+    """
+    Las alcanzables primero, de menor a mayor latencia; luego las no medidas y las caídas.
     """
-    message = b'\x02'
-    broadcast_address = ('255.255.255.255', 1434)
-    responses = []
+    def _key(s):
+        if s.reachable:
+            return (0, s.latency_ms)
+        return (1 if s.latency_ms is None else 2, 0.0)
+    return sorted(servers, key=_key)
 
+
+def parse_browser_response(data, ip):
+    """
+    Interpreta una respuesta SVR_RESP (0x05, largo de 2 bytes y texto "clave;valor;...")
+    con una o más instancias separadas por ";;".
+    """
+    if data[:1] == bytes([SVR_RESP]) and len(data) >= 3:
+        size = int.from_bytes(data[1:3], "little")
+        data = data[3:3 + size]
+    text = data.decode("ascii", errors="ignore")
+    servers = []
+    for record in text.split(";;"):
+        fields = record.strip(";").split(";")
+        if len(fields) < 2:
+            continue
+        values = dict(zip(fields[::2], fields[1::2]))
+        tcp = values.get("tcp")
+        servers.append(SqlServerInfo(
+            ip, instance=values.get("InstanceName", ""), server_name=values.get("ServerName", ""),
+            version=values.get("Version", ""), tcp_port=int(tcp) if tcp and tcp.isdigit() else None
+        ))
+    return servers
+
+
+def _probe_targets(subnets, port):
+    """
+    Destinos de los sondeos dirigidos: el broadcast de cada subred y, si es chica,
+    cada uno de sus hosts.
+    """
+    targets = []
+    for subnet in subnets or ():
+        network = ipaddress.ip_network(subnet, strict=False)
+        if network.num_addresses > 2:
+            targets.append((str(network.broadcast_address), port))
+        if network.num_addresses <= MAX_SWEEP_HOSTS:
+            hosts = list(network.hosts()) or [network.network_address]
+            targets.extend((str(h), port) for h in hosts)
+    return targets
+
+
+def iter_sql_servers(timeout=2.0, subnets=None, broadcast=True, port=BROWSER_PORT):
+    """
+    Envía los sondeos y entrega cada SqlServerInfo en cuanto llega su respuesta (sin
+    repetir). Termina timeout segundos después del último envío.
+    """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    sock.settimeout(timeout)
-
+    sock.setblocking(False)
+    seen = set()
     try:
-        sock.sendto(message, broadcast_address)
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        if broadcast:
             try:
-                data, addr = sock.recvfrom(4096)
-                response = data.decode(errors='ignore')
-                responses.append((addr[0], response))
-            except socket.timeout:
+                sock.sendto(CLNT_BCAST_EX, ("255.255.255.255", port))
+            except OSError as e:
+                logging.debug("No se pudo enviar el broadcast: %s", e)
+        for target in _probe_targets(subnets, port):
+            try:
+                sock.sendto(CLNT_UCAST_EX, target)
+            except OSError as e:
+                logging.debug("No se pudo sondear %s: %s", target[0], e)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if not ready:
                 break
+            try:
+                data, addr = sock.recvfrom(65535)
+            except OSError:
+                # p. ej. ICMP "puerto inalcanzable" de un host sondeado
+                continue
+            for server in parse_browser_response(data, addr[0]):
+                if server.key not in seen:
+                    seen.add(server.key)
+                    yield server
     finally:
         sock.close()
 
-    instances = []
-    for ip, resp in responses:
-        fields = resp.split(";")
-        data = dict(zip(fields[::2], fields[1::2]))
-        server = data.get("ServerName", "")
-        instance = data.get("InstanceName", "")
-        if instance and instance.upper() != "MSSQLSERVER":
-            instances.append(f"{ip}\\{instance}")
-        else:
-            instances.append(ip)
-    return instances
+
+def measure_latency(server, timeout=LATENCY_TIMEOUT, default_port=1433):
+    """
+    Tiempo del connect TCP al puerto de la instancia, en ms (inf si no responde).
+    No incluye el inicio de sesión (ver login_latency).
+    """
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((server.ip, server.tcp_port or default_port), timeout=timeout):
+            server.latency_ms = (time.perf_counter() - start) * 1000
+    except OSError:
+        server.latency_ms = float("inf")
+    return server
+
+
+class DiscoveryCache:
+    """
+    Una lista (servidores descubiertos o latencias) en un JSON junto a la caché de
+    resultados; vence a los ttl segundos. Las latencias inf se guardan como Infinity.
+    """
+
+    def __init__(self, filename=DISCOVERY_FILE, ttl=DISCOVERY_TTL_SECONDS, folder=None):
+        self.filename = filename
+        self.ttl = ttl
+        self._folder = folder
+
+    @property
+    def path(self):
+        if self._folder is None:
+            # Import diferido: result_cache carga pyarrow
+            from utils.result_cache import get_cache_folder
+            self._folder = get_cache_folder()
+        return os.path.join(self._folder, self.filename)
+
+    def get(self):
+        """
+        Lista guardada si no venció, o None.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - data.get("guardado", 0) > self.ttl:
+            return None
+        return data.get("items")
+
+    def put(self, items):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"guardado": time.time(), "items": items}, fh)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning("No se pudo guardar %s: %s", self.filename, e)
+
+
+class SqlServerDiscovery:
+    """
+    Descubrimiento en un hilo aparte. Los resultados llegan a self.queue como
+    ("server", SqlServerInfo), ("latency", SqlServerInfo) y, al final, ("done", lista
+    ordenada por latencia) o ("error", excepción). Si la caché está vigente se
+    entrega esa lista sin tocar la red.
+    """
+
+    def __init__(self, timeout=2.0, subnets=None, broadcast=True, port=BROWSER_PORT,
+                 cache=None, measure=True):
+        self.timeout = timeout
+        self.subnets = subnets
+        self.broadcast = broadcast
+        self.port = port
+        self.cache = cache
+        self.measure = measure
+        self.queue = queue.Queue()
+        self._thread = None
+
+    def start(self, force_refresh=False):
+        self._thread = threading.Thread(target=self._run, args=(force_refresh,),
+                                        name="sql-discovery", daemon=True)
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def results(self):
+        """
+        Itera los mensajes de self.queue hasta ("done", ...) o ("error", ...) (bloqueante).
+        """
+        while True:
+            item = self.queue.get()
+            yield item
+            if item[0] in ("done", "error"):
+                return
+
+    def _run(self, force_refresh):
+        try:
+            if self.cache is not None and not force_refresh:
+                cached = self.cache.get()
+                if cached is not None:
+                    cached = [SqlServerInfo.from_json(s) for s in cached]
+                    for server in cached:
+                        self.queue.put(("server", server))
+                    self.queue.put(("done", rank_servers(cached)))
+                    return
+
+            servers = []
+            with ThreadPoolExecutor(max_workers=LATENCY_WORKERS, thread_name_prefix="latencia") as pool:
+                futures = []
+                for server in iter_sql_servers(self.timeout, self.subnets, self.broadcast, self.port):
+                    servers.append(server)
+                    self.queue.put(("server", server))
+                    if self.measure:
+                        future = pool.submit(measure_latency, server)
+                        future.add_done_callback(lambda f: self.queue.put(("latency", f.result())))
+                        futures.append(future)
+                for future in futures:
+                    future.result()
+            ranked = rank_servers(servers)
+            if self.cache is not None:
+                self.cache.put([s.to_json() for s in ranked])
+            self.queue.put(("done", ranked))
+        except Exception as e:
+            logging.exception("Error al buscar servidores SQL")
+            self.queue.put(("error", e))
+
+
+def discover_sql_servers(timeout=2.0, subnets=None, use_cache=True, force_refresh=False):
+    """
+    Lista de SqlServerInfo ordenada por latencia (bloquea hasta terminar).
+    """
+    subnets = DISCOVERY_SUBNETS if subnets is None else subnets
+    discovery = SqlServerDiscovery(timeout, subnets, cache=DiscoveryCache() if use_cache else None)
+    for kind, payload in discovery.start(force_refresh).results():
+        if kind == "error":
+            raise payload
+        if kind == "done":
+            return payload
+    return []
+
+
+def get_available_sql_servers(timeout=5):
+    """
+    Escanea la red por broadcast UDP para descubrir instancias SQL Server.
+    Devuelve una lista de strings con formato IP\\INSTANCIA o IP si no tiene nombre,
+    de la más rápida a la más lenta.
+    """
+    return [s.label for s in discover_sql_servers(timeout, use_cache=False)]
+
+
+def split_server_name(server_name):
+    """
+    ("HOST", "INSTANCIA") a partir de "HOST\\INSTANCIA" (instancia vacía si no la trae).
+    """
+    host, _, instance = server_name.partition("\\")
+    return host, instance
+
+
+def instance_latency(server_name, timeout=LATENCY_TIMEOUT, port=BROWSER_PORT):
+    """
+    Latencia en ms de una instancia conocida por nombre: se pregunta su puerto al SQL
+    Browser del host (CLNT_UCAST_INST) y se mide el connect TCP. inf si no responde.
+    """
+    host, instance = split_server_name(server_name)
+    try:
+        ip = socket.gethostbyname(host)
+    except OSError:
+        return float("inf")
+    server = SqlServerInfo(ip, instance)
+    if instance:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(CLNT_UCAST_INST + instance.encode("ascii", errors="ignore") + b"\x00", (ip, port))
+            data, _ = sock.recvfrom(65535)
+            found = [s for s in parse_browser_response(data, ip) if s.instance.upper() == instance.upper()]
+            if found:
+                server = found[0]
+        except OSError:
+            return float("inf")
+        finally:
+            sock.close()
+    return measure_latency(server, timeout).latency_ms
+
+
+def _odbc_value(value):
+    # Entre llaves (con "}" duplicada) admite ; y = en la contraseña
+    return "{" + str(value).replace("}", "}}") + "}"
+
+
+def login_latency(config, timeout=LOGIN_TIMEOUT):
+    """
+    Latencia en ms de conectarse e iniciar sesión por ODBC con la configuración de una
+    instancia (server_name, login, password); inf si no responde o rechaza el login.
+    None si pyodbc no está instalado.
+    """
+    try:
+        import pyodbc
+    except ImportError:
+        return None
+    conn_str = ";".join([
+        f"DRIVER={_odbc_value(ODBC_DRIVER)}", f"SERVER={config['server_name']}",
+        "DATABASE=BODEGA_DATOS", f"UID={_odbc_value(config['login'])}",
+        f"PWD={_odbc_value(config['password'])}",
+    ])
+    start = time.perf_counter()
+    try:
+        pyodbc.connect(conn_str, timeout=timeout, autocommit=True).close()
+    except pyodbc.Error as e:
+        logging.debug("Sin conexión a %s: %s", config["server_name"], e)
+        return float("inf")
+    return (time.perf_counter() - start) * 1000
+
+
+def _instance_ms(config, timeout, port, login):
+    if login and config.get("login"):
+        ms = login_latency(config)
+        if ms is not None:
+            return ms
+    return instance_latency(config["server_name"], timeout, port)
+
+
+def rank_instances(instances, timeout=LATENCY_TIMEOUT, cache=None, force_refresh=False,
+                   port=BROWSER_PORT, login=True):
+    """
+    Mide a la vez la latencia de las instancias predefinidas (alias -> configuración con
+    server_name) y retorna [(alias, ms)] de la más rápida a la más lenta. Las que se
+    configuran con una URL (p. ej. SQLite de prueba) no se miden y quedan al final.
+    Con login y pyodbc instalado se mide la conexión con inicio de sesión (login_latency),
+    así una instancia que rechaza el login queda al final; si no, solo el connect TCP.
+    Con cache (DiscoveryCache) se reutiliza la última medición vigente.
+    """
+    if cache is not None and not force_refresh:
+        cached = cache.get()
+        if cached is not None and {alias for alias, _ in cached} == set(instances):
+            return [tuple(item) for item in cached]
+
+    configs = {alias: config for alias, config in instances.items()
+               if config.get("server_name") and not config.get("url")}
+    with ThreadPoolExecutor(max_workers=max(1, len(configs)), thread_name_prefix="latencia") as pool:
+        latencies = dict(zip(configs, pool.map(lambda c: _instance_ms(c, timeout, port, login),
+                                               configs.values())))
+    ranked = sorted(latencies.items(), key=lambda item: item[1])
+    ranked += [(alias, None) for alias in instances if alias not in latencies]
+    if cache is not None:
+        cache.put(ranked)
+    return ranked
+
 
 def get_default_username():
     """
@@ -0,0 +1,140 @@
+"""
+Mediciones por etapa (conexión, query, armado del DataFrame, filtros, grilla, exportación).
+
+    with span("populate_tree") as s:
+        ...
+        s.rows = len(df)
+
+Cada medición se escribe como JSON en el logger 'cruce.perf' y queda en un historial
+de las últimas PERF_HISTORY operaciones (pestaña "Rendimiento" de MainView).
+"""
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from collections import deque
+from datetime import datetime
+
+PERF_HISTORY = int(os.environ.get("CRUCE_PERF_HISTORY", 50))
+
+logger = logging.getLogger("cruce.perf")
+
+
+class Span:
+    """
+    Una operación medida: segundos, filas y bytes (opcionales) y datos extra.
+    """
+
+    def __init__(self, name, **extra):
+        self.name = name
+        self.extra = extra
+        self.rows = None
+        self.bytes = None
+        self.error = None
+        self.started_at = None
+        self.seconds = None
+        self.thread = threading.current_thread().name
+        self._start = None
+
+    @property
+    def rows_per_sec(self):
+        if self.rows is None or not self.seconds:
+            return None
+        return self.rows / self.seconds
+
+    def __enter__(self):
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        PERF_LOG.record(self)
+        return False
+
+    def as_dict(self):
+        data = {
+            "op": self.name,
+            "inicio": self.started_at.isoformat(timespec="milliseconds") if self.started_at else None,
+            "segundos": round(self.seconds, 4) if self.seconds is not None else None,
+            "filas": self.rows,
+            "filas_s": round(self.rows_per_sec, 1) if self.rows_per_sec is not None else None,
+            "bytes": self.bytes,
+            "hilo": self.thread,
+        }
+        if self.error:
+            data["error"] = self.error
+        data.update(self.extra)
+        return data
+
+
+class PerfLog:
+    """
+    Historial acotado de mediciones, seguro entre hilos.
+    version aumenta con cada registro para que la interfaz sepa cuándo repintar.
+    """
+
+    def __init__(self, maxlen=PERF_HISTORY):
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=maxlen)
+        self.version = 0
+
+    def record(self, span):
+        with self._lock:
+            self._spans.append(span)
+            self.version += 1
+        logger.info(json.dumps(span.as_dict(), ensure_ascii=False, default=str))
+
+    def recent(self):
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self.version += 1
+
+
+PERF_LOG = PerfLog()
+
+
+def span(name, **extra):
+    return Span(name, **extra)
+
+
+def record_span(name, seconds, rows=None, nbytes=None, **extra):
+    """
+    Registra una medición tomada a mano (p. ej. tiempo acumulado entre lotes).
+    """
+    s = Span(name, **extra)
+    s.started_at = datetime.now()
+    s.seconds, s.rows, s.bytes = seconds, rows, nbytes
+    PERF_LOG.record(s)
+    return s
+
+
+def timed(name, rows=None):
+    """
+    Decorador: mide cada llamada. rows(resultado) retorna las filas a registrar.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as s:
+                result = func(*args, **kwargs)
+                if rows is not None and result is not None:
+                    s.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def frame_bytes(df):
+    """
+    Bytes de un DataFrame (sin recorrer el contenido de los textos, para que sea barato).
+    """
+    return int(df.memory_usage(index=False, deep=False).sum())
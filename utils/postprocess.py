@@ -0,0 +1,154 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.display import CRUCE_COLUMNS, PERCENT_COLUMNS, format_percentage
+
+
+def apply_percentages(df, queda):
+    """
+    Asigna Queda y Vendido numéricos (en puntos porcentuales) a partir de Queda.
+    Replica el '0%' del query original cuando la división no es válida (NaN).
+    """
+    queda = pd.to_numeric(pd.Series(queda, index=df.index), errors="coerce").astype("float64")
+    valid = queda.notna().to_numpy()
+    values = queda.to_numpy()
+    df["Queda"] = np.where(valid, values, 0.0)
+    df["Vendido"] = np.where(valid, 100.0 - values, 0.0)
+    return df
+
+
+def percentages_from_existencia(df, existencia=None):
+    """
+    Recalcula Queda/Vendido con ExistenciaActual * 100 / Cantidad_Inicial_Agrupada.
+    Si se pasa 'existencia' con NaN (sin dato de bodega) esas filas quedan en 0.
+    """
+    if existencia is None:
+        existencia = df["ExistenciaActual"]
+    cantidad = pd.to_numeric(df["Cantidad_Inicial_Agrupada"], errors="coerce").to_numpy(dtype="float64")
+    existencia = pd.to_numeric(existencia, errors="coerce").to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        queda = np.where(cantidad != 0, existencia * 100.0 / cantidad, np.nan)
+    return apply_percentages(df, queda)
+
+
+def add_percentage_columns(df):
+    """
+    Etapa posterior al fetch: convierte el Queda numérico del query y agrega Vendido.
+    """
+    if "Queda" not in df.columns:
+        return df
+    return apply_percentages(df, df["Queda"])
+
+
+def format_for_export(df):
+    """
+    Copia del DataFrame con los porcentajes como texto, para exportar.
+    correccion vuelve a 0/1 y FechaLlegada a fecha sin hora.
+    """
+    out = df.copy()
+    for col in PERCENT_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].map(format_percentage)
+    if "correccion" in out.columns and out["correccion"].dtype == bool:
+        out["correccion"] = out["correccion"].astype(int)
+    if "FechaLlegada" in out.columns and pd.api.types.is_datetime64_any_dtype(out["FechaLlegada"]):
+        out["FechaLlegada"] = out["FechaLlegada"].dt.date
+    return out
+
+
+# Texto repetitivo que se guarda como categoría
+CATEGORY_COLUMNS = (
+    "Marca", "CodigoMarca", "CategoriaNombre", "CategoriaCodigo", "Linea",
+    "Nombre_Fabricante", "CodigoFabricante", "observacion",
+)
+# Contadores que se reducen al entero más chico que los contiene. Queda/Vendido siguen
+# en float64: con float32 cambiaría el redondeo a dos decimales y los filtros por rango.
+INTEGER_COLUMNS = ("CantidadInicial", "Cantidad_Inicial_Agrupada", "ExistenciaActual", "NumeroTransferencia")
+
+
+def column_memory(df):
+    """
+    Bytes por columna (incluye el contenido de los objetos Python).
+    """
+    return df.memory_usage(deep=True, index=False).to_dict()
+
+
+def compact_dtypes(df):
+    """
+    Reduce la memoria del cruce: categorías para texto repetitivo, enteros más
+    chicos, correccion como booleano y FechaLlegada como datetime64.
+    Retorna (DataFrame, reporte) con los bytes antes/después por columna.
+    """
+    before = column_memory(df)
+    out = df.copy(deep=False)
+
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    for col in INTEGER_COLUMNS:
+        if col in out.columns:
+            values = pd.to_numeric(out[col], errors="coerce")
+            out[col] = pd.to_numeric(values, downcast="integer" if values.notna().all() else "float")
+    if "correccion" in out.columns:
+        out["correccion"] = pd.to_numeric(out["correccion"], errors="coerce").fillna(0).astype(bool)
+    if "FechaLlegada" in out.columns:
+        out["FechaLlegada"] = pd.to_datetime(out["FechaLlegada"], errors="coerce")
+
+    after = column_memory(out)
+    report = {col: (before.get(col, 0), after.get(col, 0)) for col in out.columns}
+    total_before = sum(b for b, _ in report.values())
+    total_after = sum(a for _, a in report.values())
+    logging.info("Memoria del cruce: %.1f MB -> %.1f MB", total_before / 2**20, total_after / 2**20)
+    return out, report
+
+
+def format_memory_report(report):
+    """
+    Texto con los bytes antes/después por columna y el total.
+    """
+    lines = [f"{'Columna':<28}{'Antes':>12}{'Después':>12}"]
+    for col, (before, after) in report.items():
+        lines.append(f"{col:<28}{before / 1024:>10,.0f}KB{after / 1024:>10,.0f}KB")
+    total_before = sum(b for b, _ in report.values())
+    total_after = sum(a for _, a in report.values())
+    lines.append(f"{'Total':<28}{total_before / 2**20:>10,.1f}MB{total_after / 2**20:>10,.1f}MB")
+    return "\n".join(lines)
+
+
+# Columnas que se suman al totalizar el cruce por grupos (aggregate_frames)
+SUM_COLUMNS = ("CantidadInicial", "Cantidad_Inicial_Agrupada")
+# Existencia actual de cada código: se repite en todas sus fechas de llegada, así que
+# entra una sola vez por código en el total del grupo
+STOCK_COLUMNS = ("ExistenciaActual",)
+
+
+def aggregate_frames(frames, by, columns=SUM_COLUMNS, stock_columns=STOCK_COLUMNS):
+    """
+    Totales del cruce por las columnas de 'by' recorriendo bloques (p. ej.
+    db.connection.iter_cruce_frames): de cada bloque solo se guardan las sumas por
+    grupo y la existencia por (grupo, CodigoBarra), que se suma una vez por código.
+    Agrega "Filas" (filas del cruce en el grupo) y Queda/Vendido sobre los totales.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    columns, stock_columns = list(columns), list(stock_columns)
+    keys = by + [c for c in ("CodigoBarra",) if c not in by]
+    totals = stock = None
+    for df in frames:
+        grouped = df.groupby(by, dropna=False, observed=True, sort=False)
+        part = grouped[columns].sum()
+        part["Filas"] = grouped.size()
+        totals = part if totals is None else totals.add(part, fill_value=0)
+        codes = df.groupby(keys, dropna=False, observed=True, sort=False)[stock_columns].max()
+        if stock is not None:
+            # Un código puede repetirse en otro bloque (otra fecha de llegada)
+            codes = pd.concat([stock, codes]).groupby(level=list(range(len(keys))),
+                                                      dropna=False, sort=False).max()
+        stock = codes
+    if totals is None:
+        return pd.DataFrame(columns=by + columns + stock_columns + ["Filas", "Queda", "Vendido"])
+    stock = stock.groupby(level=list(range(len(by))), dropna=False, sort=False).sum()
+    totals = totals.join(stock)[columns + stock_columns + ["Filas"]]
+    out = totals.sort_index().reset_index()
+    out["Filas"] = out["Filas"].astype("int64")
+    return percentages_from_existencia(out)
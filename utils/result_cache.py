@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import platform
+import threading
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sin pyarrow la caché queda deshabilitada
+    pa = None
+    feather = None
+
+# Valores por defecto; se pueden cambiar con variables de entorno
+DEFAULT_TTL_SECONDS = int(os.environ.get("CRUCE_CACHE_TTL", 6 * 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get("CRUCE_CACHE_MAX_MB", 2048)) * 1024 * 1024
+CACHE_SUFFIX = ".arrow"
+
+
+def get_cache_folder() -> str:
+    """
+    Retorna la carpeta de la caché local (CRUCE_CACHE_DIR o la carpeta de datos del usuario).
+    """
+    if os.environ.get("CRUCE_CACHE_DIR"):
+        return os.environ["CRUCE_CACHE_DIR"]
+    if platform.system() == "Windows":
+        base = os.environ.get("LOCALAPPDATA", str(Path.home()))
+        return os.path.join(base, "FiltroCruce", "cache")
+    return str(Path.home() / ".cache" / "filtro_cruce")
+
+
+def make_cache_key(alias, fecha_option, sql, params=None) -> str:
+    """
+    Clave de caché: alias de instancia, opción de fecha y hash del SQL (con sus parámetros).
+    """
+    digest = hashlib.sha1(sql.encode("utf-8"))
+    if params:
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", str(alias)).strip("_") or "default"
+    return f"{slug}_{fecha_option}_{digest.hexdigest()[:16]}"
+
+
+class ResultCache:
+    """
+    Caché en disco de resultados del cruce en formato Arrow IPC (Feather v2).
+
+    Los archivos se escriben sin compresión para poder abrirlos con memory map.
+    Cada entrada vence a los ttl segundos y, si la carpeta supera max_bytes,
+    se eliminan primero las entradas usadas hace más tiempo (LRU por fecha de acceso).
+    """
+
+    def __init__(self, folder=None, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = folder or get_cache_folder()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + CACHE_SUFFIX)
+
+    def has(self, key):
+        """
+        True si hay una copia vigente bajo key (sin leerla).
+        """
+        if not self.enabled:
+            return False
+        try:
+            mtime = os.stat(self._path(key)).st_mtime
+        except OSError:
+            return False
+        return self.ttl is None or time.time() - mtime <= self.ttl
+
+    def get(self, key):
+        """
+        Retorna el DataFrame guardado bajo key, o None si no existe o venció.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        # mtime = momento de escritura (get() solo toca atime)
+        if self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+            logging.debug("Entrada de caché vencida: %s", key)
+            self.invalidate(key)
+            return None
+
+        start = time.perf_counter()
+        table = feather.read_table(path, memory_map=True)
+        df = table.to_pandas()
+        # Se actualiza la fecha de acceso (LRU) sin tocar la de escritura (TTL)
+        os.utime(path, (time.time(), stat.st_mtime))
+        logging.debug("Caché leída (%s, %d filas) en %.3fs", key, len(df), time.perf_counter() - start)
+        return df
+
+    def put(self, key, df):
+        """
+        Guarda el DataFrame bajo key (escritura atómica) y aplica el límite de tamaño.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+            logging.debug("Caché guardada: %s (%d filas)", key, len(df))
+        except Exception as e:
+            logging.warning("No se pudo guardar la caché %s: %s", key, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        """
+        Lista de (ruta, tamaño, último acceso) de las entradas de la caché.
+        """
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_atime))
+        return entries
+
+    def evict(self):
+        """
+        Elimina las entradas menos usadas hasta quedar por debajo de max_bytes.
+        """
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logging.debug("Caché desalojada: %s", path)
+                except OSError:
+                    pass
+
+
+_default_cache = None
+
+
+def get_result_cache():
+    """
+    Retorna la caché compartida del proceso.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
@@ -0,0 +1,119 @@
+"""
+Perfil de arranque: tiempo de import por módulo y tiempo hasta el primer cuadro.
+
+Se activa con la variable de entorno CRUCE_PROFILE_STARTUP=1 y debe importarse
+antes que cualquier otra cosa en main.py. El presupuesto de arranque (segundos hasta
+que la ventana responde) se cambia con CRUCE_STARTUP_BUDGET.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+
+ENABLED = os.environ.get("CRUCE_PROFILE_STARTUP", "").strip() not in ("", "0")
+STARTUP_BUDGET_SECONDS = float(os.environ.get("CRUCE_STARTUP_BUDGET", 1.5))
+TOP_IMPORTS = 15
+
+_START = time.perf_counter()
+_marks = []
+_imports = {}
+_local = threading.local()
+
+
+def elapsed():
+    return time.perf_counter() - _START
+
+
+def mark(name):
+    """
+    Registra un hito del arranque (segundos desde que se importó este módulo).
+    """
+    if ENABLED:
+        _marks.append((name, elapsed(), threading.current_thread().name))
+
+
+class _TimedLoader:
+    """
+    Envuelve el loader de un módulo para medir cuánto tarda en ejecutarse.
+    Solo se registran los imports de primer nivel de cada hilo (tiempo acumulado).
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            _local.depth = depth
+            if depth == 0:
+                _imports[module.__name__] = time.perf_counter() - start
+
+
+class _TimingFinder:
+    """
+    Finder de sys.meta_path que delega en los demás y cambia el loader por _TimedLoader.
+    """
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def install():
+    """
+    Empieza a medir los imports (no hace nada si el perfil está desactivado).
+    """
+    if ENABLED and not any(isinstance(f, _TimingFinder) for f in sys.meta_path):
+        sys.meta_path.insert(0, _TimingFinder())
+        mark("inicio")
+
+
+def report():
+    """
+    Texto con los hitos y los imports más lentos.
+    """
+    lines = ["Hitos de arranque:"]
+    for name, seconds, thread in _marks:
+        lines.append(f"  {seconds * 1000:>8.0f} ms  {name}  [{thread}]")
+    lines.append(f"Imports más lentos (acumulado, top {TOP_IMPORTS}):")
+    ranked = sorted(_imports.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    for name, seconds in ranked:
+        lines.append(f"  {seconds * 1000:>8.0f} ms  {name}")
+    return "\n".join(lines)
+
+
+def first_frame(window):
+    """
+    Marca el primer cuadro cuando Tk queda libre después de dibujar la ventana,
+    escribe el reporte en el log y avisa si se pasó del presupuesto.
+    """
+    if not ENABLED:
+        return
+
+    def _done():
+        mark("primer cuadro")
+        logging.info("%s", report())
+        total = elapsed()
+        if total > STARTUP_BUDGET_SECONDS:
+            logging.warning("Arranque de %.2fs, por encima del presupuesto de %.2fs",
+                            total, STARTUP_BUDGET_SECONDS)
+
+    window.after_idle(_done)
@@ -0,0 +1,84 @@
+import queue
+import logging
+import threading
+
+# Frecuencia con que se revisa la cola de mensajes desde el hilo de la ventana
+POLL_MS = 50
+
+
+class BackgroundTask:
+    """
+    Corre work(post) en un hilo daemon y entrega en el hilo de la ventana cada mensaje
+    que el trabajo envía con post(kind, payload): el hilo nunca toca los widgets y la
+    ventana no se bloquea esperando.
+
+    Un error no atrapado en work llega como ("error", excepción). discard() deja la
+    tarea obsoleta (p. ej. la reemplazó otra más nueva): el hilo sigue hasta terminar,
+    pero sus mensajes ya no se entregan.
+    """
+
+    def __init__(self, widget, work, on_message, poll_ms=POLL_MS, max_per_poll=None, name=None):
+        self.widget = widget
+        self.work = work
+        self.on_message = on_message
+        self.poll_ms = poll_ms
+        # Mensajes que se entregan por sondeo (None: todos los que haya)
+        self.max_per_poll = max_per_poll
+        self.name = name or getattr(work, "__name__", "tarea")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._discarded = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._poll)
+        return self
+
+    def post(self, kind, payload=None):
+        self._queue.put((kind, payload))
+
+    def discard(self):
+        self._discarded = True
+
+    @property
+    def discarded(self):
+        return self._discarded
+
+    @property
+    def running(self):
+        """
+        True mientras el hilo trabaja o quedan mensajes por entregar (y no se descartó).
+        """
+        if self._discarded or self._thread is None:
+            return False
+        return self._thread.is_alive() or not self._queue.empty()
+
+    def _run(self):
+        try:
+            self.work(self.post)
+        except Exception as e:
+            logging.exception("Error en la tarea en segundo plano '%s'", self.name)
+            self.post("error", e)
+
+    def _poll(self):
+        delivered = 0
+        while not self._discarded and (self.max_per_poll is None or delivered < self.max_per_poll):
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            delivered += 1
+            self.on_message(kind, payload)
+        if self._discarded:
+            return
+        # is_alive antes de revisar la cola: lo último que envió el hilo ya está en ella
+        if self._thread.is_alive() or not self._queue.empty():
+            self.widget.after(self.poll_ms, self._poll)
+
+
+def run_in_background(widget, work, on_message, **options):
+    """
+    Crea y arranca una BackgroundTask (ver su documentación).
+    """
+    return BackgroundTask(widget, work, on_message, **options).start()
@@ -1,18 +1,45 @@
+import os
+import time
+import queue
+import logging
+import importlib
+import threading
+from functools import partial
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pandas as pd
-from db.connection import get_db_connection, get_cruce_data, set_default_instance, PREDEFINED_INSTANCES
+from views.virtual_tree import VirtualTreeview
+from views.background import run_in_background
+from utils.display import (
+    CRUCE_COLUMNS, PERCENT_COLUMNS, format_percentage, format_date, format_flag, format_number
+)
+from utils.startup_profiler import mark
+from utils.perf import PERF_LOG, span
+from db.instances import PREDEFINED_INSTANCES
 
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
 
-desired_cols = [
-    "CodigoBarra", "Referencia", "CodigoMarca", "Marca", "Nombre",
-    "Nombre_Fabricante", "CodigoFabricante", "CategoriaCodigo", "CategoriaNombre",
-    "Linea", "CantidadInicial", "Cantidad_Inicial_Agrupada", "ExistenciaActual",
-    "correccion", "NumeroTransferencia", "FechaLlegada", "observacion", "Queda", "Vendido"
-]
+desired_cols = CRUCE_COLUMNS
+
+# Módulos de datos (pandas, SQLAlchemy, pyodbc) que se cargan en segundo plano
+# después de mostrar la ventana; los métodos los importan donde los usan.
+BACKEND_MODULES = (
+    "pandas", "sqlalchemy", "pyodbc", "db.connection", "db.incremental",
+    "utils.filter_engine", "utils.postprocess", "utils.exporter", "db.dimensions", "db.multi",
+)
+
+# Importación en segundo plano: filas por lote y frecuencia de sondeo de la cola
+IMPORT_BATCH_SIZE = 2000
+IMPORT_POLL_MS = 50
+IMPORT_BATCHES_PER_POLL = 10
+
+# Búsqueda mientras se escribe: espera tras la última tecla antes de filtrar
+LIVE_SEARCH_DELAY_MS = 150
+
+# Filtro con lista desplegable -> columna de df_cruce de la que salen los valores
+SUGGESTION_COLUMNS = {"categoria": "CategoriaNombre", "linea": "Linea", "fabrica": "CodigoFabricante"}
+MAX_SUGGESTIONS = 50
 
 class MainView(ctk.CTk):
 
@@ -22,6 +49,75 @@ class MainView(ctk.CTk):
         self.geometry("900x600")
         self.refresh_callback = refresh_callback
         self.df_cruce = None
+        self.filter_engine = None
+
+        # Estado de la importación en segundo plano (views.background.BackgroundTask)
+        self._import_task = None
+        self._multi_task = None
+        self._import_rows = None
+        self._import_cache_key = None
+        self._import_started = None
+        self._import_report = None
+        self._import_fecha_option = None
+        self._cancel_token = None
+        # Armado de df_cruce y filter_engine en segundo plano (_prepare_frame)
+        self._prepare_task = None
+
+        # Exportación en segundo plano
+        self._export_task = None
+        self._export_cancel = None
+
+        # Carga por páginas («Primera página rápida»)
+        self._paged = False
+        self._page_engine = None
+        self._page_task = None
+        self._page_rows = None
+        self._page_key = None
+        self._page_pending = False
+        self._page_count = 0
+        self._page_fecha_option = None
+        self._page_started = None
+        # Acción (buscar o exportar) que espera a la carga completa
+        self._after_import = None
+
+        # Lista de códigos pegada o cargada de un archivo (filtro masivo), la que se está
+        # importando y la que se usó para traer df_cruce (None: cruce completo)
+        self._code_list = None
+        self._import_codes = None
+        self._df_codes = None
+
+        # Dimensiones de la instancia (db.dimensions) y las que usa la importación en curso
+        # para pedir códigos en lugar de nombres
+        self._current_alias = None
+        self._dimensions = None
+        self._import_dims = None
+        # Valores sugeridos por filtro: [(valor, filas o None)] y texto mostrado -> valor
+        self._catalogs = {}
+        self._suggestion_values = {}
+        self._fabricante_names = {}
+
+        # Búsqueda mientras se escribe: solo se muestra el resultado de la última
+        self._live_search_after = None
+        self._search_task = None
+
+        # Modo de varias instancias: alias consultados, resultado y error por instancia;
+        # _multi_dirty: llegó otra instancia mientras se armaba la vista combinada, y
+        # _multi_finish: fin de la consulta que espera a que esa vista esté lista
+        self._multi_aliases = None
+        self._multi_frames = {}
+        self._multi_errors = {}
+        self._multi_dirty = False
+        self._multi_finish = None
+
+        # Orden por encabezado: (columna, descendente) o None, y las posiciones del
+        # último filtro sin ordenar (se reordenan al cambiar el orden)
+        self._sort = None
+        self._filter_positions = None
+
+        # Datos de la última carga, para la actualización incremental
+        self._df_fecha_option = None
+        self._last_full_seconds = None
+        self._memory_report = None
 
         self.grid_rowconfigure(0, weight=0)
         self.grid_rowconfigure(1, weight=0)
@@ -36,6 +132,12 @@ class MainView(ctk.CTk):
         self.cruce_frame = self.tabview.tab("Cruce")
         self._build_treeview(self.cruce_frame)
 
+        self.tabview.add("Comparación")
+        self._build_compare_tab(self.tabview.tab("Comparación"))
+
+        self.tabview.add("Rendimiento")
+        self._build_perf_tab(self.tabview.tab("Rendimiento"))
+
         self.filter_frame = None
 
     def _build_button_bar(self):
@@ -56,8 +158,22 @@ class MainView(ctk.CTk):
         )
         self.instancia_combo.grid(row=0, column=0, sticky="w", padx=5)
 
-        # Forzar selección al iniciar
-        self.on_instance_selected(self.instancia_var.get())
+        # Latencia de cada instancia (utils.my_sql_detector); la más rápida queda primera
+        self.latency_var = tk.StringVar(value="")
+        ctk.CTkLabel(self.button_frame, textvariable=self.latency_var, font=ctk.CTkFont(size=10))\
+            .grid(row=2, column=0, columnspan=2, sticky="w", padx=5)
+        run_in_background(self, self._rank_worker, self._show_ranking, poll_ms=IMPORT_POLL_MS * 4)
+
+        # Las librerías de datos se cargan sin bloquear la ventana; al terminar
+        # se selecciona la instancia inicial
+        self._backend_error = None
+        # Acción pedida mientras se cargaban (se ejecuta al terminar, ver _backend_ready)
+        self._backend_pending = None
+        self._backend_polling = False
+        self._backend_thread = threading.Thread(
+            target=self._load_backend, args=(self.instancia_var.get(),), daemon=True
+        )
+        self._backend_thread.start()
 
         # Botón «Importar Datos»
         self.import_btn = ctk.CTkButton(
@@ -65,6 +181,57 @@ class MainView(ctk.CTk):
         )
         self.import_btn.grid(row=0, column=1, sticky="w", padx=5)
 
+        # Progreso y cancelación de la importación
+        self.progress_var = tk.StringVar(value="")
+        ctk.CTkLabel(self.button_frame, textvariable=self.progress_var)\
+            .grid(row=1, column=0, sticky="w", padx=5)
+        self.actions_frame = ctk.CTkFrame(self.button_frame, fg_color="transparent")
+        self.actions_frame.grid(row=1, column=1, sticky="w", padx=5)
+        self.cancel_btn = ctk.CTkButton(
+            self.actions_frame, text="Cancelar", command=self.cancel_import, state="disabled"
+        )
+        self.cancel_btn.pack(side="left")
+
+        # Ignora la copia local y vuelve a consultar el servidor
+        self.refresh_btn = ctk.CTkButton(
+            self.actions_frame, text="Forzar actualización",
+            command=lambda: self.import_cruce(force_refresh=True)
+        )
+        self.refresh_btn.pack(side="left", padx=(5, 0))
+
+        # Solo pide las transferencias nuevas desde la última fecha cargada
+        self.delta_btn = ctk.CTkButton(
+            self.actions_frame, text="Actualizar cambios", command=self.refresh_incremental
+        )
+        self.delta_btn.pack(side="left", padx=(5, 0))
+
+        # Bytes por columna antes/después de compactar los tipos del cruce
+        self.memory_btn = ctk.CTkButton(
+            self.actions_frame, text="Memoria", width=80, command=self.show_memory_report
+        )
+        self.memory_btn.pack(side="left", padx=(5, 0))
+
+        # Con la carga por páginas activa, trae todas las filas de una vez
+        self.load_all_btn = ctk.CTkButton(
+            self.actions_frame, text="Cargar todo", width=100,
+            command=lambda: self.import_cruce(full=True)
+        )
+        self.load_all_btn.pack(side="left", padx=(5, 0))
+
+        # Filtro por una lista de códigos (pegada desde Excel o leída de un archivo)
+        self.codes_btn = ctk.CTkButton(
+            self.actions_frame, text="Lista de códigos", width=120,
+            command=self.open_code_list_dialog
+        )
+        self.codes_btn.pack(side="left", padx=(5, 0))
+
+        # El mismo cruce en varias instancias a la vez (resultado combinado y comparación)
+        self.multi_btn = ctk.CTkButton(
+            self.actions_frame, text="Varias instancias", width=120,
+            command=self.open_multi_dialog
+        )
+        self.multi_btn.pack(side="left", padx=(5, 0))
+
         # Selector de rango de fechas
         self.fecha_option = tk.IntVar(value=2)
         self.fecha_frame = ctk.CTkFrame(self.button_frame)
@@ -78,9 +245,107 @@ class MainView(ctk.CTk):
             self.fecha_frame, text="2024/01/01 - Actual", variable=self.fecha_option, value=2
         ).pack(anchor="w")
 
+        # Muestra la primera página apenas llega y trae el resto al desplazarse
+        self.first_page_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self.fecha_frame, text="Primera página rápida", variable=self.first_page_var
+        ).pack(anchor="w", pady=(4, 0))
+
+    def _load_backend(self, alias):
+        try:
+            for name in BACKEND_MODULES:
+                try:
+                    importlib.import_module(name)
+                except ImportError as e:
+                    if name != "pyodbc":
+                        raise
+                    logging.warning("pyodbc no disponible: %s", e)
+            mark("librerías de datos cargadas")
+            from db.connection import set_default_instance, warm_up
+            set_default_instance(alias)
+            warm_up(alias)
+            self._current_alias = alias
+            threading.Thread(target=self._load_dimensions, args=(alias,), daemon=True).start()
+        except Exception as e:
+            logging.exception("No se pudieron cargar las librerías de datos")
+            self._backend_error = e
+
+    def _load_dimensions(self, alias):
+        """
+        Corre en un hilo aparte: categorías, marcas y fabricantes de la instancia (de la
+        copia en disco si está vigente). Sin ellas el cruce se pide con nombres.
+        """
+        from db.connection import get_db_connection_for
+        from db.dimensions import get_dimension_cache
+        try:
+            dimensions = get_dimension_cache().get(get_db_connection_for(alias), alias)
+        except Exception:
+            logging.warning("No se pudieron cargar las dimensiones de %s", alias, exc_info=True)
+            return
+        # Si mientras tanto se eligió otra instancia, estas ya no sirven
+        if alias == self._current_alias:
+            self._fabricante_names = dimensions.names("fabricantes")
+            self._dimensions = dimensions
+
+    @staticmethod
+    def _rank_worker(post, force_refresh=False):
+        from utils.my_sql_detector import DiscoveryCache, RANKING_FILE, rank_instances
+        post("done", rank_instances(PREDEFINED_INSTANCES, cache=DiscoveryCache(RANKING_FILE),
+                                    force_refresh=force_refresh))
+
+    def _show_ranking(self, kind, ranked):
+        if kind == "error":
+            # Ya quedó en el log; el combo sigue en el orden predefinido
+            return
+        # Solo se reordena la lista; la instancia seleccionada no cambia
+        self.instancia_combo.configure(values=[alias for alias, _ in ranked])
+        partes = []
+        for alias, ms in ranked:
+            if ms is None:
+                continue
+            partes.append(f"{alias}: {ms:.0f} ms" if ms != float("inf") else f"{alias}: sin respuesta")
+        self.latency_var.set(" · ".join(partes))
+
+    def _backend_ready(self, retry):
+        """
+        True si las librerías de datos ya están cargadas. Si todavía se están cargando no
+        se espera (la ventana no se bloquea): retry se ejecuta al terminar la carga (solo
+        la última acción pedida) y se retorna False. También False si la carga falló.
+        """
+        if self._backend_thread.is_alive():
+            self._backend_pending = retry
+            self.progress_var.set("Cargando librerías...")
+            if not self._backend_polling:
+                self._backend_polling = True
+                self.after(IMPORT_POLL_MS, self._poll_backend)
+            return False
+        if self._backend_error is not None:
+            messagebox.showerror("Error", f"No se pudieron cargar las librerías de datos:\n{self._backend_error}")
+            return False
+        return True
+
+    def _poll_backend(self):
+        if self._backend_thread.is_alive():
+            self.after(IMPORT_POLL_MS, self._poll_backend)
+            return
+        self._backend_polling = False
+        self.progress_var.set("")
+        action, self._backend_pending = self._backend_pending, None
+        if action is not None:
+            action()
+
     def on_instance_selected(self, selected):
+        if not self._backend_ready(lambda: self.on_instance_selected(selected)):
+            return
+        from db.connection import set_default_instance, warm_up
         try:
             set_default_instance(selected)
+            warm_up(selected)
+            self._current_alias = selected
+            self._dimensions = None
+            self._fabricante_names = {}
+            self._catalogs = {}
+            threading.Thread(target=self._load_dimensions, args=(selected,), daemon=True).start()
             print(f"Instancia seleccionada: {selected}")
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo seleccionar la instancia:\n{e}")
@@ -90,27 +355,74 @@ class MainView(ctk.CTk):
         container.pack(expand=True, fill="both")
 
         self.tree_cruce = ttk.Treeview(container, columns=desired_cols, show="headings")
-        for col in desired_cols:
-            self.tree_cruce.heading(col, text=col)
-            self.tree_cruce.column(col, width=120, anchor="center", stretch=True)
+        self._tree_columns = None
+        self._set_tree_columns(desired_cols)
 
         self.tree_cruce.grid(row=0, column=0, sticky="nsew")
         container.grid_rowconfigure(0, weight=1)
         container.grid_columnconfigure(0, weight=1)
 
-        vsb = ttk.Scrollbar(container, orient="vertical", command=self.tree_cruce.yview)
+        vsb = ttk.Scrollbar(container, orient="vertical")
         hsb = ttk.Scrollbar(container, orient="horizontal", command=self.tree_cruce.xview)
-        self.tree_cruce.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree_cruce.configure(xscrollcommand=hsb.set)
         vsb.grid(row=0, column=1, sticky="ns")
         hsb.grid(row=1, column=0, sticky="ew")
 
+        # Solo se crean los items visibles; el desplazamiento vertical lo maneja la grilla virtual
+        self.grid_view = VirtualTreeview(
+            self.tree_cruce, vsb,
+            formatters={
+                **{desired_cols.index(c): format_percentage for c in PERCENT_COLUMNS},
+                desired_cols.index("FechaLlegada"): format_date,
+                desired_cols.index("correccion"): format_flag,
+            }
+        )
+
         container.bind("<Configure>", self._auto_resize_columns)
         self.tree_cruce.bind("<Button-3>", self.show_context_menu)
 
+    def _set_tree_columns(self, columns):
+        """
+        Columnas de la grilla: desired_cols, más Instancia en el modo de varias instancias.
+        """
+        columns = list(columns)
+        if columns == self._tree_columns:
+            return
+        self._tree_columns = columns
+        self.tree_cruce.configure(columns=columns)
+        for col in columns:
+            self.tree_cruce.heading(col, text=self._heading_text(col),
+                                    command=lambda c=col: self.sort_by(c))
+            self.tree_cruce.column(col, width=120, anchor="center", stretch=True)
+
+    def _heading_text(self, column):
+        if self._sort is None or self._sort[0] != column:
+            return column
+        return f"{column} {'▼' if self._sort[1] else '▲'}"
+
+    def sort_by(self, column):
+        """
+        Clic en un encabezado: ascendente, descendente y de nuevo el orden original.
+        Se ordenan las posiciones del filtro actual con la permutación guardada en
+        filter_engine; el DataFrame no se toca.
+        """
+        if self.filter_engine is None or self.df_cruce is None or column not in self.df_cruce.columns:
+            return
+        previous = self._sort
+        if previous is None or previous[0] != column:
+            self._sort = (column, False)
+        elif not previous[1]:
+            self._sort = (column, True)
+        else:
+            self._sort = None
+        for col in {column, previous[0] if previous else column}:
+            self.tree_cruce.heading(col, text=self._heading_text(col))
+        self.populate_tree(self._filter_positions)
+
     def _auto_resize_columns(self, event):
         total = event.width
-        col_w = max(90, int(total / len(desired_cols)))
-        for col in desired_cols:
+        col_w = max(90, int(total / len(self._tree_columns)))
+        for col in self._tree_columns:
             self.tree_cruce.column(col, width=col_w)
 
     def create_filter_frame(self):
@@ -122,73 +434,1187 @@ class MainView(ctk.CTk):
             self.filter_frame.grid_columnconfigure(c, weight=0)
             self.filter_frame.grid_columnconfigure(c + 1, weight=1, uniform="entry")
 
-        def _pair(r, c, text):
+        def _pair(r, c, text, field=None):
             ctk.CTkLabel(self.filter_frame, text=text, font=self.label_font, height=24)\
                 .grid(row=r, column=c, padx=(2, 2), pady=2, sticky="w")
-            entry = ctk.CTkEntry(self.filter_frame)
+            if field is None:
+                entry = ctk.CTkEntry(self.filter_frame)
+            else:
+                # Lista desplegable con los valores del catálogo (ver _refresh_catalogs)
+                entry = ctk.CTkComboBox(
+                    self.filter_frame, values=[""],
+                    command=lambda choice: self._on_suggestion(field, choice)
+                )
+                entry.set("")
+                entry.bind("<KeyRelease>", lambda event: self._update_suggestions(field), add="+")
             entry.grid(row=r, column=c + 1, padx=(2, 10), pady=2, sticky="ew")
             return entry
 
         self.codigo_barra_entry = _pair(0, 0, "Código Barra:")
         self.referencia_entry = _pair(0, 2, "Referencia:")
-        self.categoria_entry = _pair(0, 4, "Categoría:")
+        self.categoria_entry = _pair(0, 4, "Categoría:", "categoria")
+
+        self.linea_entry = _pair(1, 0, "Línea:", "linea")
+        self.fabrica_entry = _pair(1, 2, "Código de Fábrica:", "fabrica")
+        # Rango sobre el porcentaje vendido: ">80", "<=20", "50-80"
+        self.vendido_entry = _pair(1, 4, "Vendido %:")
+        # Subcadena en cualquier parte del nombre
+        self.nombre_entry = _pair(2, 0, "Nombre contiene:")
 
-        self.linea_entry = _pair(1, 0, "Línea:")
-        self.fabrica_entry = _pair(1, 2, "Código de Fábrica:")
+        # Los textos filtran por prefijo mientras se escribe
+        for entry in (self.codigo_barra_entry, self.referencia_entry, self.categoria_entry,
+                      self.linea_entry, self.fabrica_entry, self.vendido_entry, self.nombre_entry):
+            entry.bind("<KeyRelease>", self._schedule_live_search, add="+")
 
         self.buscar_btn = ctk.CTkButton(
             self.filter_frame, text="Buscar", command=self.buscar_datos
         )
-        self.buscar_btn.grid(row=2, column=0, columnspan=6, pady=(8, 0), sticky="e")
+        self.buscar_btn.grid(row=2, column=2, columnspan=4, pady=(8, 0), sticky="e")
+        self._refresh_catalogs()
 
-    def import_cruce(self):
+    def import_cruce(self, force_refresh=False, full=False):
+        """
+        Importa el cruce completo en segundo plano. Con «Primera página rápida» marcada
+        (y sin copia local vigente) se muestra primero una página; full=True lo evita.
+        """
+        if self._importing():
+            return
+        if not self._backend_ready(lambda: self.import_cruce(force_refresh, full)):
+            return
+        from db.columnar import ColumnBuffer
+        from db.connection import get_db_connection, cruce_cache_key, CancelToken
+        from utils.result_cache import get_result_cache
+        engine = get_db_connection()
+        if engine is None:
+            return
+        self._import_codes = None
+
+        cache_key = cruce_cache_key(fecha_option=self.fecha_option.get())
+        if self.first_page_var.get() and not (force_refresh or full) \
+                and not get_result_cache().has(cache_key):
+            self._start_paged_import(engine)
+            return
+        self._stop_paging()
+
+        self._cancel_token = CancelToken()
+        self._import_rows = ColumnBuffer(desired_cols)
+        self._import_cache_key = cache_key
+        self._import_started = time.perf_counter()
+        self._import_fecha_option = self.fecha_option.get()
+        self._set_tree_columns(desired_cols)
+        self.grid_view.set_rows(self._import_rows)
+        self._set_import_running(True)
+        self.progress_var.set("Importando... 0 filas")
+
+        # Con las dimensiones cargadas el servidor envía códigos y los nombres se unen al final
+        self._import_dims = self._dimensions
+        self._set_name_formatters(self._import_dims)
+
+        self._start_import(partial(
+            self._import_worker, engine, self.fecha_option.get(), self._cancel_token,
+            None if force_refresh else self._import_cache_key, self._import_dims is not None
+        ))
+
+    def _importing(self):
+        """
+        True mientras hay una importación (o su preparación) en curso.
+        """
+        return self._import_task is not None and self._import_task.running
+
+    def _start_import(self, work):
+        """
+        Corre work(post) en segundo plano; sus mensajes van a _on_import_message.
+        """
+        self._import_task = run_in_background(
+            self, work, self._on_import_message, poll_ms=IMPORT_POLL_MS,
+            max_per_poll=IMPORT_BATCHES_PER_POLL, name="importacion"
+        )
+
+    def refresh_incremental(self):
+        if self._multi_aliases:
+            self.import_multi(self._multi_aliases)
+            return
+        if self.df_cruce is None or self._paged:
+            self.import_cruce(full=self._paged)
+            return
+        if self._df_codes is not None:
+            # El delta traería transferencias de todos los códigos: se repite la lista
+            self.import_codes(self._df_codes)
+            return
+        if self._importing():
+            return
+        if not self._backend_ready(self.refresh_incremental):
+            return
+        from db.columnar import ColumnBuffer
+        from db.connection import get_db_connection, cruce_cache_key
+        engine = get_db_connection()
+        if engine is None:
+            return
+
+        self._cancel_token = None
+        self._import_rows = ColumnBuffer(desired_cols)
+        self._import_cache_key = cruce_cache_key(fecha_option=self.fecha_option.get())
+        self._import_started = time.perf_counter()
+        self._import_fecha_option = self.fecha_option.get()
+        self._set_import_running(True, cancellable=False)
+        self.progress_var.set("Buscando cambios...")
+
+        self._start_import(partial(
+            self._delta_worker, engine, self.df_cruce, self.fecha_option.get(), self._df_fecha_option
+        ))
+
+    @staticmethod
+    def _delta_worker(engine, df_prev, fecha_option, prev_fecha_option, post):
+        from db.incremental import refresh_cruce_incremental
+        df, report = refresh_cruce_incremental(engine, df_prev, fecha_option, prev_fecha_option)
+        post("report", report)
+        post("done", df[desired_cols])
+
+    def _set_import_running(self, running, cancellable=True):
+        state = "disabled" if running else "normal"
+        for btn in (self.import_btn, self.refresh_btn, self.delta_btn, self.load_all_btn,
+                    self.codes_btn, self.multi_btn):
+            btn.configure(state=state)
+        self.cancel_btn.configure(state="normal" if running and cancellable else "disabled")
+
+    @staticmethod
+    def _import_worker(engine, fecha_option, cancel_token, cache_key, slim, post):
+        """
+        Corre en un hilo aparte: ejecuta el query y envía lotes ya ordenados según desired_cols.
+        Si cache_key tiene una copia local vigente se envía esa en lugar de consultar;
+        en modo "snapshot" se prueba después la tabla resumen del servidor.
+        slim: las columnas de nombres llegan con códigos (se unen en _finish_import).
+        """
+        from utils.result_cache import get_result_cache
+        from db.connection import iter_cruce_batches, read_snapshot_if_fresh, QueryCancelled
         try:
-            engine = get_db_connection()
-            data = get_cruce_data(engine, fecha_option=self.fecha_option.get())
-            df = pd.DataFrame(data) if data else pd.DataFrame()
+            if cache_key is not None:
+                df = get_result_cache().get(cache_key)
+                if df is not None:
+                    post("done", df[desired_cols])
+                    return
+            df = read_snapshot_if_fresh(engine, fecha_option=fecha_option)
+            if df is not None:
+                post("done", df[desired_cols])
+                return
+
+            batches = iter_cruce_batches(
+                engine, fecha_option=fecha_option,
+                batch_size=IMPORT_BATCH_SIZE, cancel_token=cancel_token, slim=slim
+            )
+            columns = next(batches)
+            # Vendido se calcula en el cliente al terminar; mientras tanto queda vacío
+            order = [columns.index(c) if c in columns else None for c in desired_cols]
+            for batch in batches:
+                post("rows", [tuple(r[i] if i is not None else None for i in order) for r in batch])
+            post("done", None)
+        except QueryCancelled:
+            post("cancelled", None)
+
+    def _on_import_message(self, kind, payload):
+        if kind == "rows":
+            self._import_rows.extend(payload)
+            self.grid_view.refresh()
+            self.progress_var.set(f"Importando... {len(self._import_rows):,} filas")
+        elif kind == "report":
+            self._import_report = payload
+        else:
+            self._finish_import(kind, payload)
+
+    def _finish_import(self, kind, payload):
+        rows, self._import_rows = self._import_rows, None
+        report, self._import_report = self._import_report, None
+        dims, self._import_dims = self._import_dims, None
+
+        if kind == "done":
+            elapsed = time.perf_counter() - self._import_started
+            self._df_fecha_option = self._import_fecha_option
+            self._df_codes, self._import_codes = self._import_codes, None
+            self._multi_aliases = None
+            if payload is None or (report is not None and report["mode"] == "full"):
+                self._last_full_seconds = elapsed
+            self._set_import_running(True, cancellable=False)
+            self.progress_var.set(f"Preparando {len(rows if payload is None else payload):,} filas...")
+            cache_result = payload is None or report is not None
+
+            def build():
+                from utils.postprocess import add_percentage_columns, compact_dtypes
+                with span("dataframe", origen="lotes" if payload is None else "copia/delta") as s:
+                    if payload is not None:
+                        df = payload
+                    else:
+                        df = rows.to_frame()
+                        if dims is not None:
+                            from db.dimensions import attach_dimension_names
+                            df = attach_dimension_names(df, dims)
+                        df = add_percentage_columns(df)
+                    df, memory_report = compact_dtypes(df)
+                    s.rows = len(df)
+                    s.bytes = sum(after for _, after in memory_report.values())
+                return df, memory_report, None
+
+            # La grilla sigue mostrando las filas recibidas mientras se arma el DataFrame
+            self._prepare_frame(build, lambda _: self._imported(cache_result, report))
+            # Las guardas de «importación en curso» cubren también la preparación
+            self._import_task = self._prepare_task
+            return
+
+        # Cancelada o fallida: se vuelve a mostrar lo que había antes
+        self._set_name_formatters(None)
+        self._set_import_running(False)
+        self._after_import = None
+        self._import_codes = None
+        if self.df_cruce is not None:
+            self.populate_tree()
+        else:
+            self.grid_view.clear()
+        if kind == "cancelled":
+            self.progress_var.set("Importación cancelada")
+        else:
+            self.progress_var.set("")
+            messagebox.showerror("Error", f"Fallo en la importación: {payload}")
+
+    def _imported(self, cache_result, report):
+        """
+        df_cruce y filter_engine ya están listos (_prepare_frame): se muestran y se
+        ejecuta la acción pendiente o se avisa el resultado.
+        """
+        from utils.result_cache import get_result_cache
+        self._set_name_formatters(None)
+        self._set_import_running(False)
+        if cache_result:
+            threading.Thread(
+                target=get_result_cache().put,
+                args=(self._import_cache_key, self.df_cruce),
+                daemon=True
+            ).start()
+        self.populate_tree()
+        self.progress_var.set(f"{len(self.df_cruce):,} filas")
+        self._refresh_catalogs()
+        action, self._after_import = self._after_import, None
+        if action is not None:
+            action()
+            return
+        if report is not None:
+            self._show_delta_report(report)
+            return
+        messagebox.showinfo("Importación", "Datos importados correctamente.")
+        if not self.filter_frame:
+            self.create_filter_frame()
+
+    def _prepare_frame(self, build, on_ready):
+        """
+        Arma df_cruce y su CruceFilterEngine en un hilo aparte (con millones de filas
+        tardan segundos) y llama on_ready(extra) en el hilo de la ventana cuando están.
+        build() -> (df, reporte de memoria, extra). Mientras tanto no hay búsqueda ni
+        orden; una preparación más nueva descarta el resultado de la anterior.
+        """
+        previous_engine, self.filter_engine = self.filter_engine, None
+        # Resultados en curso de la búsqueda anterior ya no corresponden a estas filas
+        self._discard_search()
+        if self._prepare_task is not None:
+            self._prepare_task.discard()
+        self._prepare_task = run_in_background(
+            self, partial(self._prepare_worker, build),
+            partial(self._prepared, on_ready, previous_engine),
+            poll_ms=IMPORT_POLL_MS, name="preparar-cruce"
+        )
+
+    @staticmethod
+    def _prepare_worker(build, post):
+        from utils.filter_engine import CruceFilterEngine
+        df, memory_report, extra = build()
+        with span("filter_index") as s:
+            engine = CruceFilterEngine(df)
+            s.rows = len(df)
+        post("done", (df, memory_report, engine, extra))
+
+    def _prepared(self, on_ready, previous_engine, kind, payload):
+        # Solo llega la preparación más reciente: las anteriores se descartaron
+        task, self._prepare_task = self._prepare_task, None
+        if self._import_task is task:
+            # La importación terminó con esta preparación (el hilo puede seguir vivo un instante)
+            self._import_task = None
+        if kind == "error":
+            # Se vuelve a lo que había antes (df_cruce no cambió)
+            self.filter_engine = previous_engine
+            self._after_import = None
+            self._set_name_formatters(None)
+            if not self._importing():
+                self._set_import_running(False)
+            self.progress_var.set("")
+            if self.df_cruce is not None:
+                self.populate_tree()
+            else:
+                self.grid_view.clear()
+            messagebox.showerror("Error", f"Fallo al preparar los datos: {payload}")
+            finish, self._multi_finish = self._multi_finish, None
+            if finish is not None:
+                self._finish_multi(*finish)
+            return
+        self.df_cruce, self._memory_report, self.filter_engine, extra = payload
+        # Búsquedas hechas con el índice anterior ya no corresponden a estas filas
+        self._discard_search()
+        on_ready(extra)
+
+    def _show_delta_report(self, report):
+        """
+        Muestra cuántas filas y segundos se ahorraron frente a la última carga completa.
+        """
+        texto = (f"Actualización {report['mode']}: {report['rows_fetched']:,} filas transferidas "
+                 f"de {report['rows_total']:,} en {report['seconds']:.1f}s")
+        if report["existencia_rows"]:
+            texto += f", {report['existencia_rows']:,} existencias"
+        if report["mode"] == "delta" and self._last_full_seconds:
+            texto += f" (carga completa: {self._last_full_seconds:.1f}s)"
+        logging.info(texto)
+        self.progress_var.set(texto)
+
+    # ------------------------------------------------------------------
+    # Primera página rápida
+    # ------------------------------------------------------------------
+    def _start_paged_import(self, engine):
+        """
+        Muestra la primera página del cruce (PAGE_SIZE filas por clave FechaLlegada,
+        CodigoBarra) y pide las siguientes en segundo plano cuando el desplazamiento
+        se acerca al final. Buscar y Exportar necesitan todas las filas: antes lanzan
+        la carga completa.
+        """
+        from db.columnar import ColumnBuffer
+        from queries.cruce_builder import PAGE_SIZE
+        self._stop_paging()
+        self._paged = True
+        self._page_engine = engine
+        self._page_rows = ColumnBuffer(desired_cols)
+        self._page_key = None
+        self._page_count = 0
+        self._page_fecha_option = self.fecha_option.get()
+        self._page_started = time.perf_counter()
+        self._set_tree_columns(desired_cols)
+        self.grid_view.set_rows(self._page_rows)
+        self.grid_view.prefetch_margin = PAGE_SIZE
+        self.grid_view.on_scroll_end = self._fetch_next_page
+        self.progress_var.set("Consultando la primera página...")
+        self._fetch_next_page()
+
+    def _stop_paging(self):
+        self._paged = False
+        # La página que siga en camino se abandona
+        if self._page_task is not None:
+            self._page_task.discard()
+            self._page_task = None
+        self._page_rows = None
+        self._page_pending = False
+        self.grid_view.on_scroll_end = None
+
+    def _fetch_next_page(self):
+        if not self._paged or self._page_pending:
+            return
+        if self._page_count and self._page_key is None:
+            return
+        self._page_pending = True
+        self._page_task = run_in_background(
+            self, partial(self._page_worker, self._page_engine, self._page_fecha_option, self._page_key),
+            self._on_page, poll_ms=IMPORT_POLL_MS, name="pagina"
+        )
+
+    @staticmethod
+    def _page_worker(engine, fecha_option, after, post):
+        from db.connection import get_cruce_page
+        df, next_key = get_cruce_page(engine, fecha_option=fecha_option, after=after)
+        rows = list(df.reindex(columns=desired_cols).itertuples(index=False, name=None))
+        post("page", (rows, next_key))
+
+    def _on_page(self, kind, payload):
+        self._page_task = None
+        self._page_pending = False
+        if kind == "error":
+            self._stop_paging()
+            self.progress_var.set("")
+            messagebox.showerror("Error", f"Fallo al consultar la página: {payload}")
+            return
+
+        rows, self._page_key = payload
+        self._page_rows.extend(rows)
+        self._page_count += 1
+        if self._page_key is None:
+            self._complete_from_pages()
+            return
+
+        self.progress_var.set(f"{len(self._page_rows):,} filas en {self._page_count} páginas "
+                              f"(Buscar y Exportar cargan todo)")
+        if not self.filter_frame:
+            self.create_filter_frame()
+        # refresh() vuelve a pedir otra página si lo visible sigue cerca del final
+        self.grid_view.refresh()
+
+    def _complete_from_pages(self):
+        """
+        Ya llegaron todas las páginas: se termina como una importación normal.
+        """
+        from db.connection import cruce_cache_key
+        rows, fecha_option, started = self._page_rows, self._page_fecha_option, self._page_started
+        self._stop_paging()
+        self._import_rows = rows
+        self._import_report = None
+        self._import_cache_key = cruce_cache_key(fecha_option=fecha_option)
+        self._import_fecha_option = fecha_option
+        self._import_started = started
+        self._finish_import("done", None)
+
+    # ------------------------------------------------------------------
+    # Lista de códigos
+    # ------------------------------------------------------------------
+    def open_code_list_dialog(self):
+        """
+        Ventana para pegar la lista de códigos (una columna de Excel) o leerla de un archivo.
+        """
+        from utils.filter_engine import parse_code_list
+        window = ctk.CTkToplevel(self)
+        window.title("Lista de códigos de barra")
+        window.geometry("420x480")
+        count_var = tk.StringVar()
+        ctk.CTkLabel(window, textvariable=count_var).pack(anchor="w", padx=10, pady=(10, 0))
+        box = ctk.CTkTextbox(window)
+        box.pack(expand=True, fill="both", padx=10, pady=10)
+        if self._code_list:
+            box.insert("1.0", "\n".join(self._code_list))
+
+        def _count(event=None):
+            count_var.set(f"{len(parse_code_list(box.get('1.0', 'end'))):,} códigos")
 
-            self.df_cruce = df[desired_cols].copy() if not df.empty else df
-            self.populate_tree(self.df_cruce.values.tolist())
+        def _open_file():
+            from utils.helpers import ask_code_file, read_code_file
+            path = ask_code_file(window)
+            if not path:
+                return
+            try:
+                codes = read_code_file(path)
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo leer el archivo:\n{e}", parent=window)
+                return
+            box.delete("1.0", "end")
+            box.insert("1.0", "\n".join(codes))
+            _count()
 
-            messagebox.showinfo("Importación", "Datos importados correctamente.")
+        def _apply():
+            codes = parse_code_list(box.get("1.0", "end"))
+            if not codes:
+                messagebox.showwarning("Atención", "La lista no tiene códigos.", parent=window)
+                return
+            window.destroy()
+            self.apply_code_list(codes)
 
-            if not self.filter_frame:
-                self.create_filter_frame()
+        def _remove():
+            window.destroy()
+            self.apply_code_list(None)
 
+        box.bind("<KeyRelease>", _count, add="+")
+        _count()
+        buttons = ctk.CTkFrame(window, fg_color="transparent")
+        buttons.pack(fill="x", padx=10, pady=(0, 10))
+        ctk.CTkButton(buttons, text="Abrir archivo...", width=110, command=_open_file).pack(side="left")
+        ctk.CTkButton(buttons, text="Quitar lista", width=100, command=_remove).pack(side="right")
+        ctk.CTkButton(buttons, text="Aplicar", width=100, command=_apply).pack(side="right", padx=5)
+
+    def apply_code_list(self, codes):
+        """
+        Filtra por la lista de códigos. Con df_cruce cargado se filtra en memoria
+        (pertenencia por hash); si no hay datos, si la carga es por páginas o si df_cruce
+        vino de otra lista que no los contiene, se consulta el servidor solo por esos códigos.
+        """
+        self._code_list = codes
+        if codes is None:
+            if self.df_cruce is not None and not self._paged:
+                self.buscar_datos()
+            return
+        loaded = self.df_cruce is not None and not self._paged
+        if loaded and self._df_codes is not None and not set(codes) <= set(self._df_codes):
+            loaded = False
+        if loaded:
+            self.buscar_datos()
+        else:
+            self.import_codes(codes)
+
+    def import_codes(self, codes):
+        """
+        Importa el cruce solo de los códigos de la lista (tabla temporal en el servidor).
+        """
+        if self._importing():
+            return
+        if not self._backend_ready(lambda: self.import_codes(codes)):
+            return
+        from db.columnar import ColumnBuffer
+        from db.connection import get_db_connection, cruce_cache_key
+        engine = get_db_connection()
+        if engine is None:
+            return
+
+        self._stop_paging()
+        self._cancel_token = None
+        self._import_codes = codes
+        self._import_rows = ColumnBuffer(desired_cols)
+        self._import_cache_key = cruce_cache_key(fecha_option=self.fecha_option.get(), codes=codes)
+        self._import_started = time.perf_counter()
+        self._import_fecha_option = self.fecha_option.get()
+        self._set_tree_columns(desired_cols)
+        self.grid_view.set_rows(self._import_rows)
+        self._set_import_running(True, cancellable=False)
+        self.progress_var.set(f"Consultando {len(codes):,} códigos...")
+
+        self._start_import(partial(
+            self._codes_worker, engine, codes, self.fecha_option.get(), self._import_cache_key
+        ))
+
+    @staticmethod
+    def _codes_worker(engine, codes, fecha_option, cache_key, post):
+        from utils.result_cache import get_result_cache
+        from db.connection import get_cruce_data_for_codes
+        df = get_result_cache().get(cache_key)
+        if df is not None:
+            post("done", df[desired_cols])
+            return
+        df = get_cruce_data_for_codes(engine, codes, fecha_option=fecha_option)
+        # Como lotes, para que _finish_import lo guarde en la caché
+        post("rows", list(df.reindex(columns=desired_cols).itertuples(index=False, name=None)))
+        post("done", None)
+
+    # ------------------------------------------------------------------
+    # Varias instancias
+    # ------------------------------------------------------------------
+    def open_multi_dialog(self):
+        """
+        Ventana para elegir las instancias en las que se ejecuta el cruce a la vez.
+        """
+        window = ctk.CTkToplevel(self)
+        window.title("Varias instancias")
+        window.geometry("320x240")
+        ctk.CTkLabel(window, text="Instancias a consultar:").pack(anchor="w", padx=10, pady=(10, 5))
+        selected = self._multi_aliases or list(PREDEFINED_INSTANCES)
+        checks = {}
+        for alias in PREDEFINED_INSTANCES:
+            checks[alias] = tk.BooleanVar(value=alias in selected)
+            ctk.CTkCheckBox(window, text=alias, variable=checks[alias]).pack(anchor="w", padx=20, pady=2)
+
+        def _import():
+            aliases = [alias for alias, var in checks.items() if var.get()]
+            if not aliases:
+                messagebox.showwarning("Atención", "Seleccione al menos una instancia.", parent=window)
+                return
+            window.destroy()
+            self.import_multi(aliases)
+
+        ctk.CTkButton(window, text="Importar", command=_import).pack(pady=10)
+
+    def import_multi(self, aliases):
+        """
+        Ejecuta el cruce en todas las instancias a la vez, cada una con su propio pool.
+        Los resultados se muestran a medida que llegan; una instancia caída o lenta no
+        detiene a las demás (Cancelar deja de esperarla y conserva lo recibido).
+        """
+        if self._importing():
+            return
+        if not self._backend_ready(lambda: self.import_multi(aliases)):
+            return
+        from db.connection import CancelToken
+        from db.multi import get_instance_engine, MULTI_TIMEOUT_SECONDS
+        try:
+            engines = {alias: get_instance_engine(alias) for alias in aliases}
         except Exception as e:
-            messagebox.showerror("Error", f"Fallo en la importación: {e}")
+            messagebox.showerror("Error de conexión", f"No se pudo crear el engine: {e}")
+            return
 
-    def buscar_datos(self):
+        self._stop_paging()
+        self._multi_aliases = list(aliases)
+        self._multi_frames = {}
+        self._multi_errors = {}
+        self._cancel_token = CancelToken()
+        self._import_started = time.perf_counter()
+        self._import_fecha_option = self.fecha_option.get()
+        self._set_import_running(True)
+        self.progress_var.set(f"Consultando {len(aliases)} instancias...")
+
+        self._import_task = self._multi_task = run_in_background(
+            self, partial(self._multi_worker, engines, self.fecha_option.get(),
+                          MULTI_TIMEOUT_SECONDS, self._cancel_token),
+            self._on_multi_message, poll_ms=IMPORT_POLL_MS, name="varias-instancias"
+        )
+
+    @staticmethod
+    def _multi_worker(engines, fecha_option, timeout, cancel_token, post):
+        from db.multi import iter_cruce_instances
+        results = iter_cruce_instances(engines, fecha_option=fecha_option, timeout=timeout)
+        for result in results:
+            post("instance", result)
+            if cancel_token.cancelled:
+                results.close()
+                post("cancelled", None)
+                return
+        post("done", None)
+
+    def _on_multi_message(self, kind, payload):
+        if kind == "instance":
+            alias, df, error, seconds = payload
+            if error is None:
+                self._multi_frames[alias] = df
+            else:
+                self._multi_errors[alias] = error
+            self._show_multi()
+            return
+        self._finish_multi(kind, payload)
+
+    def _show_multi(self):
+        """
+        Muestra lo recibido hasta ahora: las filas de todas las instancias en la grilla
+        (con la columna Instancia) y la comparación lado a lado en su pestaña.
+        """
+        frames = {alias: self._multi_frames[alias][desired_cols]
+                  for alias in self._multi_aliases if alias in self._multi_frames}
+        estado = []
+        for alias in self._multi_aliases:
+            if alias in self._multi_frames:
+                estado.append(f"{alias}: {len(self._multi_frames[alias]):,} filas")
+            elif alias in self._multi_errors:
+                estado.append(f"{alias}: error")
+            else:
+                estado.append(f"{alias}: consultando...")
+        self.progress_var.set(" | ".join(estado))
+        if not frames:
+            return
+
+        if self._prepare_task is not None:
+            # Se vuelve a armar con todo lo recibido cuando termine la preparación en curso
+            self._multi_dirty = True
+            return
+        self._multi_dirty = False
+
+        def build():
+            from db.multi import merge_instances, compare_instances
+            from utils.postprocess import compact_dtypes
+            with span("dataframe", origen="instancias") as s:
+                df, memory_report = compact_dtypes(merge_instances(frames))
+                s.rows = len(df)
+            with span("comparacion", instancias=len(frames)) as s:
+                compare = compare_instances(df)
+                s.rows = len(compare)
+            return df, memory_report, compare
+
+        self._prepare_frame(build, self._multi_ready)
+
+    def _multi_ready(self, compare):
+        self._df_fecha_option = self._import_fecha_option
+        self._df_codes = None
+        self.populate_tree()
+        self._refresh_catalogs()
+        self._set_compare_frame(compare)
+        if self._multi_dirty:
+            self._show_multi()
+            return
+        finish, self._multi_finish = self._multi_finish, None
+        if finish is not None:
+            self._finish_multi(*finish)
+
+    def _finish_multi(self, kind, payload):
+        self._multi_task = None
+        if self._prepare_task is not None:
+            # Se termina cuando la vista combinada esté lista (_multi_ready)
+            self._multi_finish = (kind, payload)
+            return
+        self._set_import_running(False)
+        elapsed = time.perf_counter() - self._import_started
+        if kind == "error":
+            messagebox.showerror("Error", f"Se produjo un error:\n{payload}")
+            return
+        if not self.filter_frame and self._multi_frames:
+            self.create_filter_frame()
+        pending = [a for a in self._multi_aliases
+                   if a not in self._multi_frames and a not in self._multi_errors]
+        lineas = [f"{alias}: {len(df):,} filas" for alias, df in self._multi_frames.items()]
+        lineas += [f"{alias}: {str(error).splitlines()[0]}" for alias, error in self._multi_errors.items()]
+        lineas += [f"{alias}: cancelada" for alias in pending]
+        texto = "\n".join(lineas) + f"\n\nTiempo total: {elapsed:.1f} s"
+        if self._multi_errors or pending:
+            messagebox.showwarning("Varias instancias", texto)
+        else:
+            messagebox.showinfo("Varias instancias", texto)
+
+    # ------------------------------------------------------------------
+    # Pestaña "Comparación"
+    # ------------------------------------------------------------------
+    def _build_compare_tab(self, parent):
+        self.compare_var = tk.StringVar(value="Use «Varias instancias» para comparar servidores.")
+        ctk.CTkLabel(parent, textvariable=self.compare_var).pack(anchor="w", padx=5, pady=(5, 0))
+
+        container = tk.Frame(parent)
+        container.pack(expand=True, fill="both", padx=5, pady=5)
+        self.compare_tree = ttk.Treeview(container, columns=(), show="headings")
+        self.compare_tree.grid(row=0, column=0, sticky="nsew")
+        container.grid_rowconfigure(0, weight=1)
+        container.grid_columnconfigure(0, weight=1)
+        vsb = ttk.Scrollbar(container, orient="vertical")
+        hsb = ttk.Scrollbar(container, orient="horizontal", command=self.compare_tree.xview)
+        self.compare_tree.configure(xscrollcommand=hsb.set)
+        vsb.grid(row=0, column=1, sticky="ns")
+        hsb.grid(row=1, column=0, sticky="ew")
+        self.compare_view = VirtualTreeview(self.compare_tree, vsb)
+
+    def _set_compare_frame(self, df):
+        """
+        Muestra la comparación lado a lado (db.multi.compare_instances).
+        """
+        columns = list(df.columns)
+        self.compare_tree.configure(columns=columns)
+        formatters = {}
+        for idx, col in enumerate(columns):
+            self.compare_tree.heading(col, text=col)
+            self.compare_tree.column(col, width=130, anchor="center", stretch=True)
+            if col == "FechaLlegada":
+                formatters[idx] = format_date
+            elif col.startswith(("Vendido", "Diferencia Vendido")):
+                formatters[idx] = format_percentage
+            elif "[" in col or col.startswith("Diferencia"):
+                formatters[idx] = format_number
+        self.compare_view.formatters = formatters
+        self.compare_view.set_frame(df)
+        distintas = int((df["Instancias"] < len(self._multi_frames)).sum())
+        self.compare_var.set(f"{len(df):,} filas; {distintas:,} no están en todas las instancias")
+
+    def _load_all_then(self, action):
+        """
+        Lanza la carga completa y ejecuta action cuando termina.
+        """
+        self._after_import = action
+        self.import_cruce(full=True)
+
+    # ------------------------------------------------------------------
+    # Pestaña "Rendimiento"
+    # ------------------------------------------------------------------
+    def _build_perf_tab(self, parent):
+        bar = ctk.CTkFrame(parent, fg_color="transparent")
+        bar.pack(fill="x", padx=5, pady=(5, 0))
+        ctk.CTkButton(bar, text="Limpiar", width=80, command=PERF_LOG.clear).pack(side="left")
+        # Vuelve a ejecutar el cruce con SET STATISTICS XML/IO/TIME (solo diagnóstico)
+        self.plan_btn = ctk.CTkButton(
+            bar, text="Capturar plan y estadísticas", command=self.capture_plan
+        )
+        self.plan_btn.pack(side="left", padx=(5, 0))
+        # Instancias SQL Server que responden en la red, de la más rápida a la más lenta
+        ctk.CTkButton(bar, text="Servidores en la red", command=self.open_server_scan)\
+            .pack(side="left", padx=(5, 0))
+
+        columns = ("Hora", "Operación", "Segundos", "Filas", "Filas/s", "MB", "Detalle")
+        self.perf_tree = ttk.Treeview(parent, columns=columns, show="headings", height=8)
+        for col in columns:
+            self.perf_tree.heading(col, text=col)
+            self.perf_tree.column(col, width=90 if col != "Detalle" else 260, anchor="center")
+        self.perf_tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.plan_box = ctk.CTkTextbox(parent, height=140, font=ctk.CTkFont(family="Courier", size=11))
+        self.plan_box.pack(fill="both", expand=False, padx=5, pady=(0, 5))
+        self.plan_box.configure(state="disabled")
+
+        self._perf_version = -1
+        self._plan_task = None
+        self.after(1000, self._refresh_perf_tab)
+
+    def _refresh_perf_tab(self):
+        """
+        Repinta la tabla solo si hubo mediciones nuevas (las más recientes arriba).
+        """
+        if PERF_LOG.version != self._perf_version:
+            self._perf_version = PERF_LOG.version
+            self.perf_tree.delete(*self.perf_tree.get_children())
+            for s in reversed(PERF_LOG.recent()):
+                data = s.as_dict()
+                detalle = {k: v for k, v in data.items()
+                           if k not in ("op", "inicio", "segundos", "filas", "filas_s", "bytes")}
+                self.perf_tree.insert("", tk.END, values=(
+                    s.started_at.strftime("%H:%M:%S") if s.started_at else "",
+                    s.name,
+                    f"{s.seconds:.3f}" if s.seconds is not None else "",
+                    f"{s.rows:,}" if s.rows is not None else "",
+                    f"{s.rows_per_sec:,.0f}" if s.rows_per_sec is not None else "",
+                    f"{s.bytes / 2**20:,.1f}" if s.bytes is not None else "",
+                    ", ".join(f"{k}={v}" for k, v in detalle.items()),
+                ))
+        self.after(1000, self._refresh_perf_tab)
+
+    def capture_plan(self):
+        if self._plan_task is not None or not self._backend_ready(self.capture_plan):
+            return
+        from db.connection import get_db_connection
+        engine = get_db_connection()
+        if engine is None:
+            return
+        self.plan_btn.configure(state="disabled")
+        self._set_plan_text("Ejecutando el cruce con estadísticas...")
+        self._plan_task = run_in_background(
+            self, partial(self._plan_worker, engine, self.fecha_option.get()), self._show_plan,
+            poll_ms=IMPORT_POLL_MS, name="plan"
+        )
+
+    @staticmethod
+    def _plan_worker(engine, fecha_option, post):
+        from db.connection import capture_query_plan
+        post("done", capture_query_plan(engine, fecha_option=fecha_option))
+
+    def _show_plan(self, kind, payload):
+        self._plan_task = None
+        self.plan_btn.configure(state="normal")
+        if kind == "error":
+            self._set_plan_text(f"Error: {payload}")
+            return
+        texto = "\n".join(payload["messages"]) or "(sin mensajes de estadísticas)"
+        texto += f"\n\nFilas: {payload['rows']:,}\n\nPlan:\n{payload['plan'] or '(sin plan)'}"
+        logging.debug("Plan del cruce:\n%s", texto)
+        self._set_plan_text(texto)
+
+    def open_server_scan(self, force_refresh=False):
+        """
+        Busca instancias SQL Server en la red (broadcast y CRUCE_DISCOVERY_SUBNETS) y las
+        lista a medida que responden, con la latencia de conexión. Solo informativo: la
+        aplicación se conecta únicamente a las instancias predefinidas.
+        """
+        from utils.my_sql_detector import SqlServerDiscovery, DiscoveryCache, DISCOVERY_SUBNETS
+        window = ctk.CTkToplevel(self)
+        window.title("Servidores en la red")
+        window.geometry("620x320")
+        columns = ("Servidor", "Instancia", "Puerto", "Versión", "Latencia ms")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=110, anchor="center")
+        tree.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        estado = tk.StringVar(value="Buscando...")
+        ctk.CTkLabel(window, textvariable=estado).pack(side="left", padx=10, pady=(0, 10))
+        ctk.CTkButton(window, text="Volver a buscar", width=120,
+                      command=lambda: (window.destroy(), self.open_server_scan(force_refresh=True)))\
+            .pack(side="right", padx=10, pady=(0, 10))
+
+        discovery = SqlServerDiscovery(subnets=DISCOVERY_SUBNETS, cache=DiscoveryCache()).start(force_refresh)
+        items = {}
+
+        def _values(server):
+            latency = "" if server.latency_ms is None else (
+                f"{server.latency_ms:.1f}" if server.reachable else "sin respuesta")
+            return (server.server_name or server.ip, server.instance, server.tcp_port or "",
+                    server.version, latency)
+
+        def _poll():
+            if not window.winfo_exists():
+                return
+            while True:
+                try:
+                    kind, payload = discovery.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind in ("server", "latency"):
+                    if payload.key in items:
+                        tree.item(items[payload.key], values=_values(payload))
+                    else:
+                        items[payload.key] = tree.insert("", tk.END, values=_values(payload))
+                elif kind == "done":
+                    # Orden final: las alcanzables primero, de menor a mayor latencia
+                    for index, server in enumerate(payload):
+                        tree.move(items[server.key], "", index)
+                    estado.set(f"{len(payload)} instancias encontradas")
+                    return
+                else:
+                    estado.set(f"Error: {payload}")
+                    return
+            window.after(IMPORT_POLL_MS * 2, _poll)
+
+        _poll()
+
+    def _set_plan_text(self, texto):
+        self.plan_box.configure(state="normal")
+        self.plan_box.delete("1.0", tk.END)
+        self.plan_box.insert("1.0", texto)
+        self.plan_box.configure(state="disabled")
+
+    def show_memory_report(self):
+        """
+        Muestra los bytes por columna del cruce antes y después de compactar los tipos.
+        """
+        if self._memory_report is None:
+            messagebox.showwarning("Atención", "Primero importe los datos.")
+            return
+        from utils.postprocess import format_memory_report
+        texto = format_memory_report(self._memory_report)
+        logging.info("Uso de memoria del cruce:\n%s", texto)
+
+        window = ctk.CTkToplevel(self)
+        window.title("Uso de memoria")
+        window.geometry("520x520")
+        box = ctk.CTkTextbox(window, font=ctk.CTkFont(family="Courier", size=12))
+        box.pack(expand=True, fill="both", padx=10, pady=10)
+        box.insert("1.0", texto)
+        box.configure(state="disabled")
+
+    def cancel_import(self):
+        if self._export_cancel is not None:
+            self._export_cancel.set()
+            self.cancel_btn.configure(state="disabled")
+            self.progress_var.set("Cancelando exportación...")
+            return
+        if self._cancel_token is not None:
+            self._cancel_token.cancel()
+            self.cancel_btn.configure(state="disabled")
+            self.progress_var.set("Cancelando...")
+        if self._multi_task is not None and self._multi_task is self._import_task:
+            # No se espera a las instancias que faltan; el hilo termina solo cuando respondan
+            self._multi_task.discard()
+            self._import_task = None
+            self._finish_multi("cancelled", None)
+
+    def export_view(self, output_file):
+        """
+        Exporta la vista actual (df_cruce con el filtro aplicado) en un hilo aparte.
+        El formato sale de la extensión del archivo (.xlsx, .csv o .parquet).
+        """
+        if self._paged:
+            self._load_all_then(lambda: self.export_view(output_file))
+            return
         if self.df_cruce is None:
             messagebox.showwarning("Atención", "Primero importe los datos.")
             return
+        if self._export_task is not None and self._export_task.running:
+            return
+        if self._prepare_task is not None or self._importing():
+            messagebox.showwarning("Atención", "Espere a que termine la importación.")
+            return
+
+        self._export_cancel = threading.Event()
+        self._set_import_running(True)
+        self.progress_var.set("Exportando...")
+
+        self._export_task = run_in_background(
+            self, partial(self._export_worker, self.df_cruce, self.grid_view.positions,
+                          output_file, self._export_cancel),
+            self._on_export_message, poll_ms=IMPORT_POLL_MS, name="exportacion"
+        )
 
-        df = self.df_cruce.copy()
-        filtros = {
-            "CodigoBarra": self.codigo_barra_entry.get().strip(),
-            "Referencia": self.referencia_entry.get().strip().lower(),
-            "CategoriaNombre": self.categoria_entry.get().strip().lower(),
-            "Linea": self.linea_entry.get().strip().lower(),
-            "CodigoFabricante": self.fabrica_entry.get().strip()
+    @staticmethod
+    def _export_worker(df, positions, output_file, cancel_event, post):
+        from utils.exporter import export_frame, ExportCancelled
+        try:
+            with span("export", formato=os.path.splitext(output_file)[1].lstrip(".")) as s:
+                export_frame(
+                    df, output_file, positions=positions, cancel_event=cancel_event,
+                    progress=lambda written, total: post("progress", (written, total))
+                )
+                s.rows = len(df) if positions is None else len(positions)
+                s.bytes = os.path.getsize(output_file)
+            post("done", output_file)
+        except ExportCancelled:
+            post("cancelled", None)
+
+    def _on_export_message(self, kind, payload):
+        if kind == "progress":
+            written, total = payload
+            self.progress_var.set(f"Exportando... {written:,} de {total:,} filas")
+        else:
+            self._finish_export(kind, payload)
+
+    def _finish_export(self, kind, payload):
+        self._export_cancel = None
+        self._set_import_running(False)
+        if kind == "done":
+            self.progress_var.set(f"{len(self.grid_view):,} filas exportadas")
+            messagebox.showinfo("Exportación exitosa", f"Archivo guardado:\n{payload}")
+        elif kind == "cancelled":
+            self.progress_var.set("Exportación cancelada")
+        else:
+            self.progress_var.set("")
+            messagebox.showerror("Error al exportar", f"Se produjo un error:\n{payload}")
+
+    def _search_filters(self, strict=True, live=False):
+        """
+        Argumentos de CruceFilterEngine.search según lo escrito en los filtros.
+        Con strict=False un rango de Vendido a medio escribir se ignora en vez de fallar.
+        live: búsqueda mientras se escribe (textos como prefijo); «Buscar» compara exacto.
+        """
+        from utils.filter_engine import parse_range
+        try:
+            vendido = parse_range(self.vendido_entry.get())
+        except ValueError:
+            if strict:
+                raise
+            vendido = None
+        return {
+            "codigo": self.codigo_barra_entry.get().strip(),
+            "referencia": self.referencia_entry.get(),
+            "categoria": self.categoria_entry.get(),
+            "linea": self.linea_entry.get(),
+            "fabrica": self.fabrica_entry.get(),
+            "nombre": self.nombre_entry.get(),
+            "ranges": {"Vendido": vendido},
+            "prefix": live,
+            "codigos": self._code_list,
         }
 
-        if filtros["CodigoBarra"]:
-            df = df[df["CodigoBarra"].astype(str) == filtros["CodigoBarra"]]
-        if filtros["Referencia"]:
-            df = df[df["Referencia"].str.strip().str.lower() == filtros["Referencia"]]
-        if filtros["CategoriaNombre"]:
-            df = df[df["CategoriaNombre"].str.strip().str.lower() == filtros["CategoriaNombre"]]
-        if filtros["Linea"]:
-            df = df[df["Linea"].str.strip().str.lower() == filtros["Linea"]]
-        if filtros["CodigoFabricante"]:
-            df = df[df["CodigoFabricante"].astype(str).str.strip() == filtros["CodigoFabricante"]]
-
-        self.populate_tree(df.values.tolist())
-
-    def populate_tree(self, rows):
-        self.tree_cruce.delete(*self.tree_cruce.get_children())
-        for r in rows:
-            self.tree_cruce.insert("", tk.END, values=r)
+    def _suggestion_entry(self, field):
+        return {"categoria": self.categoria_entry, "linea": self.linea_entry,
+                "fabrica": self.fabrica_entry}[field]
+
+    def _refresh_catalogs(self):
+        """
+        Descarta los valores sugeridos (cambió df_cruce) y rellena las listas.
+        """
+        self._catalogs = {}
+        if self.filter_frame:
+            for field in SUGGESTION_COLUMNS:
+                self._update_suggestions(field)
+
+    def _catalog(self, field):
+        """
+        Valores del filtro: con el cruce cargado, los de df_cruce con sus filas (códigos
+        de las categóricas); antes, los nombres de las dimensiones sin conteo.
+        """
+        if field not in self._catalogs:
+            column = SUGGESTION_COLUMNS[field]
+            if self.df_cruce is not None and column in self.df_cruce.columns:
+                from utils.filter_engine import value_counts_catalog
+                self._catalogs[field] = value_counts_catalog(self.df_cruce[column])
+            elif self._dimensions is not None and field != "fabrica":
+                dimension = "categorias" if field == "categoria" else "lineas"
+                self._catalogs[field] = [(v, None) for v in self._dimensions.catalog(dimension)]
+            else:
+                # Las dimensiones pueden llegar después: no se guarda la lista vacía
+                return []
+        return self._catalogs[field]
+
+    def _suggestion_label(self, field, value, count):
+        label = value
+        # El código de fábrica se acompaña del nombre del fabricante si se conoce
+        name = self._fabricante_names.get(value) if field == "fabrica" else None
+        if name:
+            label = f"{value} - {name}"
+        return label if count is None else f"{label} ({count:,})"
+
+    def _update_suggestions(self, field):
+        """
+        Deja en la lista los primeros MAX_SUGGESTIONS valores que empiezan con lo escrito.
+        """
+        entry = self._suggestion_entry(field)
+        typed = entry.get().strip().lower()
+        labels = {}
+        for value, count in self._catalog(field):
+            if value.lower().startswith(typed):
+                labels[self._suggestion_label(field, value, count)] = value
+                if len(labels) >= MAX_SUGGESTIONS:
+                    break
+        self._suggestion_values[field] = labels
+        entry.configure(values=list(labels) or [""])
+
+    def _on_suggestion(self, field, choice):
+        # El texto mostrado trae filas y nombre; en el filtro queda solo el valor
+        value = self._suggestion_values.get(field, {}).get(choice, choice)
+        self._suggestion_entry(field).set(value)
+        self._schedule_live_search()
+
+    def _set_name_formatters(self, dimensions):
+        """
+        Mientras llega un cruce con códigos (slim) la grilla muestra los nombres de la
+        dimensión; con dimensions=None se quitan los formateadores.
+        """
+        from db.dimensions import NAME_COLUMNS
+        for column, (dimension, _) in NAME_COLUMNS.items():
+            idx = desired_cols.index(column)
+            if dimensions is None:
+                self.grid_view.formatters.pop(idx, None)
+            else:
+                names = dimensions.names(dimension)
+                self.grid_view.formatters[idx] = lambda v, names=names: names.get(v, v)
+
+    def _schedule_live_search(self, event=None):
+        if self._live_search_after is not None:
+            self.after_cancel(self._live_search_after)
+        self._live_search_after = self.after(LIVE_SEARCH_DELAY_MS, self._run_live_search)
+
+    def _run_live_search(self):
+        """
+        Filtra en un hilo aparte; cada búsqueda nueva deja obsoletas las que sigan en curso.
+        Con la carga por páginas no hay índice todavía: hay que usar Buscar.
+        """
+        self._live_search_after = None
+        if self.filter_engine is None or self._paged:
+            return
+        self._discard_search()
+        self._search_task = run_in_background(
+            self, partial(self._search_worker, self.filter_engine,
+                          self._search_filters(strict=False, live=True)),
+            self._show_search, poll_ms=IMPORT_POLL_MS, name="busqueda"
+        )
+
+    def _discard_search(self):
+        """
+        La búsqueda mientras se escribe que siga en curso ya no se pinta.
+        """
+        if self._search_task is not None:
+            self._search_task.discard()
+            self._search_task = None
+
+    @staticmethod
+    def _search_worker(engine, filters, post):
+        with span("busqueda_en_vivo") as s:
+            positions = engine.search(**filters)
+            s.rows = engine.n_rows if positions is None else len(positions)
+        post("done", positions)
+
+    def _show_search(self, kind, positions):
+        # Solo llega la búsqueda más reciente; las anteriores se descartaron
+        self._search_task = None
+        if kind == "error":
+            return
+        self.populate_tree(positions)
+        self.progress_var.set(f"{len(self.grid_view):,} de {len(self.df_cruce):,} filas")
+
+    def buscar_datos(self):
+        if self._paged:
+            self._load_all_then(self.buscar_datos)
+            return
+        if self._prepare_task is not None:
+            messagebox.showwarning("Atención", "Espere a que terminen de prepararse los datos.")
+            return
+        if self.df_cruce is None:
+            messagebox.showwarning("Atención", "Primero importe los datos.")
+            return
+
+        try:
+            filters = self._search_filters()
+        except ValueError as e:
+            messagebox.showwarning("Atención", str(e))
+            return
+
+        # Lo que siga en curso de la búsqueda mientras se escribe queda obsoleto
+        self._discard_search()
+        with span("buscar_datos") as s:
+            positions = self.filter_engine.search(**filters)
+            s.rows = len(self.df_cruce) if positions is None else len(positions)
+        self.populate_tree(positions)
+
+    def populate_tree(self, positions=None):
+        """
+        Muestra df_cruce en la grilla virtual; positions limita las filas (resultado de un filtro).
+        """
+        self._filter_positions = positions
+        if self._sort is not None and self.filter_engine is not None \
+                and self._sort[0] in self.df_cruce.columns:
+            column, descending = self._sort
+            with span("ordenar", columna=column, descendente=descending) as s:
+                positions = self.filter_engine.sort_positions(column, positions, descending)
+                s.rows = len(positions)
+        with span("populate_tree", filtrado=positions is not None) as s:
+            self._set_tree_columns(self.df_cruce.columns)
+            self.grid_view.set_frame(self.df_cruce, positions)
+            s.rows = len(self.grid_view)
+
+    def get_current_frame(self):
+        """
+        Retorna todas las filas de la vista actual (con filtro aplicado), no solo las visibles.
+        """
+        return self.grid_view.current_frame()
 
     def show_context_menu(self, event):
         row_id = self.tree_cruce.identify_row(event.y)
@@ -0,0 +1,248 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Filas extra que se pintan por debajo de la ventana visible
+OVERSCAN = 5
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTreeview:
+    """
+    Muestra un conjunto grande de filas en un ttk.Treeview creando solo los
+    items de la ventana visible (más OVERSCAN) y reciclándolos al desplazarse.
+
+    La fuente puede ser un DataFrame (opcionalmente con un arreglo de posiciones
+    de fila, p. ej. el resultado de un filtro) o una lista de tuplas que crece
+    durante la importación.
+
+    La selección se guarda como posición en los datos (no como item del Treeview),
+    así sobrevive al reciclado de items y solo se pierde al cambiar la fuente.
+    """
+
+    def __init__(self, tree, vsb, overscan=OVERSCAN, formatters=None):
+        self.tree = tree
+        self.vsb = vsb
+        self.overscan = overscan
+        # Índice de columna -> función de formato que se aplica solo a las filas pintadas
+        self.formatters = formatters or {}
+        # Se llama cuando lo visible queda a menos de prefetch_margin filas del final
+        # (carga por páginas); None lo desactiva
+        self.on_scroll_end = None
+        self.prefetch_margin = 0
+
+        self._df = None
+        self._positions = None
+        self._rows = None
+        self._first = 0
+        # Posición seleccionada dentro de lo que se muestra (None: sin selección)
+        self._selected = None
+        self._items = []
+        self._attached = 0
+        self._visible = max(1, int(tree.cget("height")))
+
+        self.vsb.configure(command=self.yview)
+        self.tree.configure(yscrollcommand=lambda *args: None)
+
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_units(3))
+        self.tree.bind("<Prior>", lambda e: self._scroll_pages(-1))
+        self.tree.bind("<Next>", lambda e: self._scroll_pages(1))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+
+    # ------------------------------------------------------------------
+    # Fuente de datos
+    # ------------------------------------------------------------------
+    def set_frame(self, df, positions=None):
+        """
+        Muestra el DataFrame completo o solo las filas indicadas en positions.
+        """
+        self._df = df
+        self._positions = positions
+        self._rows = None
+        self._first = 0
+        self._selected = None
+        self._render()
+
+    def set_rows(self, rows):
+        """
+        Muestra una lista de tuplas (puede seguir creciendo; llamar a refresh()).
+        """
+        self._df = None
+        self._positions = None
+        self._rows = rows
+        self._first = 0
+        self._selected = None
+        self._render()
+
+    def clear(self):
+        self._df = None
+        self._positions = None
+        self._rows = None
+        self._first = 0
+        self._selected = None
+        self._render()
+
+    def refresh(self):
+        self._render()
+
+    def __len__(self):
+        if self._rows is not None:
+            return len(self._rows)
+        if self._df is None:
+            return 0
+        if self._positions is not None:
+            return len(self._positions)
+        return len(self._df)
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @property
+    def selected(self):
+        """
+        Posición seleccionada dentro de lo que se muestra, o None.
+        """
+        return self._selected
+
+    def current_frame(self):
+        """
+        Retorna el DataFrame de lo que se está mostrando (todas las filas, no solo las visibles).
+        """
+        if self._df is None:
+            return None
+        if self._positions is None:
+            return self._df
+        return self._df.iloc[self._positions]
+
+    def _fetch(self, start, stop):
+        if self._rows is not None:
+            rows = [list(r) for r in self._rows[start:stop]]
+        elif self._df is None or stop <= start:
+            return []
+        elif self._positions is None:
+            rows = self._df.iloc[start:stop].values.tolist()
+        else:
+            rows = self._df.iloc[self._positions[start:stop]].values.tolist()
+
+        for row in rows:
+            for idx, fmt in self.formatters.items():
+                if idx < len(row):
+                    row[idx] = fmt(row[idx])
+        return rows
+
+    # ------------------------------------------------------------------
+    # Desplazamiento
+    # ------------------------------------------------------------------
+    def yview(self, *args):
+        """
+        Reemplaza al yview del Treeview como comando de la barra de desplazamiento.
+        """
+        if not args:
+            return
+        total = len(self)
+        if args[0] == "moveto":
+            self._first = int(float(args[1]) * total)
+            self._render()
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                self._scroll_pages(step)
+            else:
+                self._scroll_units(step)
+
+    def _scroll_units(self, units):
+        self._first += units
+        self._render()
+        return "break"
+
+    def _scroll_pages(self, pages):
+        self._first += pages * self._visible
+        self._render()
+        return "break"
+
+    def _move_selection(self, step):
+        """
+        Mueve la selección una fila con las flechas; en el borde de la ventana
+        primero se desplaza y después se selecciona la fila nueva.
+        """
+        total = len(self)
+        if not total:
+            return "break"
+        if self._selected is None:
+            self._selected = self._first
+        else:
+            self._selected = max(0, min(self._selected + step, total - 1))
+        if self._selected < self._first:
+            self._first = self._selected
+        elif self._selected >= self._first + self._visible:
+            self._first = self._selected - self._visible + 1
+        self._render()
+        return "break"
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        attached = self._items[:self._attached]
+        if selection and selection[0] in attached:
+            self._selected = self._first + attached.index(selection[0])
+        elif not selection and self._selected is not None \
+                and self._first <= self._selected < self._first + self._attached:
+            # Se quitó la selección de una fila pintada (no es que saliera de la ventana)
+            self._selected = None
+
+    def _on_mousewheel(self, event):
+        return self._scroll_units(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        style = ttk.Style(self.tree)
+        row_height = int(style.lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        # Una fila se reserva para los encabezados
+        visible = max(1, event.height // row_height - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+
+    # ------------------------------------------------------------------
+    # Pintado
+    # ------------------------------------------------------------------
+    def _render(self):
+        total = len(self)
+        self._first = max(0, min(self._first, total - self._visible))
+        count = max(0, min(self._visible + self.overscan, total - self._first))
+        rows = self._fetch(self._first, self._first + count)
+
+        # Reciclar: se reutilizan los items existentes y los sobrantes se ocultan
+        for k in range(self._attached, min(count, len(self._items))):
+            self.tree.move(self._items[k], "", k)
+        while len(self._items) < count:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        if count < self._attached:
+            self.tree.detach(*self._items[count:self._attached])
+        self._attached = count
+
+        for iid, values in zip(self._items, rows):
+            self.tree.item(iid, values=values)
+
+        # La selección sigue a la posición en los datos, no al item reciclado
+        if self._selected is not None and self._selected >= total:
+            self._selected = None
+        offset = None if self._selected is None else self._selected - self._first
+        if offset is not None and 0 <= offset < count:
+            iid = self._items[offset]
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+            self.tree.focus(iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if total:
+            self.vsb.set(self._first / total, min(1.0, (self._first + self._visible) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+        if self.on_scroll_end is not None and self._first + self._visible >= total - self.prefetch_margin:
+            self.on_scroll_end()